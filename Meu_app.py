@@ -11,6 +11,7 @@ import plotly.express as px
 import plotly.graph_objects as go
 import pandas as pd
 import json
+import uuid
 import base64
 from io import BytesIO
 from datetime import datetime
@@ -21,6 +22,16 @@ from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image, Tabl
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 import nltk
 from nltk.sentiment import SentimentIntensityAnalyzer
+from extracao import MODO_COMPLETO, MODO_DENSIDADE, extrair_pagina
+from cache_compartilhado import buscas, completions, gerar_chave, paginas
+from cliente_api import ClienteAPI
+from tabelas import (converter_numeros_ptbr, figura_plotly, formatar_numero_ptbr, grafico_barras,
+                     grafico_tabela, tabela_de_csv, tabela_para_csv, tabelas_para_prompt)
+from custos import RegistroUso, escolher_modelo
+from metricas import MetricasTemas
+from imagens import ProcessadorImagens, candidatas_da_pagina, imagens_para_prompt, intercalar_candidatas
+import replay
+from fila_jobs import FilaJobs, STATUS_CONCLUIDO, STATUS_ERRO, STATUS_EXECUTANDO, STATUS_PENDENTE
 
 # Carrega as variáveis de ambiente
 load_dotenv()
@@ -33,9 +44,7 @@ st.set_page_config(
     initial_sidebar_state="collapsed"  # Melhora o espaço útil inicial
 )
 
-# Cache para resultados de busca
-@st.cache_data(ttl=3600)  # Cache por 1 hora
-def buscar_noticias(tema: str, serpapi_key: str) -> List[str]:
+def _buscar_noticias_serpapi(tema: str, serpapi_key: str) -> List[str]:
     params = {
         'q': tema,
         'tbm': 'nws',
@@ -44,13 +53,17 @@ def buscar_noticias(tema: str, serpapi_key: str) -> List[str]:
         'api_key': serpapi_key
     }
     try:
-        search = GoogleSearch(params)
-        resultados = search.get_dict()
+        resultados = replay.buscar(params, GoogleSearch)
         return [noticia.get('link') for noticia in resultados.get('news_results', []) if noticia.get('link')]
     except Exception as e:
         st.error(f"Erro na busca de notícias: {str(e)}")
         return []
 
+# Busca coalescida e em cache compartilhado: sessões que pesquisam o mesmo tema
+# ao mesmo tempo fazem uma única chamada à SerpAPI
+def buscar_noticias(tema: str, serpapi_key: str) -> List[str]:
+    return list(buscas.executar(('busca', tema.strip().lower()), _buscar_noticias_serpapi, tema, serpapi_key))
+
 # Função otimizada para extrair texto de uma URL
 def limpar_texto(texto: str) -> str:
     """Remove caracteres especiais e formata o texto."""
@@ -59,71 +72,60 @@ def limpar_texto(texto: str) -> str:
     texto = re.sub(r'[^\w\s.,!?-]', '', texto)  # Remove caracteres especiais
     return texto.strip()
 
-def extrair_texto_url(url: str, headers: Dict[str, str]) -> dict:
+def _baixar_e_extrair(url: str, headers: Dict[str, str], modo: str) -> dict:
     try:
-        with requests.get(url, headers=headers, timeout=10) as response:
+        with requests.get(replay.url_pagina(url), headers=headers, timeout=10) as response:
             response.raise_for_status()
+            replay.gravar_pagina(url, response)
             soup = BeautifulSoup(response.text, 'html.parser')
             
-            # Remove elementos irrelevantes
-            for elemento in soup.find_all(['script', 'style', 'nav', 'footer', 'header']):
-                elemento.decompose()
-            
-            # Extrai texto de elementos relevantes, incluindo tabelas
-            textos = []
-            
-            # Processa elementos de texto normais
-            for p in soup.find_all(['p', 'article', 'section', 'h1', 'h2', 'h3']):
-                if len(p.get_text().strip()) > 50:
-                    textos.append(p.get_text())
+            # Tabelas de dados como DataFrames (fora do texto) e o texto no modo
+            # escolhido; é o mesmo pipeline avaliado contra as fixtures
+            texto_final, tabelas = extrair_pagina(soup, modo)
             
-            # Processa tabelas
-            for tabela in soup.find_all('table'):
-                texto_tabela = []
-                # Processa cabeçalho da tabela
-                headers = []
-                for th in tabela.find_all('th'):
-                    headers.append(th.get_text().strip())
-                if headers:
-                    texto_tabela.append(" | ".join(headers))
-                    texto_tabela.append("-" * 50)  # Linha separadora
-                
-                # Processa linhas da tabela
-                for tr in tabela.find_all('tr'):
-                    linha = []
-                    for td in tr.find_all('td'):
-                        linha.append(td.get_text().strip())
-                    if linha:
-                        texto_tabela.append(" | ".join(linha))
-                
-                if texto_tabela:
-                    textos.append("\n".join(texto_tabela))
-            
-            # Extrai imagens relevantes
-            imagens = []
-            for img in soup.find_all('img'):
-                src = img.get('src')
-                alt = img.get('alt', '')
-                if src and (src.startswith('http') or src.startswith('/')):
-                    # Normaliza URLs relativas
-                    if src.startswith('/'):
-                        base_url = '/'.join(url.split('/')[:3])  # http(s)://dominio.com
-                        src = base_url + src
-                    imagens.append({'url': src, 'alt': alt})
+            # Imagens candidatas (sem logos e ícones); o download fica para a etapa de imagens
+            imagens = candidatas_da_pagina(soup, url, max_imagens=5)
             
-            texto_final = '\n\n'.join(textos)
             return {
                 'texto': limpar_texto(texto_final),
-                'imagens': imagens[:5]  # Limita a 5 imagens por notícia
+                'imagens': imagens,
+                'tabelas': tabelas
             }
     except Exception as e:
         st.error(f"Erro ao extrair texto: {str(e)}")
-        return {'texto': '', 'imagens': []}
+        return {'texto': '', 'imagens': [], 'tabelas': []}
+
+def extrair_texto_url(url: str, headers: Dict[str, str], modo: str = MODO_DENSIDADE) -> dict:
+    """Download coalescido entre sessões; páginas sem texto não ficam em cache."""
+    return paginas.executar(('pagina', url, modo), _baixar_e_extrair, url, headers, modo,
+                            armazenar=lambda resultado: bool(resultado['texto']))
+
+# Inicialização do analisador de sentimento
+@st.cache_resource
+def inicializar_analisador_sentimento():
+    try:
+        nltk.download('vader_lexicon', quiet=True)
+        return SentimentIntensityAnalyzer()
+    except Exception as e:
+        st.error(f"Erro ao inicializar analisador de sentimento: {str(e)}")
+        return None
+
+# Função para analisar sentimento do texto
+def analisar_sentimento(texto):
+    sia = inicializar_analisador_sentimento()
+    if sia:
+        sentimento = sia.polarity_scores(texto)
+        return sentimento
+    return None
 
 # Inicializar a sessão de estado para armazenar o histórico da conversa
 if 'messages' not in st.session_state:
     st.session_state.messages = []
 
+# Identificador da sessão, usado no rodízio de requisições entre sessões
+if 'id_sessao' not in st.session_state:
+    st.session_state.id_sessao = uuid.uuid4().hex
+
 # Definir variáveis globais
 try:
     api_key_OpenaAI = st.secrets["openai"]["api_key"]
@@ -137,12 +139,190 @@ if not api_key_OpenaAI.startswith('sk-'):
     st.error('Formato da chave da API OpenAI inválido')
     st.stop()
 
-api_url = 'https://api.openai.com/v1/chat/completions'
+api_url = replay.url_api(os.getenv('OPENAI_API_URL', 'https://api.openai.com/v1/chat/completions'))
 headers_api = {
     'Authorization': f'Bearer {api_key_OpenaAI.strip()}',
     'Content-Type': 'application/json'
 }
 
+# Cliente compartilhado por todas as sessões (pool de conexões e limites por modelo)
+@st.cache_resource
+def obter_cliente_api():
+    return ClienteAPI(api_url, headers_api)
+
+# Registro de tokens, latência e custo por chamada, agregado por dia
+@st.cache_resource
+def obter_registro_uso():
+    return RegistroUso(os.getenv('USO_DB', 'uso.db'))
+
+# Downloads de imagens limitados no processo e miniaturas em cache no disco
+@st.cache_resource
+def obter_processador_imagens():
+    return ProcessadorImagens(os.getenv('MINIATURAS_DIR', 'miniaturas'))
+
+def chamar_openai(body_message: dict, id_sessao: str = None, tipo: str = 'analise', roteado: bool = False) -> str:
+    """
+    Envia uma requisição de chat à OpenAI e retorna o conteúdo da resposta.
+    
+    Requisições idênticas de sessões diferentes são coalescidas em uma única
+    chamada e a resposta fica no cache compartilhado. O cliente compartilhado
+    espera a vez da sessão dentro dos limites do modelo e repete a chamada
+    em caso de 429/5xx. Cada chamada real tem tokens, latência e custo
+    registrados.
+    
+    Args:
+        body_message: Corpo da requisição (modelo, mensagens e parâmetros)
+        id_sessao: Sessão de origem (jobs em segundo plano não têm session_state)
+        tipo: 'analise' ou 'pergunta', para a contabilização
+        roteado: Se o modelo foi escolhido pela política de roteamento
+        
+    Returns:
+        str: Conteúdo da resposta do modelo
+    """
+    cliente = obter_cliente_api()
+    registro_uso = obter_registro_uso()
+    if id_sessao is None:
+        id_sessao = st.session_state.id_sessao
+    
+    def enviar():
+        # Latência só da requisição que teve sucesso, sem fila nem backoff
+        resposta, latencia_ms = cliente.chat(body_message, sessao=id_sessao)
+        registro_uso.registrar(body_message['model'], resposta.get('usage') or {}, latencia_ms,
+                               sessao=id_sessao, tipo=tipo, roteado=roteado)
+        replay.gravar_completion(body_message, resposta, latencia_ms)
+        return resposta['choices'][0]['message']['content']
+    
+    return completions.executar(('completion', gerar_chave(body_message)), enviar)
+
+def executar_analise(parametros: dict, reportar=None) -> dict:
+    """
+    Executa o pipeline de análise: busca, extração das notícias e IA.
+    
+    Usado tanto pela execução direta quanto pelos jobs em segundo plano, por
+    isso não acessa st.session_state.
+    
+    Args:
+        parametros: tema, diretriz, modelo, modo_extracao, mensagens (histórico
+            da conversa) e sessao
+        reportar: Função opcional reportar(progresso, mensagem)
+        
+    Returns:
+        dict: tema, diretriz, links, tabelas (CSV), imagens (miniaturas), prompt
+            e resposta (None se não houver notícias)
+    """
+    reportar = reportar or (lambda progresso, mensagem='': None)
+    tema = parametros['tema']
+    diretriz = parametros['diretriz']
+    
+    reportar(0.05, 'Buscando notícias...')
+    links = buscar_noticias(tema, serpapi_key)
+    resultado = {'tema': tema, 'diretriz': diretriz, 'links': links, 'tabelas': [], 'imagens': [],
+                 'prompt': None, 'resposta': None}
+    if not links:
+        return resultado
+    
+    # Processamento paralelo das URLs
+    headers = {
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/135.0.0.0 Safari/537.36'
+    }
+    
+    # Processamento paralelo otimizado
+    with concurrent.futures.ThreadPoolExecutor(max_workers=5) as executor:
+        futures = {executor.submit(extrair_texto_url, link, headers, parametros['modo_extracao']): link for link in links}
+        textos = []
+        artigos = []
+        candidatas_imagens = []
+        
+        for i, future in enumerate(concurrent.futures.as_completed(futures)):
+            resultado_url = future.result()
+            if resultado_url and resultado_url['texto']:  # Verifica se há texto no resultado
+                textos.append(resultado_url['texto'])
+                sentimento = analisar_sentimento(resultado_url['texto'])
+                artigos.append({
+                    'url': futures[future],
+                    'caracteres': len(resultado_url['texto']),
+                    'sentimento': sentimento['compound'] if sentimento else None
+                })
+            # Tabelas seguem como CSV compacto (serializável para os jobs)
+            for tabela in resultado_url.get('tabelas', []):
+                resultado['tabelas'].append({'fonte': futures[future], 'csv': tabela_para_csv(tabela)})
+            candidatas_imagens.append(resultado_url.get('imagens', []))
+            reportar(0.1 + 0.6 * (i + 1) / len(futures), f'Processando notícias ({i + 1}/{len(futures)})')
+    
+    texto_completo = '\n\n'.join(textos)
+    
+    # Imagens: downloads limitados, sem duplicatas, com miniaturas em cache
+    reportar(0.72, 'Processando imagens...')
+    resultado['imagens'] = obter_processador_imagens().processar(intercalar_candidatas(candidatas_imagens), headers)
+    
+    # Métricas da execução para o acompanhamento do tema ao longo do tempo
+    obter_metricas().registrar_execucao(tema, links, artigos, modelo=parametros['modelo'])
+    
+    # Otimização do prompt para a IA
+    prompt_otimizado = f"""
+                        Analise o seguinte conjunto de notícias sobre '{tema}' e responda de acordo com a diretriz: '{diretriz}'
+                        
+                        Pontos importantes a considerar:
+                        1. Foque nos fatos mais relevantes e atuais
+                        2. Identifique tendências e padrões
+                        3. Considere o impacto no contexto específico da Rede Lius
+                        4. Forneça insights acionáveis
+                        
+                        Texto para análise: {texto_completo[:8000]}
+                        """
+    
+    # Tabelas das notícias em CSV compacto
+    secao_tabelas = tabelas_para_prompt(resultado['tabelas'])
+    if secao_tabelas:
+        prompt_otimizado += f"\nTabelas extraídas das notícias (CSV, números já convertidos):\n{secao_tabelas}\n"
+    
+    # Imagens aproveitadas das notícias
+    secao_imagens = imagens_para_prompt(resultado['imagens'])
+    if secao_imagens:
+        prompt_otimizado += f"\nImagens relevantes encontradas nas notícias:\n{secao_imagens}\n"
+    
+    # Configuração otimizada para a API da OpenAI
+    body_message = {
+        'model': parametros['modelo'],
+        'messages': parametros.get('mensagens', []) + [{'role': 'user', 'content': prompt_otimizado, 'exibir': False}],
+        'temperature': 0.3,  # Reduzido para maior precisão
+        'max_tokens': 4000,
+        'presence_penalty': 0.1,  # Encoraja diversidade moderada
+        'frequency_penalty': 0.1  # Evita repetições
+    }
+    
+    reportar(0.75, 'Consultando a IA...')
+    resultado['prompt'] = prompt_otimizado
+    resultado['resposta'] = chamar_openai(body_message, parametros.get('sessao'))
+    reportar(1.0, 'Análise concluída')
+    return resultado
+
+def registrar_resultado_analise(resultado: dict) -> None:
+    """Incorpora o resultado de uma análise ao histórico da conversa da sessão."""
+    st.session_state.messages.append({'role': 'user', 'content': resultado['prompt'], 'exibir': False})
+    st.session_state.messages.append({'role': 'assistant', 'content': resultado['resposta']})
+    st.session_state.ultima_analise = {
+        'tema': resultado['tema'],
+        'diretriz': resultado['diretriz'],
+        'links': resultado['links'],
+        'tabelas': resultado.get('tabelas', []),
+        'imagens': resultado.get('imagens', [])
+    }
+
+# Série temporal de métricas por tema (com agregados diários e semanais)
+@st.cache_resource
+def obter_metricas():
+    return MetricasTemas(os.getenv('METRICAS_DB', 'metricas.db'))
+
+# Fila de jobs compartilhada pelo processo; os resultados ficam persistidos em SQLite.
+# Ao limpar o cache, os workers antigos param de pegar jobs novos
+@st.cache_resource(on_release=lambda fila: fila.encerrar())
+def obter_fila_jobs():
+    return FilaJobs(os.getenv('JOBS_DB', 'jobs.db'), num_workers=2)
+
+fila_jobs = obter_fila_jobs()
+fila_jobs.registrar('analise', executar_analise)
+
 # Criação de colunas para o logotipo e título
 col1, col2, col3 = st.columns([0.6, 5, 0.6])
 
@@ -191,6 +371,13 @@ with col2:
 
     st.write("---")
 
+    # Modo de extração do texto das notícias
+    modos_extracao = {
+        "Somente o corpo da matéria (recomendado)": MODO_DENSIDADE,
+        "Página completa": MODO_COMPLETO
+    }
+    modo_extracao = modos_extracao[st.selectbox("Modo de extração do texto das notícias:", list(modos_extracao))]
+
     # Entrada de dados de pesquisa no Google
     tema = st.text_input(
         "Digite o termo que você deseja pesquisar no Google Notícias:",
@@ -207,67 +394,38 @@ with col2:
     # Botão para iniciar a análise
     # Modificação no bloco de processamento de links
     # No bloco onde você usa a serpapi_key (remover a linha que busca do os.getenv)
+    # Execução em segundo plano: a análise continua mesmo se a aba for fechada
+    em_segundo_plano = st.checkbox(
+        "Executar em segundo plano (acompanhe em \"Análises em segundo plano\")",
+        key="analise_segundo_plano"
+    )
+
     if st.button("Analisar"):
         if tema and diretriz:
-            with st.spinner('Buscando e processando notícias...'):
-                links = buscar_noticias(tema, serpapi_key)
-                
-                if links:
-                    # Processamento paralelo das URLs
-                    headers = {
-                        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/135.0.0.0 Safari/537.36'
-                    }
-                    
-                    # Processamento paralelo otimizado
-                    with concurrent.futures.ThreadPoolExecutor(max_workers=5) as executor:
-                        futures = [executor.submit(extrair_texto_url, link, headers) for link in links]
-                        textos = []
-                        
-                        # Barra de progresso
-                        progress_bar = st.progress(0)
-                        for i, future in enumerate(concurrent.futures.as_completed(futures)):
-                            resultado = future.result()
-                            if resultado and resultado['texto']:  # Verifica se há texto no resultado
-                                textos.append(resultado['texto'])
-                            progress_bar.progress((i + 1) / len(futures))
-                        
-                        texto_completo = '\n\n'.join(textos)
-                        
-                        # Otimização do prompt para a IA
-                        prompt_otimizado = f"""
-                        Analise o seguinte conjunto de notícias sobre '{tema}' e responda de acordo com a diretriz: '{diretriz}'
-                        
-                        Pontos importantes a considerar:
-                        1. Foque nos fatos mais relevantes e atuais
-                        2. Identifique tendências e padrões
-                        3. Considere o impacto no contexto específico da Rede Lius
-                        4. Forneça insights acionáveis
-                        
-                        Texto para análise: {texto_completo[:8000]}
-                        """
-                        
-                        # Atualiza as mensagens com o prompt otimizado
-                        st.session_state.messages.append({
-                            'role': 'user',
-                            'content': prompt_otimizado,
-                            'exibir': False
-                        })
-
-                        # Configuração otimizada para a API da OpenAI
-                        body_message = {
-                            'model': modelo,
-                            'messages': st.session_state.messages,
-                            'temperature': 0.3,  # Reduzido para maior precisão
-                            'max_tokens': 4000,
-                            'presence_penalty': 0.1,  # Encoraja diversidade moderada
-                            'frequency_penalty': 0.1  # Evita repetições
-                        }
-
+            parametros_analise = {
+                'tema': tema,
+                'diretriz': diretriz,
+                'modelo': modelo,
+                'modo_extracao': modo_extracao,
+                'mensagens': st.session_state.messages,
+                'sessao': st.session_state.id_sessao
+            }
+            if em_segundo_plano:
+                id_job = fila_jobs.enfileirar('analise', parametros_analise, st.session_state.id_sessao)
+                st.success(f"Análise enfileirada. ID do job: {id_job}")
+            else:
+                with st.spinner('Buscando e processando notícias...'):
+                    # Barra de progresso
+                    progress_bar = st.progress(0)
                     try:
-                        response_api = requests.post(api_url, headers=headers_api, json=body_message)
-                        response_api.raise_for_status()
-                        resposta = response_api.json()['choices'][0]['message']['content']
-                        st.session_state.messages.append({'role': 'assistant', 'content': resposta})
+                        resultado = executar_analise(
+                            parametros_analise,
+                            lambda progresso, mensagem='': progress_bar.progress(progresso)
+                        )
+                        if resultado['resposta']:
+                            registrar_resultado_analise(resultado)
+                        else:
+                            st.warning("Nenhuma notícia encontrada para o tema informado.")
                     except Exception as e:
                         st.error(f"Erro ao chamar a API da OpenAI: {e}")
 
@@ -278,31 +436,64 @@ with col2:
             with st.chat_message(msg['role']):
                 st.markdown(msg['content'])
 
+    # Tabelas extraídas das notícias da última análise
+    tabelas_analise = st.session_state.get('ultima_analise', {}).get('tabelas', [])
+    if tabelas_analise:
+        with st.expander(f"Tabelas encontradas nas notícias ({len(tabelas_analise)})"):
+            for i, tabela in enumerate(tabelas_analise):
+                df_tabela = tabela_de_csv(tabela['csv'])
+                st.caption(f"Tabela {i+1} - {tabela['fonte']}")
+                st.dataframe(df_tabela)
+                figura = figura_plotly(df_tabela)
+                if figura is not None:
+                    st.plotly_chart(figura, key=f"grafico_tabela_{i}")
+
+    # Miniaturas das imagens da última análise (as que ainda estão no cache)
+    imagens_analise = [img for img in st.session_state.get('ultima_analise', {}).get('imagens', [])
+                       if os.path.exists(img['arquivo'])]
+    if imagens_analise:
+        with st.expander(f"Imagens encontradas nas notícias ({len(imagens_analise)})"):
+            colunas_imagens = st.columns(3)
+            for i, img in enumerate(imagens_analise):
+                with colunas_imagens[i % 3]:
+                    st.image(img['arquivo'], caption=img['alt'] or img['fonte'])
+
     # Substituir o chat_input por um text_input regular
     nova_pergunta = st.text_input(
         "Deseja continuar a análise com outra pergunta?",
         key="nova_pergunta_input"
     )
 
+    # Roteamento opcional: perguntas curtas e simples vão para o modelo mais rápido
+    rotear_perguntas = st.checkbox(
+        "Responder perguntas simples com o gpt-4.1-nano (mais rápido e econômico)",
+        key="rotear_perguntas"
+    )
+
     # Adicionar um botão para enviar a pergunta
     if st.button("Enviar pergunta", key="enviar_pergunta"):
         if nova_pergunta:
             st.session_state.messages.append({'role': 'user', 'content': nova_pergunta})
 
+            if rotear_perguntas:
+                rota = escolher_modelo(modelo, nova_pergunta, obter_registro_uso())
+            else:
+                rota = {'modelo': modelo, 'roteado': False}
+
             body_message = {
-                'model': modelo,
+                'model': rota['modelo'],
                 'messages': st.session_state.messages,
                 'temperature': 0.2,
                 'max_tokens': 4000
             }
 
             try:
-                response_api = requests.post(api_url, headers=headers_api, json=body_message)
-                response_api.raise_for_status()
-                nova_resposta = response_api.json()['choices'][0]['message']['content']
+                nova_resposta = chamar_openai(body_message, tipo='pergunta', roteado=rota['roteado'])
                 st.session_state.messages.append({'role': 'assistant', 'content': nova_resposta})
                 with st.chat_message("assistant"):
                     st.markdown(nova_resposta)
+                    if rota['roteado']:
+                        st.caption(f"Respondido pelo modelo {rota['modelo']}")
             except Exception as e:
                 st.error(f"Erro ao continuar a conversa com a API: {e}")
 
@@ -440,7 +631,7 @@ def formatar_texto_rico(texto):
     
     return texto_formatado
 
-def gerar_relatorio_executivo(tema, diretriz, resposta_ia, links_utilizados=None):
+def gerar_relatorio_executivo(tema, diretriz, resposta_ia, links_utilizados=None, tabelas=None, imagens=None):
     """
     Gera um relatório executivo em PDF com os resultados da análise de mercado.
     
@@ -449,6 +640,8 @@ def gerar_relatorio_executivo(tema, diretriz, resposta_ia, links_utilizados=None
         diretriz: Diretriz de análise
         resposta_ia: Resposta da IA
         links_utilizados: Lista de links utilizados na pesquisa
+        tabelas: Lista de tabelas extraídas das notícias (dicts com 'fonte' e 'csv')
+        imagens: Lista de miniaturas das notícias (dicts com 'arquivo', 'alt' e 'fonte')
     
     Returns:
         bytes: Conteúdo do PDF em formato base64 para download
@@ -606,6 +799,7 @@ def gerar_relatorio_executivo(tema, diretriz, resposta_ia, links_utilizados=None
     icone_analise = "📈 "  # Ícone para análise
     icone_fontes = "📚 "   # Ícone para fontes
     icone_conclusao = "✅ " # Ícone para conclusão
+    icone_imagens = "📷 "  # Ícone para imagens
     
     # Sumário Executivo
     conteudo.append(Paragraph(f"{icone_sumario}SUMÁRIO EXECUTIVO", styles['SubtituloRelatorio']))
@@ -666,21 +860,71 @@ def gerar_relatorio_executivo(tema, diretriz, resposta_ia, links_utilizados=None
                     # Criar uma tabela simples para destacar dados numéricos
                     conteudo.append(Paragraph(p, styles['TextoNormal']))
                     
-                    # Exemplo de visualização de dados (barra horizontal simples)
-                    dados_viz = [[n, "■" * (len(n) + 2)] for n in numeros[:5]]
-                    tabela_viz = Table(dados_viz, colWidths=[80, 300])
-                    tabela_viz.setStyle(TableStyle([
-                        ('BACKGROUND', (0, 0), (0, len(dados_viz)-1), colors.HexColor('#F0F0F0')),
-                        ('TEXTCOLOR', (1, 0), (1, len(dados_viz)-1), colors.HexColor('#4D268C')),
-                        ('ALIGN', (0, 0), (1, len(dados_viz)-1), 'LEFT'),
-                        ('PADDING', (0, 0), (1, len(dados_viz)-1), 5),
-                    ]))
-                    conteudo.append(tabela_viz)
+                    # Gráfico de barras com os valores citados (sem misturar % e absolutos)
+                    percentuais = [n for n in numeros if n.endswith('%')]
+                    rotulos_viz = (percentuais if len(percentuais) >= 2 else numeros)[:5]
+                    valores_viz = converter_numeros_ptbr(pd.Series(rotulos_viz)).tolist()
+                    conteudo.append(grafico_barras(rotulos_viz, [valores_viz], largura=450,
+                                                   altura=30 * len(rotulos_viz) + 40, horizontal=True))
                 else:
                     conteudo.append(Paragraph(p, styles['TextoNormal']))
     
     conteudo.append(Spacer(1, 20))
     
+    # Tabelas extraídas das notícias, com gráficos dos valores reais
+    if tabelas:
+        conteudo.append(Paragraph(f"{icone_analise}DADOS DAS NOTÍCIAS", styles['SubtituloRelatorio']))
+        
+        for i, tabela in enumerate(tabelas):
+            df = tabela_de_csv(tabela['csv'])
+            conteudo.append(Paragraph(f"<b>Tabela {i+1}</b> - {tabela['fonte']}", styles['TextoNormal']))
+            
+            # Tabela com as primeiras linhas
+            df_exibicao = df.head(10)
+            dados_tabela = [[Paragraph(f"<b>{c}</b>", styles['TextoNormal']) for c in df_exibicao.columns]]
+            for _, linha in df_exibicao.iterrows():
+                dados_tabela.append([
+                    Paragraph(formatar_numero_ptbr(v), styles['TextoNormal']) for v in linha
+                ])
+            tabela_dados = Table(dados_tabela, colWidths=[450 / len(df_exibicao.columns)] * len(df_exibicao.columns))
+            tabela_dados.setStyle(TableStyle([
+                ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#F0F0F0')),
+                ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#CCCCCC')),
+                ('PADDING', (0, 0), (-1, -1), 4),
+            ]))
+            conteudo.append(tabela_dados)
+            conteudo.append(Spacer(1, 10))
+            
+            grafico = grafico_tabela(df)
+            if grafico is not None:
+                conteudo.append(grafico)
+            conteudo.append(Spacer(1, 20))
+    
+    # Miniaturas das imagens das notícias, em grade de 3 colunas
+    imagens = [img for img in (imagens or []) if os.path.exists(img['arquivo'])]
+    if imagens:
+        conteudo.append(Paragraph(f"{icone_imagens}IMAGENS DAS NOTÍCIAS", styles['SubtituloRelatorio']))
+        
+        celulas = []
+        for img in imagens:
+            escala = min(140 / img['largura'], 105 / img['altura'])
+            legenda = (img['alt'] or img['fonte'])[:80]
+            celulas.append([
+                Image(img['arquivo'], width=img['largura'] * escala, height=img['altura'] * escala),
+                Paragraph(legenda, styles['Rodape'])
+            ])
+        linhas_imagens = [celulas[i:i + 3] for i in range(0, len(celulas), 3)]
+        linhas_imagens[-1] += [''] * (3 - len(linhas_imagens[-1]))
+        
+        grade_imagens = Table(linhas_imagens, colWidths=[150] * 3)
+        grade_imagens.setStyle(TableStyle([
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+            ('PADDING', (0, 0), (-1, -1), 4),
+        ]))
+        conteudo.append(grade_imagens)
+        conteudo.append(Spacer(1, 20))
+    
     # Fontes utilizadas
     if links_utilizados and len(links_utilizados) > 0:
         conteudo.append(Paragraph(f"{icone_fontes}FONTES CONSULTADAS", styles['SubtituloRelatorio']))
@@ -740,6 +984,27 @@ def gerar_relatorio_executivo(tema, diretriz, resposta_ia, links_utilizados=None
     b64_pdf = base64.b64encode(pdf_bytes).decode()
     return b64_pdf
 
+def executar_relatorio(parametros: dict, reportar=None) -> dict:
+    """
+    Gera o relatório executivo como job em segundo plano.
+    
+    Args:
+        parametros: Argumentos de gerar_relatorio_executivo
+        reportar: Função opcional reportar(progresso, mensagem)
+        
+    Returns:
+        dict: PDF em base64 e nome sugerido para o arquivo
+    """
+    reportar = reportar or (lambda progresso, mensagem='': None)
+    reportar(0.1, 'Gerando relatório executivo...')
+    b64_pdf = gerar_relatorio_executivo(**parametros)
+    return {
+        'pdf_b64': b64_pdf,
+        'nome_arquivo': f"relatorio_executivo_{datetime.now().strftime('%Y%m%d_%H%M')}.pdf"
+    }
+
+fila_jobs.registrar('relatorio', executar_relatorio)
+
 # Adicionar botão para gerar relatório executivo
 if 'messages' in st.session_state and len(st.session_state.messages) > 0:
     # Encontrar a última resposta da IA
@@ -758,24 +1023,23 @@ if 'messages' in st.session_state and len(st.session_state.messages) > 0:
         with col1:
             st.write("Gere um relatório executivo em PDF com os resultados da análise.")
         
+        # Tema, diretriz, links, tabelas e imagens vêm todos da análise que gerou
+        # a resposta; os campos atuais da barra lateral podem já ter sido editados
+        ultima_analise = st.session_state.get('ultima_analise', {})
+        parametros_relatorio = {
+            'tema': ultima_analise.get('tema') or tema or "Tema não especificado",
+            'diretriz': ultima_analise.get('diretriz') or diretriz or "Diretriz não especificada",
+            'resposta_ia': ultima_resposta,
+            'links_utilizados': ultima_analise.get('links', []),
+            'tabelas': ultima_analise.get('tabelas', []),
+            'imagens': ultima_analise.get('imagens', [])
+        }
+        
         with col2:
             if st.button("Gerar Relatório Executivo"):
                 with st.spinner("Gerando relatório executivo..."):
-                    # Obter links utilizados (se disponíveis)
-                    links_utilizados = []
-                    try:
-                        if 'links' in locals():
-                            links_utilizados = links
-                    except:
-                        pass
-                    
                     # Gerar o relatório
-                    b64_pdf = gerar_relatorio_executivo(
-                        tema=tema if 'tema' in locals() else "Tema não especificado",
-                        diretriz=diretriz if 'diretriz' in locals() else "Diretriz não especificada",
-                        resposta_ia=ultima_resposta,
-                        links_utilizados=links_utilizados
-                    )
+                    b64_pdf = gerar_relatorio_executivo(**parametros_relatorio)
                     
                     # Criar botão de download
                     nome_arquivo = f"relatorio_executivo_{datetime.now().strftime('%Y%m%d_%H%M')}.pdf"
@@ -788,26 +1052,125 @@ if 'messages' in st.session_state and len(st.session_state.messages) > 0:
                     )
                     
                     st.success("Relatório executivo gerado com sucesso!")
-import nltk
-from nltk.sentiment import SentimentIntensityAnalyzer
+            
+            if st.button("Gerar em segundo plano"):
+                id_job = fila_jobs.enfileirar('relatorio', parametros_relatorio, st.session_state.id_sessao)
+                st.success(f"Relatório enfileirado. ID do job: {id_job}")
 
-# Inicialização do analisador de sentimento
-@st.cache_resource
-def inicializar_analisador_sentimento():
-    try:
-        nltk.download('vader_lexicon', quiet=True)
-        return SentimentIntensityAnalyzer()
-    except Exception as e:
-        st.error(f"Erro ao inicializar analisador de sentimento: {str(e)}")
-        return None
+def exibir_job(job: dict, origem: str = "sessao") -> None:
+    """Mostra o andamento ou o resultado de um job da fila."""
+    descricao = "Análise" if job['tipo'] == 'analise' else "Relatório"
+    st.markdown(f"**{descricao}** · {job['parametros'].get('tema', '')} · `{job['id']}` · {job['criado_em']}")
+    
+    if job['status'] in (STATUS_PENDENTE, STATUS_EXECUTANDO):
+        st.progress(job['progresso'], text=job['mensagem'] or '')
+    elif job['status'] == STATUS_ERRO:
+        st.error(f"Falha no job: {job['mensagem']}")
+    elif job['status'] == STATUS_CONCLUIDO:
+        resultado = job['resultado'] or {}
+        if job['tipo'] == 'analise':
+            if resultado.get('resposta'):
+                if st.button("Abrir no chat", key=f"abrir_job_{origem}_{job['id']}"):
+                    registrar_resultado_analise(resultado)
+                    st.rerun()
+            else:
+                st.warning("Nenhuma notícia encontrada para o tema informado.")
+        elif job['tipo'] == 'relatorio':
+            st.download_button(
+                label="Baixar Relatório Executivo",
+                data=base64.b64decode(resultado['pdf_b64']),
+                file_name=resultado['nome_arquivo'],
+                mime="application/pdf",
+                key=f"baixar_job_{origem}_{job['id']}"
+            )
 
-# Função para analisar sentimento do texto
-def analisar_sentimento(texto):
-    sia = inicializar_analisador_sentimento()
-    if sia:
-        sentimento = sia.polarity_scores(texto)
-        return sentimento
-    return None
+# Painel de jobs: atualiza sozinho enquanto houver jobs em andamento
+jobs_sessao = fila_jobs.listar(st.session_state.id_sessao, limite=10)
+jobs_ativos = any(job['status'] in (STATUS_PENDENTE, STATUS_EXECUTANDO) for job in jobs_sessao)
+
+@st.fragment(run_every=3 if jobs_ativos else None)
+def painel_jobs():
+    jobs = fila_jobs.listar(st.session_state.id_sessao, limite=10)
+    for job in jobs:
+        exibir_job(job)
+    # Quando tudo terminar, um rerun completo encerra a atualização automática
+    if jobs_ativos and not any(job['status'] in (STATUS_PENDENTE, STATUS_EXECUTANDO) for job in jobs):
+        st.rerun()
+
+st.write("---")
+st.subheader("Análises em segundo plano")
+if jobs_sessao:
+    painel_jobs()
+else:
+    st.write("Nenhum job nesta sessão.")
+
+# Resultados ficam persistidos e podem ser reabertos em outra sessão pelo ID
+id_job_consulta = st.text_input("Abrir um job pelo ID:", key="id_job_consulta")
+if id_job_consulta:
+    job_consultado = fila_jobs.obter(id_job_consulta)
+    if job_consultado:
+        exibir_job(job_consultado, origem="consulta")
+    else:
+        st.warning("Job não encontrado.")
+
+# Tendências por tema, lidas apenas dos agregados diários/semanais
+with st.expander("Tendências por tema"):
+    metricas = obter_metricas()
+    temas_monitorados = metricas.temas()
+    if temas_monitorados:
+        col_tema, col_granularidade = st.columns([3, 1])
+        with col_tema:
+            tema_tendencia = st.selectbox("Tema:", temas_monitorados, key="tema_tendencia")
+        with col_granularidade:
+            granularidade = {"Dia": "diario", "Semana": "semanal"}[
+                st.radio("Agrupar por:", ["Dia", "Semana"], key="granularidade_tendencia", horizontal=True)
+            ]
+        
+        serie = metricas.tendencia(tema_tendencia, granularidade)
+        fig_artigos = px.bar(serie, x='periodo', y='artigos', title="Artigos distintos analisados",
+                             color_discrete_sequence=['#4D268C'])
+        fig_artigos.update_layout(xaxis_title='', yaxis_title='')
+        st.plotly_chart(fig_artigos, key="grafico_tendencia_artigos")
+        
+        if serie['sentimento_medio'].notna().any():
+            fig_sentimento = px.line(serie, x='periodo', y='sentimento_medio', markers=True,
+                                     title="Sentimento médio - VADER (-1 a 1)", color_discrete_sequence=['#FCA629'])
+            fig_sentimento.update_layout(xaxis_title='', yaxis_title='', yaxis_range=[-1, 1])
+            st.plotly_chart(fig_sentimento, key="grafico_tendencia_sentimento")
+            st.caption("O VADER usa um léxico em inglês: em notícias em português ele reconhece "
+                       "poucas palavras, então use a curva só como indicação de tendência.")
+        
+        por_veiculo = metricas.veiculos(tema_tendencia, granularidade)
+        if not por_veiculo.empty:
+            fig_veiculos = px.bar(por_veiculo, x='periodo', y='artigos', color='veiculo',
+                                  title="Artigos por veículo")
+            fig_veiculos.update_layout(xaxis_title='', yaxis_title='', legend_title_text='')
+            st.plotly_chart(fig_veiculos, key="grafico_tendencia_veiculos")
+    else:
+        st.write("Nenhuma análise registrada ainda.")
+
+# Consumo de tokens e custos estimados (sessão e últimos dias)
+with st.expander("Consumo de tokens e custos"):
+    registro_uso = obter_registro_uso()
+    colunas_consumo = {
+        'modelo': 'Modelo', 'dia': 'Dia', 'requisicoes': 'Requisições',
+        'prompt_tokens': 'Tokens de entrada', 'completion_tokens': 'Tokens de saída',
+        'latencia_media_ms': 'Latência média (ms)', 'custo_usd': 'Custo (US$)'
+    }
+    
+    uso_sessao = registro_uso.resumo_sessao(st.session_state.id_sessao)
+    st.write("**Nesta sessão**")
+    if uso_sessao:
+        st.dataframe(pd.DataFrame(uso_sessao).rename(columns=colunas_consumo).round(4), hide_index=True)
+    else:
+        st.write("Nenhuma chamada à IA nesta sessão.")
+    
+    uso_diario = registro_uso.resumo_diario(dias=30)
+    st.write("**Por dia (todas as sessões)**")
+    if uso_diario:
+        st.dataframe(pd.DataFrame(uso_diario).rename(columns=colunas_consumo).round(4), hide_index=True)
+    else:
+        st.write("Nenhum consumo registrado.")
 
 
 def criar_prompt_avancado(tema, diretriz, textos, imagens=None):
@@ -851,7 +1214,6 @@ def criar_prompt_avancado(tema, diretriz, textos, imagens=None):
     # Adiciona descrição de imagens se disponíveis
     if imagens and len(imagens) > 0:
         prompt += "\n\nImagens relevantes encontradas nas notícias:\n"
-        for i, img in enumerate(imagens):
-            prompt += f"{i+1}. {img.get('alt', 'Imagem sem descrição')} (URL: {img.get('url', 'N/A')})\n"
+        prompt += imagens_para_prompt(imagens) + "\n"
     
     return prompt
\ No newline at end of file
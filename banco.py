@@ -0,0 +1,32 @@
+"""
+Conexões SQLite compartilhadas pelos armazenamentos locais do app.
+
+Métricas, uso da API e a fila de jobs abrem uma conexão por operação: o
+sqlite3 não compartilha conexões entre threads, e as sessões do Streamlit
+rodam em threads diferentes. O modo WAL deixa leituras concorrentes com uma
+gravação, e ``isolation_level=None`` entrega o controle das transações ao
+chamador (``BEGIN``/``COMMIT`` explícitos).
+"""
+import sqlite3
+from contextlib import contextmanager
+from typing import Iterator
+
+
+@contextmanager
+def conectar(caminho_db: str) -> Iterator[sqlite3.Connection]:
+    """
+    Abre uma conexão em modo WAL, em autocommit e com linhas acessíveis por nome.
+
+    Args:
+        caminho_db: Arquivo do banco
+
+    Yields:
+        sqlite3.Connection: Conexão fechada ao sair do bloco
+    """
+    conexao = sqlite3.connect(caminho_db, timeout=30, isolation_level=None)
+    conexao.row_factory = sqlite3.Row
+    try:
+        conexao.execute("PRAGMA journal_mode=WAL")
+        yield conexao
+    finally:
+        conexao.close()
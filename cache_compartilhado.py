@@ -0,0 +1,212 @@
+"""
+Coalescência de requisições (single-flight) e cache compartilhado entre sessões.
+
+O Streamlit executa cada sessão em sua própria thread, mas todas dentro do mesmo
+processo. Os objetos deste módulo vivem no nível do processo, então quando
+vários usuários analisam o mesmo tema ao mesmo tempo, buscas, downloads de
+páginas e chamadas à OpenAI idênticos são executados uma única vez: a primeira
+thread executa a operação e as demais aguardam e recebem o mesmo resultado.
+
+Os resultados ficam em um cache limitado (LRU com expiração), então os valores
+devolvidos devem ser tratados como somente leitura.
+
+Duas variáveis de ambiente servem ao gerador de carga (carga.py):
+
+- ``CACHE_COMPARTILHADO=desativado`` mantém a coalescência, mas desliga os
+  caches de resultado, para que cada análise vá de fato às fontes;
+- ``ESTATISTICAS_CACHE=arquivo.json`` grava periodicamente os contadores das
+  instâncias compartilhadas nesse arquivo.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+
+class CacheLimitado:
+    """Cache LRU com tempo de expiração, seguro para uso entre threads."""
+
+    def __init__(self, max_itens: int = 256, ttl: float = 3600):
+        """
+        Args:
+            max_itens: Quantidade máxima de entradas mantidas
+            ttl: Tempo de vida de cada entrada, em segundos
+        """
+        self.max_itens = max_itens
+        self.ttl = ttl
+        self._itens: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.acertos = 0
+        self.falhas = 0
+
+    def obter(self, chave: Hashable) -> Tuple[bool, Any]:
+        """
+        Busca uma entrada válida no cache.
+
+        Returns:
+            tuple: (encontrado, valor)
+        """
+        with self._lock:
+            item = self._itens.get(chave)
+            if item is not None:
+                expira_em, valor = item
+                if expira_em > time.monotonic():
+                    self._itens.move_to_end(chave)
+                    self.acertos += 1
+                    return True, valor
+                del self._itens[chave]
+            self.falhas += 1
+            return False, None
+
+    def guardar(self, chave: Hashable, valor: Any) -> None:
+        """Armazena um valor, descartando as entradas menos usadas se necessário."""
+        with self._lock:
+            self._itens[chave] = (time.monotonic() + self.ttl, valor)
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.max_itens:
+                self._itens.popitem(last=False)
+
+    def limpar(self) -> None:
+        with self._lock:
+            self._itens.clear()
+
+    def __len__(self) -> int:
+        return len(self._itens)
+
+
+class _Chamada:
+    """Operação em andamento compartilhada pelas threads que a aguardam."""
+
+    def __init__(self):
+        self.evento = threading.Event()
+        self.resultado = None
+        self.erro: Optional[BaseException] = None
+        self.aguardando = 0
+
+
+class SingleFlight:
+    """
+    Garante que chamadas concorrentes com a mesma chave executem uma única vez.
+
+    A primeira thread a pedir uma chave executa a função; as que chegarem
+    enquanto ela está em andamento aguardam e recebem o mesmo resultado (ou a
+    mesma exceção). Resultados aceitos pelo critério ``armazenar`` vão para o
+    cache compartilhado e atendem as chamadas seguintes sem nova execução.
+    """
+
+    def __init__(self, cache: Optional[CacheLimitado] = None):
+        self.cache = cache
+        self._em_andamento: Dict[Hashable, _Chamada] = {}
+        self._lock = threading.Lock()
+        self.execucoes = 0
+        self.coalescidas = 0
+
+    def executar(self, chave: Hashable, funcao: Callable, *args,
+                 armazenar: Optional[Callable[[Any], bool]] = None, **kwargs) -> Any:
+        """
+        Executa ``funcao(*args, **kwargs)`` uma única vez por chave.
+
+        Args:
+            chave: Identificador da operação (deve ser hashable)
+            funcao: Função a executar
+            armazenar: Critério para guardar o resultado no cache; por padrão
+                qualquer resultado "verdadeiro" é guardado
+
+        Returns:
+            Resultado da função, do cache ou da execução compartilhada
+        """
+        if self.cache is not None:
+            encontrado, valor = self.cache.obter(chave)
+            if encontrado:
+                return valor
+
+        with self._lock:
+            chamada = self._em_andamento.get(chave)
+            lider = chamada is None
+            if lider:
+                chamada = _Chamada()
+                self._em_andamento[chave] = chamada
+                self.execucoes += 1
+            else:
+                chamada.aguardando += 1
+                self.coalescidas += 1
+
+        if not lider:
+            chamada.evento.wait()
+            if chamada.erro is not None:
+                raise chamada.erro
+            return chamada.resultado
+
+        try:
+            chamada.resultado = funcao(*args, **kwargs)
+            criterio = armazenar if armazenar is not None else bool
+            if self.cache is not None and criterio(chamada.resultado):
+                self.cache.guardar(chave, chamada.resultado)
+            return chamada.resultado
+        except BaseException as e:
+            chamada.erro = e
+            raise
+        finally:
+            with self._lock:
+                del self._em_andamento[chave]
+            chamada.evento.set()
+
+    def estatisticas(self) -> Dict[str, int]:
+        """Contadores de execuções, chamadas coalescidas e acertos de cache."""
+        return {
+            'execucoes': self.execucoes,
+            'coalescidas': self.coalescidas,
+            'acertos_cache': self.cache.acertos if self.cache is not None else 0,
+            'itens_cache': len(self.cache) if self.cache is not None else 0,
+        }
+
+
+def gerar_chave(*partes: Any) -> str:
+    """
+    Gera uma chave estável a partir de valores serializáveis em JSON.
+
+    Útil para chaves compostas por dicionários e listas, como o corpo de uma
+    requisição à OpenAI.
+    """
+    serializado = json.dumps(partes, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(serializado.encode('utf-8')).hexdigest()
+
+
+def _cache(max_itens: int, ttl: float) -> Optional[CacheLimitado]:
+    if os.getenv('CACHE_COMPARTILHADO', 'ativo') == 'desativado':
+        return None
+    return CacheLimitado(max_itens=max_itens, ttl=ttl)
+
+
+# Instâncias compartilhadas por todas as sessões do processo
+buscas = SingleFlight(_cache(max_itens=256, ttl=3600))       # Cache por 1 hora
+paginas = SingleFlight(_cache(max_itens=1024, ttl=3600))
+completions = SingleFlight(_cache(max_itens=256, ttl=1800))
+
+
+def estatisticas() -> Dict[str, Dict[str, int]]:
+    """Contadores das instâncias compartilhadas do processo."""
+    return {'buscas': buscas.estatisticas(), 'paginas': paginas.estatisticas(),
+            'completions': completions.estatisticas()}
+
+
+def _exportar_estatisticas(caminho: str, intervalo: float) -> None:
+    temporario = f"{caminho}.{os.getpid()}.tmp"
+    while True:
+        try:
+            with open(temporario, 'w', encoding='utf-8') as f:
+                json.dump(estatisticas(), f)
+            os.replace(temporario, caminho)
+        except OSError:
+            pass
+        time.sleep(intervalo)
+
+
+INTERVALO_ESTATISTICAS = 0.5
+
+if os.getenv('ESTATISTICAS_CACHE'):
+    threading.Thread(target=_exportar_estatisticas, args=(os.environ['ESTATISTICAS_CACHE'], INTERVALO_ESTATISTICAS),
+                     name='estatisticas-cache', daemon=True).start()
@@ -0,0 +1,463 @@
+"""
+Gerador de carga: simula N sessões concorrentes do Streamlit.
+
+Cada sessão abre uma conexão WebSocket com um servidor ``streamlit run`` real,
+como um navegador, e percorre o fluxo "Analisar" -> "Enviar pergunta" ->
+"Gerar Relatório Executivo". Todas as sessões compartilham o mesmo processo do
+app (caches, cliente da API, fila de jobs), exatamente como em produção. As
+chamadas externas são atendidas pelo servidor de reprodução (replay.py) a
+partir de um cassete gravado, então o teste não toca SerpAPI, sites de
+notícias ou OpenAI.
+
+As dependências do teste de carga (websockets) ficam em requirements-dev.txt:
+
+    pip install -r requirements-dev.txt
+
+Para gravar um cassete, rode o app normalmente com:
+
+    REPLAY_MODO=gravar REPLAY_CASSETE=cassetes/tema.jsonl streamlit run Meu_app.py
+
+E para medir (sobe o servidor de reprodução e o app em modo reprodução, com
+bancos e segredos temporários):
+
+    python carga.py cassetes/tema.jsonl --sessoes 10 --iteracoes 2 --latencia
+
+Para medir um app que já está no ar (iniciado com REPLAY_MODO=reproduzir):
+
+    python carga.py cassetes/tema.jsonl --url http://localhost:8501 --sessoes 10
+
+As sessões alternam entre todos os temas gravados no cassete (ou os passados
+em ``--tema``, que pode se repetir). Com os caches compartilhados ativos,
+fluxos repetidos são respondidos da memória e quase não exercitam downloads
+nem chamadas à IA. ``--sem-cache`` sobe o app com os caches de resultado
+desligados. O relatório mostra, ao lado das latências, as execuções, as
+chamadas coalescidas e os acertos de cache do app, além das requisições que
+chegaram ao servidor de reprodução (as fontes). Esses números só aparecem
+quando o app é iniciado pelo carga.py, e contam apenas a fase medida, sem o
+aquecimento.
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+
+import requests
+import websockets
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+CAMINHO_APP = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Meu_app.py')
+ETAPAS = ('abrir', 'analisar', 'pergunta', 'relatorio')
+
+ROTULO_TEMA = 'Digite o termo'
+ROTULO_DIRETRIZ = 'Qual a diretriz'
+ROTULO_PERGUNTA = 'Deseja continuar a análise'
+ROTULO_ANALISAR = 'Analisar'
+ROTULO_ENVIAR = 'Enviar pergunta'
+ROTULO_RELATORIO = 'Gerar Relatório Executivo'
+ROTULO_DOWNLOAD = 'Baixar Relatório Executivo'
+
+_FIM_DA_EXECUCAO = (ForwardMsg.FINISHED_SUCCESSFULLY, ForwardMsg.FINISHED_WITH_COMPILE_ERROR)
+
+
+class SessaoSimulada:
+    """
+    Uma sessão do app dirigida pelo protocolo do navegador.
+
+    A cada execução do script, guarda os widgets e erros exibidos. Os valores
+    dos campos de texto preenchidos são reenviados em todas as execuções
+    seguintes, como o navegador faz.
+    """
+
+    def __init__(self, url: str, timeout: float):
+        self.url = url.rstrip('/')
+        self.timeout = timeout
+        self.widgets = {}
+        self.erros = []
+        self._textos = {}
+        self._conexao = None
+
+    async def conectar(self) -> None:
+        endereco = urlparse(self.url)
+        esquema = 'wss' if endereco.scheme == 'https' else 'ws'
+        self._conexao = await websockets.connect(
+            f"{esquema}://{endereco.netloc}{endereco.path}/_stcore/stream",
+            subprotocols=['streamlit'],
+            origin=f"{endereco.scheme}://{endereco.netloc}",
+            max_size=None
+        )
+
+    async def fechar(self) -> None:
+        if self._conexao is not None:
+            await self._conexao.close()
+
+    def _widget(self, inicio_rotulo: str) -> str:
+        for rotulo, id_widget in self.widgets.items():
+            if rotulo.startswith(inicio_rotulo):
+                return id_widget
+        raise LookupError(f"Widget não encontrado na tela: {inicio_rotulo}")
+
+    def preencher(self, inicio_rotulo: str, valor: str) -> None:
+        self._textos[self._widget(inicio_rotulo)] = valor
+
+    def tem_widget(self, inicio_rotulo: str) -> bool:
+        return any(rotulo.startswith(inicio_rotulo) for rotulo in self.widgets)
+
+    async def executar(self, clicar: Optional[str] = None) -> None:
+        """Pede uma execução do script (opcionalmente clicando em um botão) e espera o fim."""
+        mensagem = BackMsg()
+        estados = mensagem.rerun_script.widget_states
+        estados.SetInParent()  # Marca a mensagem como rerun mesmo sem widgets preenchidos
+        for id_widget, valor in self._textos.items():
+            estado = estados.widgets.add()
+            estado.id = id_widget
+            estado.string_value = valor
+        if clicar is not None:
+            estado = estados.widgets.add()
+            estado.id = self._widget(clicar)
+            estado.trigger_value = True
+        await self._conexao.send(mensagem.SerializeToString())
+        await asyncio.wait_for(self._receber_ate_o_fim(), self.timeout)
+
+    async def _receber_ate_o_fim(self) -> None:
+        while True:
+            mensagem = ForwardMsg()
+            mensagem.ParseFromString(await self._conexao.recv())
+            tipo = mensagem.WhichOneof('type')
+            if tipo == 'new_session':
+                self.widgets = {}
+                self.erros = []
+            elif tipo == 'delta' and mensagem.delta.WhichOneof('type') == 'new_element':
+                self._registrar_elemento(mensagem.delta.new_element)
+            elif tipo == 'script_finished' and mensagem.script_finished in _FIM_DA_EXECUCAO:
+                return
+
+    def _registrar_elemento(self, elemento) -> None:
+        tipo = elemento.WhichOneof('type')
+        if tipo == 'exception':
+            self.erros.append(f"{elemento.exception.type}: {elemento.exception.message}")
+        elif tipo == 'alert' and elemento.alert.format == elemento.alert.ERROR:
+            self.erros.append(elemento.alert.body)
+        elif tipo in ('text_input', 'button', 'download_button'):
+            widget = getattr(elemento, tipo)
+            self.widgets[widget.label] = widget.id
+
+
+async def _medir(medicoes: List[dict], etapa: str, sessao: SessaoSimulada, acao,
+                 esperado: Optional[str] = None) -> bool:
+    """Executa uma etapa, registrando duração e falha (exceção, erro na tela ou widget ausente)."""
+    inicio = time.perf_counter()
+    erro = None
+    try:
+        await acao()
+        if sessao.erros:
+            erro = sessao.erros[0]
+        elif esperado is not None and not sessao.tem_widget(esperado):
+            erro = f"'{esperado}' não apareceu na tela"
+    except Exception as e:
+        erro = repr(e)
+    medicoes.append({'etapa': etapa, 'segundos': time.perf_counter() - inicio, 'erro': erro})
+    return erro is None
+
+
+async def simular_sessao(url: str, temas: List[str], diretriz: str, pergunta: str, iteracoes: int,
+                         timeout: float, indice: int = 0) -> List[dict]:
+    """
+    Percorre o fluxo completo ``iteracoes`` vezes, cada uma em uma sessão nova.
+
+    Os temas são alternados: a iteração ``j`` da sessão ``indice`` usa
+    ``temas[(indice + j) % len(temas)]``, então sessões simultâneas pesquisam
+    temas diferentes enquanto houver temas suficientes.
+
+    Returns:
+        list: Medições com etapa, tema, duração em segundos e erro (ou None)
+    """
+    medicoes = []
+    for iteracao in range(iteracoes):
+        tema = temas[(indice + iteracao) % len(temas)]
+        sessao = SessaoSimulada(url, timeout)
+        medicoes_fluxo = []
+
+        async def abrir():
+            await sessao.conectar()
+            await sessao.executar()
+
+        async def analisar():
+            sessao.preencher(ROTULO_TEMA, tema)
+            sessao.preencher(ROTULO_DIRETRIZ, diretriz)
+            await sessao.executar(clicar=ROTULO_ANALISAR)
+
+        async def perguntar():
+            sessao.preencher(ROTULO_PERGUNTA, pergunta)
+            await sessao.executar(clicar=ROTULO_ENVIAR)
+
+        try:
+            _ = (await _medir(medicoes_fluxo, 'abrir', sessao, abrir, ROTULO_ANALISAR)
+                 and await _medir(medicoes_fluxo, 'analisar', sessao, analisar, ROTULO_RELATORIO)
+                 and await _medir(medicoes_fluxo, 'pergunta', sessao, perguntar, ROTULO_RELATORIO)
+                 and await _medir(medicoes_fluxo, 'relatorio', sessao,
+                                  lambda: sessao.executar(clicar=ROTULO_RELATORIO), ROTULO_DOWNLOAD))
+        finally:
+            await sessao.fechar()
+        medicoes.extend(dict(medicao, tema=tema) for medicao in medicoes_fluxo)
+    return medicoes
+
+
+def percentil(valores: List[float], p: float) -> float:
+    """Percentil por interpolação linear (p entre 0 e 100)."""
+    ordenados = sorted(valores)
+    if len(ordenados) == 1:
+        return ordenados[0]
+    posicao = (len(ordenados) - 1) * p / 100
+    inferior = int(posicao)
+    superior = min(inferior + 1, len(ordenados) - 1)
+    return ordenados[inferior] + (ordenados[superior] - ordenados[inferior]) * (posicao - inferior)
+
+
+def resumir(medicoes: List[dict], duracao: float) -> Dict[str, dict]:
+    """Vazão e latências (p50/p95/p99/máx) por etapa."""
+    por_etapa = defaultdict(list)
+    erros = defaultdict(int)
+    for medicao in medicoes:
+        if medicao['erro'] is None:
+            por_etapa[medicao['etapa']].append(medicao['segundos'])
+        else:
+            erros[medicao['etapa']] += 1
+
+    resumo = {}
+    for etapa in ETAPAS:
+        tempos = por_etapa.get(etapa, [])
+        resumo[etapa] = {
+            'ok': len(tempos),
+            'erros': erros.get(etapa, 0),
+            'por_segundo': len(tempos) / duracao if duracao else 0.0,
+            'p50': statistics.median(tempos) if tempos else None,
+            'p95': percentil(tempos, 95) if tempos else None,
+            'p99': percentil(tempos, 99) if tempos else None,
+            'max': max(tempos) if tempos else None,
+        }
+    return resumo
+
+
+def _porta_livre() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def iniciar_app(url_replay: str, timeout: float = 60, variaveis: Optional[Dict[str, str]] = None):
+    """
+    Sobe o app com ``streamlit run`` em modo reprodução.
+
+    Bancos locais e segredos (fictícios) ficam em uma pasta temporária, para não
+    misturar com os dados reais.
+
+    Args:
+        url_replay: Servidor de reprodução
+        timeout: Tempo máximo para o app responder ao health check
+        variaveis: Variáveis de ambiente adicionais do app
+
+    Returns:
+        tuple: (processo, url do app)
+    """
+    from replay import MODO_REPRODUZIR
+
+    pasta_dados = tempfile.mkdtemp(prefix='carga_')
+    arquivo_segredos = os.path.join(pasta_dados, 'secrets.toml')
+    with open(arquivo_segredos, 'w', encoding='utf-8') as f:
+        f.write('[openai]\napi_key = "sk-replay"\n\n[serpapi]\napi_key = "replay"\n')
+
+    ambiente = dict(os.environ, **{
+        'REPLAY_MODO': MODO_REPRODUZIR,
+        'REPLAY_URL': url_replay,
+        'JOBS_DB': os.path.join(pasta_dados, 'jobs.db'),
+        'USO_DB': os.path.join(pasta_dados, 'uso.db'),
+        'METRICAS_DB': os.path.join(pasta_dados, 'metricas.db'),
+        'MINIATURAS_DIR': os.path.join(pasta_dados, 'miniaturas'),
+    }, **(variaveis or {}))
+    porta = _porta_livre()
+    processo = subprocess.Popen(
+        [sys.executable, '-m', 'streamlit', 'run', CAMINHO_APP,
+         '--server.headless', 'true', '--server.port', str(porta),
+         '--browser.gatherUsageStats', 'false', '--secrets.files', arquivo_segredos],
+        env=ambiente, cwd=os.path.dirname(CAMINHO_APP),
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+    url = f"http://127.0.0.1:{porta}"
+    limite = time.monotonic() + timeout
+    while time.monotonic() < limite:
+        if processo.poll() is not None:
+            raise RuntimeError(f"O app encerrou durante a inicialização (código {processo.returncode})")
+        try:
+            if requests.get(f"{url}/_stcore/health", timeout=2).ok:
+                return processo, url
+        except requests.ConnectionError:
+            pass
+        time.sleep(0.5)
+    processo.terminate()
+    raise TimeoutError("O app não respondeu ao health check a tempo")
+
+
+async def _disparar_sessoes(url: str, sessoes: int, intervalo_inicio: float, **kwargs) -> List[dict]:
+    async def iniciar(i: int):
+        await asyncio.sleep(i * intervalo_inicio)
+        return await simular_sessao(url, indice=i, **kwargs)
+
+    resultados = await asyncio.gather(*(iniciar(i) for i in range(sessoes)))
+    return [medicao for resultado in resultados for medicao in resultado]
+
+
+def _ler_estatisticas(caminho: str) -> Optional[Dict[str, Dict[str, int]]]:
+    """Contadores exportados pelo app, após dar tempo para a próxima gravação."""
+    from cache_compartilhado import INTERVALO_ESTATISTICAS
+
+    time.sleep(INTERVALO_ESTATISTICAS * 3)
+    try:
+        with open(caminho, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _diferenca_caches(antes: Optional[dict], depois: Optional[dict]) -> Optional[Dict[str, Dict[str, int]]]:
+    if antes is None or depois is None:
+        return None
+    return {
+        nome: {contador: valores[contador] - antes[nome][contador]
+               for contador in ('execucoes', 'coalescidas', 'acertos_cache')}
+        for nome, valores in depois.items()
+    }
+
+
+def executar_carga(cassete: str, sessoes: int, iteracoes: int, temas: List[str] = None,
+                   diretriz: str = 'Impactos para escolas particulares',
+                   pergunta: str = 'Quais os principais riscos?', simular_latencia: bool = False,
+                   intervalo_inicio: float = 0.0, timeout: float = 120, url: str = None,
+                   sem_cache: bool = False) -> Dict[str, dict]:
+    """
+    Dispara as sessões simuladas contra o app servindo o cassete.
+
+    Args:
+        cassete: Cassete gravado com buscas, páginas e respostas da IA
+        sessoes: Número de sessões concorrentes
+        iteracoes: Fluxos completos por sessão
+        temas: Temas alternados entre as sessões (padrão: todas as buscas
+            gravadas no cassete)
+        diretriz: Diretriz de análise
+        pergunta: Pergunta de continuação
+        simular_latencia: Repete a latência observada na gravação
+        intervalo_inicio: Segundos entre o início de cada sessão (rampa)
+        timeout: Tempo máximo de cada execução do script
+        url: App já em execução (em modo reprodução); se omitido, o servidor de
+            reprodução e o app são iniciados aqui
+        sem_cache: Sobe o app com os caches de resultado compartilhados
+            desligados (CACHE_COMPARTILHADO=desativado)
+
+    Returns:
+        dict: Resumo por etapa, contadores de cache e das fontes (None se o
+        app não foi iniciado aqui) e totais do teste
+    """
+    from replay import Cassete, iniciar_servidor_replay
+
+    if not temas:
+        temas = list(Cassete(cassete).dados['buscas'])
+        if not temas:
+            raise ValueError("O cassete não tem buscas gravadas; informe --tema")
+    if sem_cache and url is not None:
+        raise ValueError("--sem-cache só vale quando o app é iniciado pelo carga.py (sem --url)")
+
+    servidor = processo = None
+    arquivo_estatisticas = None
+    if url is None:
+        servidor, url_replay = iniciar_servidor_replay(cassete, simular_latencia=simular_latencia)
+        arquivo_estatisticas = os.path.join(tempfile.mkdtemp(prefix='carga_cache_'), 'estatisticas.json')
+        variaveis = {'ESTATISTICAS_CACHE': arquivo_estatisticas}
+        if sem_cache:
+            variaveis['CACHE_COMPARTILHADO'] = 'desativado'
+        processo, url = iniciar_app(url_replay, variaveis=variaveis)
+
+    try:
+        # Sessão de aquecimento: cria os recursos compartilhados (st.cache_resource)
+        # antes da concorrência. Os contadores abaixo descontam o aquecimento.
+        asyncio.run(_disparar_sessoes(url, 1, 0, temas=temas, diretriz=diretriz, pergunta=pergunta,
+                                      iteracoes=1, timeout=timeout))
+        caches_antes = _ler_estatisticas(arquivo_estatisticas) if arquivo_estatisticas else None
+        fontes_antes = Counter(servidor.requisicoes) if servidor is not None else None
+
+        inicio = time.perf_counter()
+        medicoes = asyncio.run(_disparar_sessoes(url, sessoes, intervalo_inicio, temas=temas, diretriz=diretriz,
+                                                 pergunta=pergunta, iteracoes=iteracoes, timeout=timeout))
+        duracao = time.perf_counter() - inicio
+
+        caches = _diferenca_caches(caches_antes,
+                                   _ler_estatisticas(arquivo_estatisticas) if arquivo_estatisticas else None)
+        fontes = dict(Counter(servidor.requisicoes) - fontes_antes) if servidor is not None else None
+    finally:
+        if processo is not None:
+            processo.terminate()
+            processo.wait()
+        if servidor is not None:
+            servidor.shutdown()
+
+    fluxos = sum(1 for m in medicoes if m['etapa'] == 'relatorio' and m['erro'] is None)
+    return {
+        'etapas': resumir(medicoes, duracao),
+        'temas': temas,
+        'caches': caches,
+        'fontes': fontes,
+        'duracao': duracao,
+        'fluxos_completos': fluxos,
+        'fluxos_por_minuto': fluxos / duracao * 60 if duracao else 0.0,
+        'erros': [m for m in medicoes if m['erro'] is not None][:10],
+    }
+
+
+def _formatar(segundos) -> str:
+    return '-' if segundos is None else f"{segundos:.2f}s"
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Gerador de carga com sessões simuladas do Streamlit')
+    parser.add_argument('cassete')
+    parser.add_argument('--sessoes', type=int, default=5)
+    parser.add_argument('--iteracoes', type=int, default=1)
+    parser.add_argument('--tema', action='append', help='Tema a pesquisar (pode se repetir)')
+    parser.add_argument('--url', help='App já em execução em modo reprodução')
+    parser.add_argument('--latencia', action='store_true', help='Simula a latência gravada')
+    parser.add_argument('--rampa', type=float, default=0.0, help='Segundos entre o início das sessões')
+    parser.add_argument('--sem-cache', action='store_true',
+                        help='Desliga os caches compartilhados de buscas, páginas e respostas da IA')
+    args = parser.parse_args()
+
+    resultado = executar_carga(args.cassete, args.sessoes, args.iteracoes, temas=args.tema,
+                               simular_latencia=args.latencia, intervalo_inicio=args.rampa, url=args.url,
+                               sem_cache=args.sem_cache)
+
+    print(f"Sessões: {args.sessoes}  Iterações: {args.iteracoes}  Duração: {resultado['duracao']:.1f}s")
+    print(f"Temas ({len(resultado['temas'])}): {', '.join(resultado['temas'])}"
+          + ("  [caches desligados]" if args.sem_cache else ""))
+    print(f"Fluxos completos: {resultado['fluxos_completos']} ({resultado['fluxos_por_minuto']:.1f}/min)")
+    print(f"{'etapa':<10} {'ok':>4} {'erros':>5} {'/s':>6} {'p50':>8} {'p95':>8} {'p99':>8} {'máx':>8}")
+    for etapa, m in resultado['etapas'].items():
+        print(f"{etapa:<10} {m['ok']:>4} {m['erros']:>5} {m['por_segundo']:>6.2f} {_formatar(m['p50']):>8} "
+              f"{_formatar(m['p95']):>8} {_formatar(m['p99']):>8} {_formatar(m['max']):>8}")
+
+    if resultado['caches'] is not None:
+        print(f"\n{'cache':<12} {'execuções':>9} {'coalescidas':>11} {'acertos':>7}")
+        for nome, c in resultado['caches'].items():
+            print(f"{nome:<12} {c['execucoes']:>9} {c['coalescidas']:>11} {c['acertos_cache']:>7}")
+    if resultado['fontes'] is not None:
+        fontes = ', '.join(f"{rota}={total}" for rota, total in sorted(resultado['fontes'].items()))
+        print(f"Requisições às fontes (servidor de reprodução): {fontes or 'nenhuma'}")
+    for erro in resultado['erros']:
+        print(f"ERRO em {erro['etapa']}: {erro['erro']}")
@@ -0,0 +1,279 @@
+"""
+Cliente compartilhado para a API de chat da OpenAI.
+
+Todas as sessões do Streamlit usam a mesma instância (via st.cache_resource),
+que mantém:
+
+- um pool de conexões keep-alive (requests.Session + HTTPAdapter);
+- um agendador por modelo, com baldes de tokens para requisições por minuto e
+  tokens por minuto, que distribui a vez entre as sessões em rodízio;
+- novas tentativas com backoff exponencial em 429/5xx, respeitando o
+  cabeçalho Retry-After enviado pela API. Tentativas recusadas devolvem ao
+  balde de TPM os tokens estimados, e a nova tentativa volta à frente do
+  rodízio.
+
+Assim, rajadas de 429 viram pequenas esperas em vez de erros na tela.
+"""
+import random
+import threading
+import time
+from collections import OrderedDict, deque
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Limites por modelo (requisições e tokens por minuto). Ajuste conforme o
+# tier da conta; modelos ausentes usam LIMITE_PADRAO.
+LIMITES_MODELOS = {
+    'gpt-4o-mini': {'rpm': 500, 'tpm': 200000},
+    'gpt-4o': {'rpm': 500, 'tpm': 30000},
+    'gpt-4.1-nano': {'rpm': 500, 'tpm': 200000},
+}
+LIMITE_PADRAO = {'rpm': 500, 'tpm': 30000}
+
+STATUS_REPETIVEIS = {429, 500, 502, 503, 504}
+
+
+def estimar_tokens(body_message: dict) -> int:
+    """
+    Estimativa conservadora de tokens de uma requisição.
+
+    A OpenAI contabiliza no limite de TPM o prompt mais o max_tokens pedido;
+    para o prompt usamos ~4 caracteres por token.
+    """
+    caracteres = sum(len(str(msg.get('content', ''))) for msg in body_message.get('messages', []))
+    return caracteres // 4 + int(body_message.get('max_tokens', 0) or 0)
+
+
+class BaldeDeTokens:
+    """Balde de tokens com reposição contínua. O saldo pode ficar negativo (dívida)."""
+
+    def __init__(self, capacidade: float, taxa_por_segundo: float):
+        self.capacidade = capacidade
+        self.taxa = taxa_por_segundo
+        self.saldo = capacidade
+        self._ultima = time.monotonic()
+
+    def _repor(self) -> None:
+        agora = time.monotonic()
+        self.saldo = min(self.capacidade, self.saldo + (agora - self._ultima) * self.taxa)
+        self._ultima = agora
+
+    def espera(self, quantidade: float) -> float:
+        """Segundos até haver saldo para ``quantidade`` (0 se já houver)."""
+        self._repor()
+        quantidade = min(quantidade, self.capacidade)
+        if self.saldo >= quantidade:
+            return 0.0
+        return (quantidade - self.saldo) / self.taxa
+
+    def consumir(self, quantidade: float) -> None:
+        self._repor()
+        self.saldo -= quantidade
+
+
+class AgendadorModelo:
+    """
+    Controla a vazão de um modelo respeitando RPM e TPM.
+
+    Os pedidos ficam em filas por sessão e a vez é dada em rodízio entre as
+    sessões com pedidos pendentes, para que uma sessão com muitas chamadas não
+    bloqueie as demais.
+    """
+
+    def __init__(self, rpm: int, tpm: int):
+        self.requisicoes = BaldeDeTokens(rpm, rpm / 60)
+        self.tokens = BaldeDeTokens(tpm, tpm / 60)
+        self._filas: "OrderedDict[str, deque]" = OrderedDict()
+        self._pausado_ate = 0.0
+        self._cond = threading.Condition()
+
+    def _proximo(self):
+        for fila in self._filas.values():
+            return fila[0]
+        return None
+
+    def adquirir(self, sessao: str, tokens_estimados: int, repeticao: bool = False) -> None:
+        """
+        Bloqueia até ser a vez da sessão e haver orçamento para a requisição.
+
+        Args:
+            sessao: Identificador da sessão no rodízio
+            tokens_estimados: Tokens reservados no balde de TPM
+            repeticao: Nova tentativa de uma requisição já atendida; entra na
+                frente do rodízio em vez de voltar para o fim
+        """
+        ticket = object()
+        with self._cond:
+            fila = self._filas.setdefault(sessao, deque())
+            if repeticao:
+                fila.appendleft(ticket)
+                self._filas.move_to_end(sessao, last=False)
+            else:
+                fila.append(ticket)
+            while True:
+                if self._proximo() is ticket:
+                    espera = max(
+                        self._pausado_ate - time.monotonic(),
+                        self.requisicoes.espera(1),
+                        self.tokens.espera(tokens_estimados),
+                    )
+                    if espera <= 0:
+                        self.requisicoes.consumir(1)
+                        self.tokens.consumir(tokens_estimados)
+                        fila = self._filas.pop(sessao)
+                        fila.popleft()
+                        if fila:
+                            # Volta para o fim do rodízio
+                            self._filas[sessao] = fila
+                        self._cond.notify_all()
+                        return
+                    self._cond.wait(espera)
+                else:
+                    self._cond.wait()
+
+    def ajustar(self, tokens_estimados: int, tokens_reais: int) -> None:
+        """Corrige o balde de TPM com o uso real informado pela API (0 devolve a reserva)."""
+        with self._cond:
+            self.tokens.consumir(tokens_reais - tokens_estimados)
+            self._cond.notify_all()
+
+    def pausar(self, segundos: float) -> None:
+        """Suspende novas requisições do modelo (após um 429)."""
+        with self._cond:
+            self._pausado_ate = max(self._pausado_ate, time.monotonic() + segundos)
+            self._cond.notify_all()
+
+
+def tempo_retry_after(response: requests.Response) -> Optional[float]:
+    """
+    Lê o tempo de espera sugerido pela API.
+
+    Aceita ``retry-after-ms``, ``Retry-After`` em segundos ou como data HTTP.
+    """
+    valor_ms = response.headers.get('retry-after-ms')
+    if valor_ms:
+        try:
+            return float(valor_ms) / 1000
+        except ValueError:
+            pass
+
+    valor = response.headers.get('Retry-After')
+    if not valor:
+        return None
+    try:
+        return max(float(valor), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(valor).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class ClienteAPI:
+    """Cliente HTTP compartilhado para a API de chat, com pool e agendamento."""
+
+    def __init__(self, api_url: str, headers: Dict[str, str], max_tentativas: int = 5,
+                 backoff_base: float = 1.0, backoff_maximo: float = 30.0,
+                 retry_after_maximo: float = 120.0, timeout: tuple = (5, 120), tamanho_pool: int = 20):
+        """
+        Args:
+            api_url: Endpoint de chat completions
+            headers: Cabeçalhos fixos (autorização e content-type)
+            max_tentativas: Número máximo de tentativas por requisição
+            backoff_base: Espera inicial entre tentativas, em segundos
+            backoff_maximo: Espera máxima do backoff exponencial, em segundos
+            retry_after_maximo: Maior Retry-After aceito; acima dele a
+                requisição falha na hora em vez de esperar
+            timeout: Timeout de conexão e de leitura, em segundos
+            tamanho_pool: Conexões keep-alive mantidas no pool
+        """
+        self.api_url = api_url
+        self.max_tentativas = max_tentativas
+        self.backoff_base = backoff_base
+        self.backoff_maximo = backoff_maximo
+        self.retry_after_maximo = retry_after_maximo
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        self.session.headers.update(headers)
+        adaptador = HTTPAdapter(pool_connections=tamanho_pool, pool_maxsize=tamanho_pool)
+        self.session.mount('https://', adaptador)
+        self.session.mount('http://', adaptador)
+
+        self._agendadores: Dict[str, AgendadorModelo] = {}
+        self._lock = threading.Lock()
+
+    def agendador(self, modelo: str) -> AgendadorModelo:
+        with self._lock:
+            if modelo not in self._agendadores:
+                limite = LIMITES_MODELOS.get(modelo, LIMITE_PADRAO)
+                self._agendadores[modelo] = AgendadorModelo(limite['rpm'], limite['tpm'])
+            return self._agendadores[modelo]
+
+    def _espera_backoff(self, tentativa: int, response: Optional[requests.Response]) -> float:
+        if response is not None:
+            sugerido = tempo_retry_after(response)
+            if sugerido is not None:
+                # Tentar antes do prazo pedido só rende outro 429
+                return sugerido
+        # Backoff exponencial com jitter
+        espera = self.backoff_base * (2 ** tentativa)
+        return min(espera, self.backoff_maximo) * random.uniform(0.5, 1.0)
+
+    def chat(self, body_message: dict, sessao: str = 'padrao') -> Tuple[dict, float]:
+        """
+        Envia uma requisição de chat completions.
+
+        Args:
+            body_message: Corpo da requisição
+            sessao: Identificador da sessão, usado no rodízio entre sessões
+
+        Returns:
+            tuple: (JSON da resposta da API, latência em ms da tentativa que
+            teve sucesso). A latência não inclui a espera no agendador nem o
+            backoff entre tentativas.
+
+        Raises:
+            requests.HTTPError: Se a API continuar falhando após as tentativas
+                ou pedir uma espera maior que retry_after_maximo
+            requests.RequestException: Em falhas de rede persistentes
+        """
+        agendador = self.agendador(body_message.get('model', ''))
+        tokens_estimados = estimar_tokens(body_message)
+
+        for tentativa in range(self.max_tentativas):
+            ultima = tentativa == self.max_tentativas - 1
+            agendador.adquirir(sessao, tokens_estimados, repeticao=tentativa > 0)
+            response = None
+            try:
+                inicio = time.perf_counter()
+                response = self.session.post(self.api_url, json=body_message, timeout=self.timeout)
+                latencia_ms = (time.perf_counter() - inicio) * 1000
+            except (requests.ConnectionError, requests.Timeout):
+                # Tentativa sem resposta: devolve a reserva de tokens
+                agendador.ajustar(tokens_estimados, 0)
+                if ultima:
+                    raise
+            else:
+                if response.ok:
+                    dados = response.json()
+                    uso = dados.get('usage') or {}
+                    if uso.get('total_tokens'):
+                        agendador.ajustar(tokens_estimados, uso['total_tokens'])
+                    return dados, latencia_ms
+                # Requisição recusada não consome tokens
+                agendador.ajustar(tokens_estimados, 0)
+                if response.status_code not in STATUS_REPETIVEIS or ultima:
+                    response.raise_for_status()
+
+            espera = self._espera_backoff(tentativa, response)
+            if response is not None and espera > self.retry_after_maximo:
+                response.raise_for_status()
+            if response is not None and response.status_code == 429:
+                # O limite é da conta: segura as outras sessões também
+                agendador.pausar(espera)
+            time.sleep(espera)
@@ -0,0 +1,200 @@
+"""
+Contabilização de tokens, latência e custo das chamadas à OpenAI.
+
+Cada chamada real à API (acertos do cache compartilhado não contam) é gravada
+em SQLite com os tokens do bloco ``usage``, a latência e o custo estimado. Um
+agregado por dia e modelo é mantido incrementalmente a cada registro, então
+o resumo diário não precisa varrer o histórico.
+
+Também traz a política opcional de roteamento: perguntas curtas e simples de
+continuação vão para um modelo mais rápido e barato, desde que a latência
+recente dele não seja pior que a do modelo escolhido.
+"""
+import re
+import statistics
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from banco import conectar
+
+# Preço em dólares por 1 milhão de tokens (entrada, saída)
+PRECOS_MODELOS = {
+    'gpt-4o-mini': {'entrada': 0.15, 'saida': 0.60},
+    'gpt-4o': {'entrada': 2.50, 'saida': 10.00},
+    'gpt-4.1-nano': {'entrada': 0.10, 'saida': 0.40},
+}
+
+MODELO_RAPIDO = 'gpt-4.1-nano'
+TAMANHO_MAXIMO_PERGUNTA_SIMPLES = 280
+
+# Pedidos que exigem análise mais profunda ficam no modelo escolhido
+PADRAO_PERGUNTA_COMPLEXA = re.compile(
+    r'analis|compar|cen[áa]rio|projet|projeç|estrat[ée]g|detalh|aprofund|relat[óo]rio|'
+    r'explique|justifique|impacto|recomend|tabela|calcul',
+    re.IGNORECASE
+)
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS uso (
+    momento TEXT NOT NULL,
+    dia TEXT NOT NULL,
+    sessao TEXT,
+    tipo TEXT NOT NULL,
+    modelo TEXT NOT NULL,
+    roteado INTEGER NOT NULL DEFAULT 0,
+    prompt_tokens INTEGER NOT NULL,
+    completion_tokens INTEGER NOT NULL,
+    latencia_ms REAL NOT NULL,
+    custo_usd REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_uso_sessao ON uso (sessao);
+CREATE INDEX IF NOT EXISTS idx_uso_modelo ON uso (modelo, momento);
+CREATE TABLE IF NOT EXISTS uso_diario (
+    dia TEXT NOT NULL,
+    modelo TEXT NOT NULL,
+    requisicoes INTEGER NOT NULL,
+    prompt_tokens INTEGER NOT NULL,
+    completion_tokens INTEGER NOT NULL,
+    latencia_total_ms REAL NOT NULL,
+    custo_usd REAL NOT NULL,
+    PRIMARY KEY (dia, modelo)
+);
+"""
+
+
+def calcular_custo(modelo: str, prompt_tokens: int, completion_tokens: int) -> float:
+    """
+    Custo estimado de uma chamada, em dólares.
+
+    Modelos sem preço cadastrado custam 0 (e aparecem assim nos resumos).
+    """
+    preco = PRECOS_MODELOS.get(modelo)
+    if preco is None:
+        return 0.0
+    return (prompt_tokens * preco['entrada'] + completion_tokens * preco['saida']) / 1_000_000
+
+
+class RegistroUso:
+    """Armazena o uso por chamada e os agregados diários em SQLite."""
+
+    def __init__(self, caminho_db: str = 'uso.db'):
+        self.caminho_db = caminho_db
+        self._lock = threading.Lock()
+        with conectar(self.caminho_db) as conexao:
+            conexao.executescript(_ESQUEMA)
+
+    def registrar(self, modelo: str, uso: dict, latencia_ms: float, sessao: Optional[str] = None,
+                  tipo: str = 'analise', roteado: bool = False) -> float:
+        """
+        Registra uma chamada e atualiza o agregado do dia.
+
+        Args:
+            modelo: Modelo efetivamente usado
+            uso: Bloco ``usage`` da resposta da API
+            latencia_ms: Latência da chamada em milissegundos
+            sessao: Sessão de origem
+            tipo: 'analise' ou 'pergunta'
+            roteado: Se o modelo foi escolhido pela política de roteamento
+
+        Returns:
+            float: Custo estimado da chamada, em dólares
+        """
+        prompt_tokens = int(uso.get('prompt_tokens', 0) or 0)
+        completion_tokens = int(uso.get('completion_tokens', 0) or 0)
+        custo = calcular_custo(modelo, prompt_tokens, completion_tokens)
+        agora = datetime.now()
+        dia = agora.strftime('%Y-%m-%d')
+
+        with self._lock, conectar(self.caminho_db) as conexao:
+            conexao.execute("BEGIN")
+            conexao.execute(
+                "INSERT INTO uso VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (agora.isoformat(timespec='seconds'), dia, sessao, tipo, modelo, int(roteado),
+                 prompt_tokens, completion_tokens, latencia_ms, custo)
+            )
+            conexao.execute(
+                "INSERT INTO uso_diario VALUES (?, ?, 1, ?, ?, ?, ?) "
+                "ON CONFLICT (dia, modelo) DO UPDATE SET "
+                "requisicoes = requisicoes + 1, "
+                "prompt_tokens = prompt_tokens + excluded.prompt_tokens, "
+                "completion_tokens = completion_tokens + excluded.completion_tokens, "
+                "latencia_total_ms = latencia_total_ms + excluded.latencia_total_ms, "
+                "custo_usd = custo_usd + excluded.custo_usd",
+                (dia, modelo, prompt_tokens, completion_tokens, latencia_ms, custo)
+            )
+            conexao.execute("COMMIT")
+        return custo
+
+    def resumo_sessao(self, sessao: str) -> List[dict]:
+        """Totais por modelo de uma sessão."""
+        with conectar(self.caminho_db) as conexao:
+            linhas = conexao.execute(
+                "SELECT modelo, COUNT(*) AS requisicoes, SUM(prompt_tokens) AS prompt_tokens, "
+                "SUM(completion_tokens) AS completion_tokens, AVG(latencia_ms) AS latencia_media_ms, "
+                "SUM(custo_usd) AS custo_usd FROM uso WHERE sessao = ? GROUP BY modelo ORDER BY modelo",
+                (sessao,)
+            ).fetchall()
+        return [dict(linha) for linha in linhas]
+
+    def resumo_diario(self, dias: int = 30) -> List[dict]:
+        """Agregados por dia e modelo dos últimos ``dias`` dias com uso."""
+        with conectar(self.caminho_db) as conexao:
+            linhas = conexao.execute(
+                "SELECT dia, modelo, requisicoes, prompt_tokens, completion_tokens, "
+                "latencia_total_ms / requisicoes AS latencia_media_ms, custo_usd FROM uso_diario "
+                "WHERE dia IN (SELECT DISTINCT dia FROM uso_diario ORDER BY dia DESC LIMIT ?) "
+                "ORDER BY dia DESC, modelo",
+                (dias,)
+            ).fetchall()
+        return [dict(linha) for linha in linhas]
+
+    def latencia_mediana(self, modelo: str, ultimas: int = 20, tipo: str = 'pergunta') -> Optional[float]:
+        """
+        Mediana da latência (ms) das últimas chamadas de um modelo, ou None.
+
+        Só entram chamadas do mesmo tipo: análises completas têm prompts muito
+        maiores e distorceriam a comparação entre modelos para perguntas.
+        """
+        with conectar(self.caminho_db) as conexao:
+            linhas = conexao.execute(
+                "SELECT latencia_ms FROM uso WHERE modelo = ? AND tipo = ? ORDER BY momento DESC LIMIT ?",
+                (modelo, tipo, ultimas)
+            ).fetchall()
+        if not linhas:
+            return None
+        return statistics.median(linha['latencia_ms'] for linha in linhas)
+
+
+def pergunta_simples(pergunta: str) -> bool:
+    """Pergunta curta de continuação, sem pedido de análise aprofundada."""
+    texto = pergunta.strip()
+    return len(texto) <= TAMANHO_MAXIMO_PERGUNTA_SIMPLES and not PADRAO_PERGUNTA_COMPLEXA.search(texto)
+
+
+def escolher_modelo(modelo_escolhido: str, pergunta: str, registro: Optional[RegistroUso] = None) -> Dict[str, object]:
+    """
+    Política de roteamento para perguntas de continuação.
+
+    Perguntas simples vão para MODELO_RAPIDO, a menos que a latência mediana
+    recente dele esteja pior que a do modelo escolhido. Análises completas não
+    passam por aqui e usam sempre o modelo escolhido.
+
+    Args:
+        modelo_escolhido: Modelo selecionado pelo usuário
+        pergunta: Texto da pergunta
+        registro: Histórico de uso, para comparar latências
+
+    Returns:
+        dict: 'modelo' a usar e se foi 'roteado'
+    """
+    if modelo_escolhido == MODELO_RAPIDO or not pergunta_simples(pergunta):
+        return {'modelo': modelo_escolhido, 'roteado': False}
+
+    if registro is not None:
+        latencia_rapido = registro.latencia_mediana(MODELO_RAPIDO)
+        latencia_escolhido = registro.latencia_mediana(modelo_escolhido)
+        if latencia_rapido is not None and latencia_escolhido is not None and latencia_rapido > latencia_escolhido:
+            return {'modelo': modelo_escolhido, 'roteado': False}
+
+    return {'modelo': MODELO_RAPIDO, 'roteado': True}
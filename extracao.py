@@ -0,0 +1,530 @@
+"""
+Extração do conteúdo principal de páginas de notícias.
+
+Implementa um modo de extração por densidade de conteúdo, no estilo do
+Readability: os blocos do DOM recebem uma pontuação baseada na densidade de
+texto, na densidade de links e em sinais de tags/classes, e apenas o corpo
+principal da matéria é mantido. Banners de cookies, listas de "leia também",
+comentários e tabelas de navegação ficam de fora do texto final.
+
+extrair_pagina é o pipeline que o app aplica a cada página baixada: separa as
+tabelas de dados (que seguem para a IA como CSV) e extrai o texto.
+
+O módulo também traz uma avaliação de qualidade contra fixtures rotuladas à mão
+(um ``.html`` com a página e um ``.txt`` com o texto esperado, sem as tabelas
+de dados). A avaliação roda o mesmo extrair_pagina do app; cada fixture precisa
+atingir PRECISAO_MINIMA e REVOCACAO_MINIMA no modo densidade. O comando abaixo
+sai com erro caso contrário, e tests/test_extracao.py roda a mesma verificação:
+
+    python extracao.py fixtures/extracao
+"""
+import copy
+import os
+import re
+import sys
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from bs4 import BeautifulSoup, Tag
+
+# Modos de extração aceitos por extrair_texto_url
+MODO_COMPLETO = 'completo'
+MODO_DENSIDADE = 'densidade'
+
+# Elementos que nunca fazem parte do conteúdo principal
+TAGS_DESCARTADAS = [
+    'script', 'style', 'nav', 'footer', 'header', 'aside', 'form',
+    'noscript', 'iframe', 'button', 'svg', 'select', 'input'
+]
+
+# Sinais de classe/id (em português e inglês)
+PADRAO_NEGATIVO = re.compile(
+    r'coment|comment|cookie|consent|banner|lgpd|leia-?tambem|leia_tambem|'
+    r'relacionad|related|recomend|veja-?tambem|mais-?lidas|share|compartilh|'
+    r'social|newsletter|sidebar|menu|breadcrumb|promo|publicidade|advert|'
+    r'\bads?\b|popup|modal|rodape|footer|widget|tags?\b',
+    re.IGNORECASE
+)
+# Sinais que eliminam o bloco mesmo quando há também um sinal positivo
+PADRAO_NEGATIVO_FORTE = re.compile(
+    r'coment|comment|cookie|consent|lgpd|leia-?tambem|leia_tambem|relacionad|related',
+    re.IGNORECASE
+)
+PADRAO_POSITIVO = re.compile(
+    r'article|artigo|materia|noticia|content|conteudo|post|entry|'
+    r'story|texto|body|corpo|main',
+    re.IGNORECASE
+)
+
+# Pontuação inicial de um candidato conforme a tag
+PESO_TAG = {
+    'article': 8, 'main': 8, 'div': 5, 'section': 3,
+    'pre': 3, 'td': 3, 'blockquote': 3,
+    'address': -3, 'ol': -3, 'ul': -3, 'dl': -3, 'dd': -3, 'dt': -3,
+    'li': -3, 'form': -3,
+    'h1': -5, 'h2': -5, 'h3': -5, 'h4': -5, 'h5': -5, 'h6': -5, 'th': -5,
+}
+
+# Blocos de texto que alimentam a pontuação dos seus ancestrais
+TAGS_PARAGRAFO = ['p', 'pre', 'td', 'blockquote']
+
+# Blocos que compõem o texto final dentro do conteúdo escolhido
+TAGS_TEXTO = ['h1', 'h2', 'h3', 'p', 'pre', 'blockquote', 'li', 'table']
+
+TAMANHO_MINIMO_PARAGRAFO = 25
+
+# Fração do texto dos parágrafos da página a partir da qual um bloco é
+# protegido da remoção por classe (é o invólucro da matéria, não boilerplate)
+FRACAO_PROTEGIDA = 0.5
+
+# Abaixo deste tamanho o resultado é tratado como falha e a extração é
+# refeita sem a remoção por classe, como faz o Readability
+TAMANHO_MINIMO_CONTEUDO = 250
+
+# Marca temporária usada para reencontrar as tabelas depois da poda de uma cópia
+ATRIBUTO_INDICE_TABELA = 'data-indice-tabela'
+
+# Qualidade mínima exigida de cada fixture no modo densidade
+PRECISAO_MINIMA = 0.85
+REVOCACAO_MINIMA = 0.9
+
+
+def _sinal_classe(elemento: Tag) -> str:
+    """Concatena class e id de um elemento para busca de padrões."""
+    classes = elemento.get('class') or []
+    if isinstance(classes, str):
+        classes = [classes]
+    return ' '.join(classes) + ' ' + (elemento.get('id') or '')
+
+
+def peso_classe(elemento: Tag) -> int:
+    """
+    Calcula o peso de class/id de um elemento.
+
+    Args:
+        elemento: Elemento do DOM
+
+    Returns:
+        int: -25 para sinais negativos, +25 para positivos (podem se somar)
+    """
+    sinal = _sinal_classe(elemento)
+    if not sinal.strip():
+        return 0
+    peso = 0
+    if PADRAO_NEGATIVO.search(sinal):
+        peso -= 25
+    if PADRAO_POSITIVO.search(sinal):
+        peso += 25
+    return peso
+
+
+def densidade_links(elemento: Tag) -> float:
+    """
+    Proporção do texto de um elemento que está dentro de links.
+
+    Args:
+        elemento: Elemento do DOM
+
+    Returns:
+        float: Valor entre 0 e 1
+    """
+    tamanho_texto = len(elemento.get_text(' ', strip=True))
+    if tamanho_texto == 0:
+        return 0.0
+    tamanho_links = sum(len(a.get_text(' ', strip=True)) for a in elemento.find_all('a'))
+    return min(tamanho_links / tamanho_texto, 1.0)
+
+
+def _texto_paragrafos(elemento: Tag) -> int:
+    """Total de caracteres dos parágrafos pontuáveis dentro de um elemento."""
+    tamanhos = (len(p.get_text(' ', strip=True)) for p in elemento.find_all(TAGS_PARAGRAFO))
+    return sum(t for t in tamanhos if t >= TAMANHO_MINIMO_PARAGRAFO)
+
+
+def remover_boilerplate(soup: BeautifulSoup, podar_classes: bool = True) -> None:
+    """
+    Remove tags descartáveis e blocos com sinais claros de boilerplate.
+
+    Blocos que contêm a maior parte do texto dos parágrafos da página nunca são
+    removidos pela classe: layouts como ``<div class="container has-sidebar">``
+    envolvem a matéria inteira.
+
+    Args:
+        soup: Documento parseado (será modificado)
+        podar_classes: Se False, remove apenas as tags descartáveis
+    """
+    for elemento in soup.find_all(TAGS_DESCARTADAS):
+        elemento.decompose()
+    if not podar_classes:
+        return
+
+    total_paragrafos = _texto_paragrafos(soup)
+    for elemento in soup.find_all(True):
+        if elemento.decomposed or elemento.name in ('html', 'body'):
+            continue
+        sinal = _sinal_classe(elemento)
+        if not sinal.strip():
+            continue
+        if PADRAO_NEGATIVO_FORTE.search(sinal) or (
+                PADRAO_NEGATIVO.search(sinal) and not PADRAO_POSITIVO.search(sinal)):
+            if total_paragrafos and _texto_paragrafos(elemento) > total_paragrafos * FRACAO_PROTEGIDA:
+                continue
+            elemento.decompose()
+
+
+def tabelas_de_conteudo(soup: BeautifulSoup) -> List[Tag]:
+    """
+    Tabelas do documento que sobrevivem à remoção de boilerplate.
+
+    A poda roda sobre uma cópia, então o documento não é modificado: a extração
+    de texto precisa dele intacto para a nova tentativa sem poda.
+
+    Args:
+        soup: Documento parseado
+
+    Returns:
+        list: Tabelas do documento original fora de barras laterais, rodapés etc.
+    """
+    tabelas = soup.find_all('table')
+    if not tabelas:
+        return []
+    for indice, tabela in enumerate(tabelas):
+        tabela[ATRIBUTO_INDICE_TABELA] = str(indice)
+    podado = copy.copy(soup)
+    remover_boilerplate(podado)
+    mantidas = {tabela[ATRIBUTO_INDICE_TABELA] for tabela in podado.find_all('table')}
+    for tabela in tabelas:
+        del tabela[ATRIBUTO_INDICE_TABELA]
+    return [tabela for indice, tabela in enumerate(tabelas) if str(indice) in mantidas]
+
+
+def _pontuar_candidatos(soup: BeautifulSoup) -> Dict[Tag, float]:
+    """
+    Distribui a pontuação de cada parágrafo para o pai e o avô.
+
+    Returns:
+        dict: Elemento candidato -> pontuação ajustada pela densidade de links
+    """
+    pontuacoes = {}
+
+    def inicializar(no: Tag) -> None:
+        if no not in pontuacoes:
+            pontuacoes[no] = PESO_TAG.get(no.name, 0) + peso_classe(no)
+
+    for paragrafo in soup.find_all(TAGS_PARAGRAFO):
+        texto = paragrafo.get_text(' ', strip=True)
+        if len(texto) < TAMANHO_MINIMO_PARAGRAFO:
+            continue
+
+        pai = paragrafo.parent
+        if not isinstance(pai, Tag) or pai.name == '[document]':
+            continue
+        avo = pai.parent if isinstance(pai.parent, Tag) and pai.parent.name != '[document]' else None
+
+        # Vírgulas e tamanho indicam prosa; até 3 pontos pelo tamanho
+        pontos = 1 + texto.count(',') + min(len(texto) // 100, 3)
+
+        inicializar(pai)
+        pontuacoes[pai] += pontos
+        if avo is not None:
+            inicializar(avo)
+            pontuacoes[avo] += pontos / 2
+
+    return {no: pontos * (1 - densidade_links(no)) for no, pontos in pontuacoes.items()}
+
+
+def _texto_tabela(tabela: Tag) -> str:
+    """Achata uma tabela em linhas separadas por ' | '."""
+    texto_tabela = []
+    cabecalhos = [th.get_text().strip() for th in tabela.find_all('th')]
+    if cabecalhos:
+        texto_tabela.append(" | ".join(cabecalhos))
+        texto_tabela.append("-" * 50)  # Linha separadora
+
+    for tr in tabela.find_all('tr'):
+        linha = [td.get_text().strip() for td in tr.find_all('td')]
+        if linha:
+            texto_tabela.append(" | ".join(linha))
+
+    return "\n".join(texto_tabela)
+
+
+def _texto_bloco(elemento: Tag) -> Optional[str]:
+    """Texto de um único bloco, ou None se ele for boilerplate."""
+    if elemento.name == 'table':
+        # Tabelas de navegação são quase só links
+        if densidade_links(elemento) > 0.5:
+            return None
+        return _texto_tabela(elemento) or None
+
+    texto = elemento.get_text(' ', strip=True)
+    if not texto:
+        return None
+    if elemento.name in ('h1', 'h2', 'h3'):
+        return texto
+    if elemento.name == 'li':
+        # Itens de lista com muitos links costumam ser "leia também"
+        if len(texto) >= TAMANHO_MINIMO_PARAGRAFO and densidade_links(elemento) < 0.3:
+            return texto
+        return None
+    return texto if densidade_links(elemento) < 0.5 else None
+
+
+def _aninhado(elemento: Tag, raiz: Tag) -> bool:
+    """Indica se o elemento está dentro de outro bloco de texto abaixo da raiz."""
+    for ancestral in elemento.parents:
+        if ancestral is raiz:
+            return False
+        if ancestral.name in ('p', 'pre', 'blockquote', 'table', 'li'):
+            return True
+    return False
+
+
+def _blocos_de_texto(raiz: Tag) -> List[str]:
+    """Coleta os blocos de texto de um conteúdo já escolhido."""
+    if raiz.name in TAGS_TEXTO:
+        texto = _texto_bloco(raiz)
+        return [texto] if texto else []
+
+    blocos = []
+    for elemento in raiz.find_all(TAGS_TEXTO):
+        # Blocos aninhados em outro bloco coletado já entram pelo ancestral
+        if _aninhado(elemento, raiz):
+            continue
+        texto = _texto_bloco(elemento)
+        if texto:
+            blocos.append(texto)
+    return blocos
+
+
+def extrair_conteudo_principal(soup: BeautifulSoup) -> str:
+    """
+    Extrai apenas o corpo principal da matéria por densidade de conteúdo.
+
+    O melhor candidato é o elemento com maior pontuação; irmãos com pontuação
+    próxima ou parágrafos longos com poucos links também são incluídos, pois
+    muitos portais quebram a matéria em vários contêineres.
+
+    Se o resultado sair vazio ou muito curto, a extração é refeita sobre uma
+    cópia do documento original sem a remoção por classe, e vale o resultado
+    mais longo.
+
+    Args:
+        soup: Documento já parseado (será modificado)
+
+    Returns:
+        str: Blocos de texto do conteúdo principal separados por linha em branco
+    """
+    original = copy.copy(soup)
+    texto = _extrair_por_densidade(soup, podar_classes=True)
+    if len(texto) < TAMANHO_MINIMO_CONTEUDO:
+        texto_sem_poda = _extrair_por_densidade(original, podar_classes=False)
+        if len(texto_sem_poda) > len(texto):
+            return texto_sem_poda
+    return texto
+
+
+def _extrair_por_densidade(soup: BeautifulSoup, podar_classes: bool) -> str:
+    remover_boilerplate(soup, podar_classes)
+    pontuacoes = _pontuar_candidatos(soup)
+
+    if not pontuacoes:
+        # Sem parágrafos pontuáveis: recorre ao modo completo
+        return extrair_texto_completo(soup)
+
+    melhor = max(pontuacoes, key=pontuacoes.get)
+    limite = max(10, pontuacoes[melhor] * 0.2)
+
+    pai = melhor.parent if isinstance(melhor.parent, Tag) else None
+    irmaos = pai.find_all(recursive=False) if pai is not None and pai.name != '[document]' else [melhor]
+
+    blocos = []
+    for irmao in irmaos:
+        incluir = irmao is melhor or pontuacoes.get(irmao, 0) >= limite
+        if not incluir and irmao.name == 'p':
+            texto = irmao.get_text(' ', strip=True)
+            incluir = len(texto) > 80 and densidade_links(irmao) < 0.25
+        if incluir:
+            blocos.extend(_blocos_de_texto(irmao))
+
+    return '\n\n'.join(blocos)
+
+
+def extrair_texto_completo(soup: BeautifulSoup) -> str:
+    """
+    Extração original: mantém todo p/article/section/h1-3 com mais de 50
+    caracteres e achata todas as tabelas.
+
+    Args:
+        soup: Documento já parseado (será modificado)
+
+    Returns:
+        str: Blocos de texto separados por linha em branco
+    """
+    for elemento in soup.find_all(['script', 'style', 'nav', 'footer', 'header']):
+        elemento.decompose()
+
+    textos = []
+    for p in soup.find_all(['p', 'article', 'section', 'h1', 'h2', 'h3']):
+        if len(p.get_text().strip()) > 50:
+            textos.append(p.get_text())
+
+    for tabela in soup.find_all('table'):
+        texto_tabela = _texto_tabela(tabela)
+        if texto_tabela:
+            textos.append(texto_tabela)
+
+    return '\n\n'.join(textos)
+
+
+def extrair_texto_soup(soup: BeautifulSoup, modo: str = MODO_DENSIDADE) -> str:
+    """
+    Extrai o texto de um documento já parseado no modo escolhido.
+
+    Args:
+        soup: Documento parseado (será modificado)
+        modo: MODO_DENSIDADE (padrão) ou MODO_COMPLETO
+
+    Returns:
+        str: Texto extraído, sem limpeza de caracteres
+    """
+    if modo == MODO_COMPLETO:
+        return extrair_texto_completo(soup)
+    if modo == MODO_DENSIDADE:
+        return extrair_conteudo_principal(soup)
+    raise ValueError(f"Modo de extração desconhecido: {modo}")
+
+
+def extrair_pagina(soup: BeautifulSoup, modo: str = MODO_DENSIDADE) -> Tuple[str, list]:
+    """
+    Pipeline aplicado pelo app a cada página: tabelas de dados e texto.
+
+    As tabelas de dados saem do documento antes da extração de texto, para não
+    serem achatadas de novo nele. No modo densidade, só contam as tabelas fora
+    do boilerplate (cotações de barras laterais não são dados da matéria).
+
+    Args:
+        soup: Documento parseado (será modificado)
+        modo: MODO_DENSIDADE (padrão) ou MODO_COMPLETO
+
+    Returns:
+        tuple: (texto extraído sem limpeza de caracteres, DataFrames das tabelas)
+    """
+    from tabelas import extrair_tabelas  # tabelas importa este módulo
+
+    tabelas = extrair_tabelas(soup, somente_conteudo=(modo == MODO_DENSIDADE))
+    return extrair_texto_soup(soup, modo), tabelas
+
+
+def extrair_texto_html(html: str, modo: str = MODO_DENSIDADE) -> str:
+    """
+    Extrai o texto de um documento HTML no modo escolhido.
+
+    Args:
+        html: Conteúdo HTML da página
+        modo: MODO_DENSIDADE (padrão) ou MODO_COMPLETO
+
+    Returns:
+        str: Texto extraído, sem limpeza de caracteres
+    """
+    return extrair_texto_soup(BeautifulSoup(html, 'html.parser'), modo)
+
+
+# ---------------------------------------------------------------------------
+# Avaliação de qualidade contra fixtures rotuladas à mão
+# ---------------------------------------------------------------------------
+
+def _tokens(texto: str) -> Counter:
+    return Counter(re.findall(r'\w+', texto.lower()))
+
+
+def comparar_textos(extraido: str, esperado: str) -> Dict[str, float]:
+    """
+    Compara dois textos por sobreposição de tokens (bag of words).
+
+    Args:
+        extraido: Texto produzido pelo extrator
+        esperado: Texto rotulado à mão
+
+    Returns:
+        dict: precisao, revocacao e f1
+    """
+    tokens_extraidos = _tokens(extraido)
+    tokens_esperados = _tokens(esperado)
+    comuns = sum((tokens_extraidos & tokens_esperados).values())
+    total_extraido = sum(tokens_extraidos.values())
+    total_esperado = sum(tokens_esperados.values())
+
+    precisao = comuns / total_extraido if total_extraido else 0.0
+    revocacao = comuns / total_esperado if total_esperado else 0.0
+    f1 = 2 * precisao * revocacao / (precisao + revocacao) if precisao + revocacao else 0.0
+    return {'precisao': precisao, 'revocacao': revocacao, 'f1': f1}
+
+
+def avaliar_extracao(diretorio: str, modo: str = MODO_DENSIDADE) -> Dict[str, dict]:
+    """
+    Avalia um modo de extração contra as fixtures de um diretório.
+
+    Cada fixture é um par ``nome.html`` / ``nome.txt``. O HTML passa pelo mesmo
+    extrair_pagina usado pelo app, e só o texto é comparado.
+
+    Args:
+        diretorio: Diretório com as fixtures
+        modo: Modo de extração a avaliar
+
+    Returns:
+        dict: nome da fixture -> métricas (precisao, revocacao, f1, caracteres
+        e tabelas)
+    """
+    resultados = {}
+    for arquivo in sorted(os.listdir(diretorio)):
+        if not arquivo.endswith('.html'):
+            continue
+        nome = arquivo[:-len('.html')]
+        caminho_esperado = os.path.join(diretorio, nome + '.txt')
+        if not os.path.exists(caminho_esperado):
+            continue
+
+        with open(os.path.join(diretorio, arquivo), encoding='utf-8') as f:
+            html = f.read()
+        with open(caminho_esperado, encoding='utf-8') as f:
+            esperado = f.read()
+
+        extraido, tabelas = extrair_pagina(BeautifulSoup(html, 'html.parser'), modo)
+        metricas = comparar_textos(extraido, esperado)
+        metricas['caracteres'] = len(extraido)
+        metricas['tabelas'] = len(tabelas)
+        resultados[nome] = metricas
+    return resultados
+
+
+def fixtures_reprovadas(resultados: Dict[str, dict]) -> List[str]:
+    """Fixtures abaixo de PRECISAO_MINIMA ou REVOCACAO_MINIMA."""
+    return [nome for nome, m in resultados.items()
+            if m['precisao'] < PRECISAO_MINIMA or m['revocacao'] < REVOCACAO_MINIMA]
+
+
+def _media(resultados: Dict[str, dict], chave: str) -> Optional[float]:
+    if not resultados:
+        return None
+    return sum(m[chave] for m in resultados.values()) / len(resultados)
+
+
+if __name__ == '__main__':
+    diretorio_fixtures = sys.argv[1] if len(sys.argv) > 1 else os.path.join('fixtures', 'extracao')
+    por_modo = {modo: avaliar_extracao(diretorio_fixtures, modo) for modo in (MODO_COMPLETO, MODO_DENSIDADE)}
+
+    for nome in por_modo[MODO_DENSIDADE]:
+        for modo, resultados in por_modo.items():
+            m = resultados[nome]
+            print(f"{nome:<28} {modo:<10} P={m['precisao']:.2f} R={m['revocacao']:.2f} "
+                  f"F1={m['f1']:.2f} chars={m['caracteres']} tabelas={m['tabelas']}")
+
+    for modo, resultados in por_modo.items():
+        print(f"MÉDIA {modo:<10} F1={_media(resultados, 'f1'):.2f} "
+              f"chars={_media(resultados, 'caracteres'):.0f}")
+
+    reprovadas = fixtures_reprovadas(por_modo[MODO_DENSIDADE])
+    if reprovadas:
+        print(f"Abaixo do mínimo (P>={PRECISAO_MINIMA}, R>={REVOCACAO_MINIMA}): {', '.join(reprovadas)}")
+        sys.exit(1)
@@ -0,0 +1,251 @@
+"""
+Fila local de jobs com workers em segundo plano, persistida em SQLite.
+
+Análises longas (busca, download das notícias, IA) e a geração do relatório
+executivo podem ser enfileiradas e executadas por threads de trabalho fora do
+ciclo de execução do script do Streamlit. Fechar a aba ou provocar um rerun não
+descarta o trabalho: o progresso e o resultado ficam gravados no banco e podem
+ser consultados depois pelo ID do job.
+
+Cada tipo de job é registrado com uma função ``funcao(parametros, reportar)``,
+onde ``reportar(progresso, mensagem)`` atualiza o andamento (0 a 1) e o retorno
+(serializável em JSON) é gravado como resultado.
+
+Um job em execução pertence ao worker que o reivindicou (coluna ``dono``), e a
+fila dona renova ``atualizado_em`` periodicamente. Só um job sem renovação há
+mais de ``tempo_lease`` segundos volta para a fila. Assim, uma segunda fila no
+mesmo banco não executa de novo o trabalho de outra que ainda está viva, seja
+ela criada por outro processo ou depois de um "Clear cache" do Streamlit.
+"""
+import json
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+from banco import conectar
+
+STATUS_PENDENTE = 'pendente'
+STATUS_EXECUTANDO = 'executando'
+STATUS_CONCLUIDO = 'concluido'
+STATUS_ERRO = 'erro'
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    tipo TEXT NOT NULL,
+    sessao TEXT,
+    parametros TEXT NOT NULL,
+    status TEXT NOT NULL,
+    progresso REAL NOT NULL DEFAULT 0,
+    mensagem TEXT,
+    resultado TEXT,
+    erro TEXT,
+    dono TEXT,
+    criado_em TEXT NOT NULL,
+    atualizado_em TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, criado_em);
+CREATE INDEX IF NOT EXISTS idx_jobs_sessao ON jobs (sessao, criado_em);
+"""
+
+
+def _agora(atraso: float = 0) -> str:
+    return (datetime.now() - timedelta(seconds=atraso)).isoformat(timespec='seconds')
+
+
+class FilaJobs:
+    """Fila de jobs persistida em SQLite e consumida por threads de trabalho."""
+
+    def __init__(self, caminho_db: str = 'jobs.db', num_workers: int = 2,
+                 intervalo_verificacao: float = 2.0, tempo_lease: float = 60.0):
+        """
+        Args:
+            caminho_db: Arquivo SQLite onde os jobs são persistidos
+            num_workers: Quantidade de threads de trabalho
+            intervalo_verificacao: Intervalo máximo, em segundos, entre
+                verificações de novos jobs
+            tempo_lease: Segundos sem renovação após os quais um job em
+                execução é considerado abandonado (queda do processo) e volta
+                para a fila
+        """
+        self.caminho_db = caminho_db
+        self.intervalo_verificacao = intervalo_verificacao
+        self.tempo_lease = tempo_lease
+        self.id_fila = uuid.uuid4().hex[:12]
+        self._funcoes: Dict[str, Callable] = {}
+        self._lock = threading.Lock()
+        self._novo_job = threading.Event()
+        self._parar = threading.Event()
+
+        with conectar(self.caminho_db) as conexao:
+            conexao.executescript(_ESQUEMA)
+
+        self._workers = []
+        for i in range(num_workers):
+            worker = threading.Thread(target=self._executar_worker, args=(f"{self.id_fila}:{i}",),
+                                      name=f"fila-jobs-{i}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+        threading.Thread(target=self._renovar_leases, name="fila-jobs-lease", daemon=True).start()
+
+    def registrar(self, tipo: str, funcao: Callable) -> None:
+        """
+        Registra (ou substitui) a função que executa um tipo de job.
+
+        Args:
+            tipo: Nome do tipo de job
+            funcao: Função ``funcao(parametros, reportar) -> resultado``
+        """
+        with self._lock:
+            self._funcoes[tipo] = funcao
+        self._novo_job.set()
+
+    def enfileirar(self, tipo: str, parametros: dict, sessao: Optional[str] = None) -> str:
+        """
+        Adiciona um job à fila.
+
+        Args:
+            tipo: Tipo de job registrado
+            parametros: Parâmetros serializáveis em JSON
+            sessao: Sessão que criou o job, para listagem
+
+        Returns:
+            str: ID do job
+        """
+        id_job = uuid.uuid4().hex[:12]
+        agora = _agora()
+        with conectar(self.caminho_db) as conexao:
+            conexao.execute(
+                "INSERT INTO jobs (id, tipo, sessao, parametros, status, mensagem, criado_em, atualizado_em) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (id_job, tipo, sessao, json.dumps(parametros, ensure_ascii=False),
+                 STATUS_PENDENTE, 'Aguardando na fila', agora, agora)
+            )
+        self._novo_job.set()
+        return id_job
+
+    def _linha_para_dict(self, linha: sqlite3.Row) -> dict:
+        job = dict(linha)
+        job['parametros'] = json.loads(job['parametros'])
+        job['resultado'] = json.loads(job['resultado']) if job['resultado'] else None
+        return job
+
+    def obter(self, id_job: str) -> Optional[dict]:
+        """Retorna o job com o ID informado, ou None se não existir."""
+        with conectar(self.caminho_db) as conexao:
+            linha = conexao.execute("SELECT * FROM jobs WHERE id = ?", (id_job.strip(),)).fetchone()
+        return self._linha_para_dict(linha) if linha else None
+
+    def listar(self, sessao: Optional[str] = None, limite: int = 20) -> List[dict]:
+        """Lista os jobs mais recentes, opcionalmente apenas de uma sessão."""
+        with conectar(self.caminho_db) as conexao:
+            if sessao is None:
+                linhas = conexao.execute(
+                    "SELECT * FROM jobs ORDER BY criado_em DESC LIMIT ?", (limite,)
+                ).fetchall()
+            else:
+                linhas = conexao.execute(
+                    "SELECT * FROM jobs WHERE sessao = ? ORDER BY criado_em DESC LIMIT ?", (sessao, limite)
+                ).fetchall()
+        return [self._linha_para_dict(linha) for linha in linhas]
+
+    def _atualizar(self, id_job: str, dono: str, **campos) -> None:
+        """Atualiza um job em execução, desde que ele ainda pertença ao worker."""
+        campos['atualizado_em'] = _agora()
+        atribuicoes = ', '.join(f"{nome} = ?" for nome in campos)
+        with conectar(self.caminho_db) as conexao:
+            conexao.execute(f"UPDATE jobs SET {atribuicoes} WHERE id = ? AND dono = ?",
+                            (*campos.values(), id_job, dono))
+
+    def _renovar_leases(self) -> None:
+        """Renova os jobs desta fila enquanto houver worker vivo (inclusive após encerrar)."""
+        intervalo = self.tempo_lease / 4
+        while any(worker.is_alive() for worker in self._workers):
+            try:
+                with conectar(self.caminho_db) as conexao:
+                    conexao.execute(
+                        "UPDATE jobs SET atualizado_em = ? WHERE status = ? AND dono LIKE ?",
+                        (_agora(), STATUS_EXECUTANDO, f"{self.id_fila}:%")
+                    )
+            except sqlite3.Error:
+                pass
+            time.sleep(intervalo)
+
+    def _reivindicar(self, dono: str) -> Optional[dict]:
+        """
+        Marca atomicamente o job pendente mais antigo (de um tipo registrado)
+        como em execução pelo worker ``dono``.
+
+        Antes, jobs em execução sem renovação há mais de tempo_lease voltam a
+        ficar pendentes.
+        """
+        with self._lock:
+            tipos = list(self._funcoes)
+        if not tipos:
+            return None
+
+        marcadores = ', '.join('?' for _ in tipos)
+        with conectar(self.caminho_db) as conexao:
+            conexao.execute("BEGIN IMMEDIATE")
+            try:
+                conexao.execute(
+                    "UPDATE jobs SET status = ?, progresso = 0, dono = NULL, mensagem = ?, atualizado_em = ? "
+                    "WHERE status = ? AND atualizado_em < ?",
+                    (STATUS_PENDENTE, 'Retomado após interrupção', _agora(), STATUS_EXECUTANDO,
+                     _agora(self.tempo_lease))
+                )
+                linha = conexao.execute(
+                    f"SELECT * FROM jobs WHERE status = ? AND tipo IN ({marcadores}) "
+                    "ORDER BY criado_em LIMIT 1",
+                    (STATUS_PENDENTE, *tipos)
+                ).fetchone()
+                if linha is not None:
+                    conexao.execute(
+                        "UPDATE jobs SET status = ?, mensagem = ?, dono = ?, atualizado_em = ? WHERE id = ?",
+                        (STATUS_EXECUTANDO, 'Iniciando', dono, _agora(), linha['id'])
+                    )
+                conexao.execute("COMMIT")
+            except Exception:
+                conexao.execute("ROLLBACK")
+                raise
+        return self._linha_para_dict(linha) if linha else None
+
+    def _executar_worker(self, dono: str) -> None:
+        while not self._parar.is_set():
+            try:
+                job = self._reivindicar(dono)
+            except sqlite3.Error:
+                job = None
+            if job is None:
+                self._novo_job.wait(self.intervalo_verificacao)
+                self._novo_job.clear()
+                continue
+
+            with self._lock:
+                funcao = self._funcoes[job['tipo']]
+
+            def reportar(progresso: float, mensagem: str = '', id_job=job['id']) -> None:
+                self._atualizar(id_job, dono, progresso=max(0.0, min(float(progresso), 1.0)),
+                                mensagem=mensagem)
+
+            try:
+                resultado = funcao(job['parametros'], reportar)
+                self._atualizar(job['id'], dono, status=STATUS_CONCLUIDO, progresso=1.0, mensagem='Concluído',
+                                resultado=json.dumps(resultado, ensure_ascii=False))
+            except Exception as e:
+                self._atualizar(job['id'], dono, status=STATUS_ERRO, mensagem=str(e),
+                                erro=traceback.format_exc())
+
+    def encerrar(self) -> None:
+        """
+        Sinaliza para os workers pararem após o job atual.
+
+        Os jobs em andamento continuam sendo renovados até terminarem, então
+        outra fila no mesmo banco não os executa de novo.
+        """
+        self._parar.set()
+        self._novo_job.set()
@@ -0,0 +1,424 @@
+"""
+Imagens das notícias: seleção, download limitado, deduplicação e miniaturas.
+
+As páginas só fornecem candidatas (URL e texto alternativo). O download
+acontece em uma etapa própria, compartilhada por todas as sessões:
+
+- poucas conexões simultâneas no processo inteiro (semáforo) e download em
+  streaming, abortado ao passar do limite de bytes;
+- logos, ícones, pixels de rastreamento e banners são descartados pela URL e
+  pelos atributos antes do download, e pelas dimensões reais depois dele (o
+  Pillow lê apenas o cabeçalho antes de decodificar);
+- imagens iguais publicadas em URLs diferentes são descartadas por hash
+  perceptual (dHash de 64 bits);
+- apenas a miniatura reduzida fica guardada, em um cache em disco com limite
+  de tamanho (as menos usadas saem primeiro). Descartes definitivos também
+  ficam no cache, para não baixar de novo a mesma imagem inútil.
+
+As miniaturas são usadas no relatório executivo e descritas no prompt da IA.
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from typing import Dict, Iterable, List, Optional
+from urllib.parse import urljoin, urlparse
+
+import requests
+from bs4 import BeautifulSoup
+from PIL import Image, ImageOps
+from requests.adapters import HTTPAdapter
+
+import replay
+from cache_compartilhado import SingleFlight
+
+# Limites por imagem
+TAMANHO_MAXIMO_BYTES = 5 * 1024 * 1024
+MAXIMO_PIXELS = 40_000_000          # Protege contra "bombas" de descompressão
+LARGURA_MINIMA = 200
+ALTURA_MINIMA = 120
+PROPORCAO_MAXIMA = 3.5              # Faixas muito largas ou altas são banners/logos
+LADO_MINIATURA = 320
+QUALIDADE_MINIATURA = 80
+
+# Distância de Hamming máxima entre hashes para considerar duas imagens iguais
+DISTANCIA_DUPLICATA = 6
+
+# Sinais de logo, ícone, anúncio ou rastreamento na URL, classe, id ou alt
+PADRAO_DESCARTE = re.compile(
+    r'logo|icon|sprite|avatar|favicon|pixel|tracking|track\b|spacer|blank|1x1|badge|selo|'
+    r'placeholder|loading|emoji|banner|\bads?\b|publicidade|doubleclick|analytics|'
+    r'facebook\.com/tr|scorecardresearch',
+    re.IGNORECASE
+)
+EXTENSOES_DESCARTADAS = ('.svg', '.ico')
+ATRIBUTOS_SRC = ('src', 'data-src', 'data-lazy-src', 'data-original')
+
+
+def _dimensao_declarada(valor) -> Optional[int]:
+    try:
+        return int(str(valor).strip().rstrip('px'))
+    except (TypeError, ValueError):
+        return None
+
+
+def _escolher_do_srcset(srcset: str, largura_alvo: int = 640) -> Optional[str]:
+    """Menor variante do srcset com pelo menos ``largura_alvo`` px (ou a maior que houver)."""
+    variantes = []
+    for parte in srcset.split(','):
+        campos = parte.strip().split()
+        if not campos:
+            continue
+        largura = _dimensao_declarada(campos[1][:-1]) if len(campos) > 1 and campos[1].endswith('w') else None
+        variantes.append((largura or 0, campos[0]))
+    if not variantes:
+        return None
+    suficientes = [v for v in variantes if v[0] >= largura_alvo]
+    return min(suficientes)[1] if suficientes else max(variantes)[1]
+
+
+def descartar_pelo_html(url: str, atributos: str = '', largura=None, altura=None) -> bool:
+    """Logos, ícones e pixels reconhecíveis antes do download."""
+    caminho = urlparse(url).path.lower()
+    if url.startswith('data:') or caminho.endswith(EXTENSOES_DESCARTADAS):
+        return True
+    if PADRAO_DESCARTE.search(url) or PADRAO_DESCARTE.search(atributos):
+        return True
+    largura, altura = _dimensao_declarada(largura), _dimensao_declarada(altura)
+    return (largura is not None and largura < LARGURA_MINIMA) or (altura is not None and altura < ALTURA_MINIMA)
+
+
+def candidatas_da_pagina(soup: BeautifulSoup, url_pagina: str, max_imagens: int = 5) -> List[Dict[str, str]]:
+    """
+    Imagens candidatas de uma notícia, sem baixar nada.
+
+    A imagem de compartilhamento (og:image) vem primeiro, por ser em geral a foto
+    principal da matéria. Atributos de carregamento preguiçoso e srcset são
+    considerados, e URLs relativas são resolvidas.
+
+    Returns:
+        list: Dicts com 'url', 'alt' e 'fonte' (a notícia de origem)
+    """
+    candidatas = []
+    vistas = set()
+
+    def adicionar(src: Optional[str], alt: str = '', atributos: str = '', largura=None, altura=None) -> None:
+        if not src:
+            return
+        url = urljoin(url_pagina, src.strip())
+        if not url.startswith('http') or url in vistas:
+            return
+        vistas.add(url)
+        if not descartar_pelo_html(url, f"{atributos} {alt}", largura, altura):
+            candidatas.append({'url': url, 'alt': alt.strip(), 'fonte': url_pagina})
+
+    og_image = soup.find('meta', attrs={'property': 'og:image'})
+    if og_image is not None:
+        titulo = soup.find('meta', attrs={'property': 'og:title'})
+        adicionar(og_image.get('content'), titulo.get('content', '') if titulo is not None else '')
+
+    for img in soup.find_all('img'):
+        src = next((img.get(a) for a in ATRIBUTOS_SRC if img.get(a) and not img.get(a).startswith('data:')), None)
+        srcset = img.get('srcset') or img.get('data-srcset')
+        if srcset:
+            src = _escolher_do_srcset(srcset) or src
+        atributos = ' '.join([' '.join(img.get('class', [])), img.get('id', '')])
+        adicionar(src, img.get('alt', ''), atributos, img.get('width'), img.get('height'))
+        if len(candidatas) >= max_imagens:
+            break
+    return candidatas[:max_imagens]
+
+
+def hash_perceptual(imagem: Image.Image) -> int:
+    """
+    dHash de 64 bits: compara o brilho de pixels vizinhos da imagem reduzida a 9x8.
+
+    Reescalas, recompressões e pequenas edições mudam poucos bits.
+    """
+    pixels = imagem.convert('L').resize((9, 8), Image.Resampling.LANCZOS).tobytes()
+    valor = 0
+    for linha in range(8):
+        for coluna in range(8):
+            valor = (valor << 1) | (pixels[linha * 9 + coluna] > pixels[linha * 9 + coluna + 1])
+    return valor
+
+
+def distancia_hash(a: str, b: str) -> int:
+    """Distância de Hamming entre dois hashes em hexadecimal."""
+    return bin(int(a, 16) ^ int(b, 16)).count('1')
+
+
+class ImagemDescartada(Exception):
+    """Imagem inútil para o relatório (logo, pixel, grande demais...)."""
+
+
+def gerar_miniatura(conteudo: bytes) -> dict:
+    """
+    Valida as dimensões e reduz a imagem para a miniatura.
+
+    Raises:
+        ImagemDescartada: Se a imagem não puder ser lida ou tiver dimensões
+            de logo, pixel ou banner
+
+    Returns:
+        dict: 'jpeg' (bytes da miniatura), 'largura', 'altura' (originais) e 'hash'
+    """
+    try:
+        imagem = Image.open(BytesIO(conteudo))
+    except Exception:
+        raise ImagemDescartada('formato não reconhecido')
+
+    # Até aqui só o cabeçalho foi lido
+    largura, altura = imagem.size
+    if largura * altura > MAXIMO_PIXELS:
+        raise ImagemDescartada('dimensões excessivas')
+    if largura < LARGURA_MINIMA or altura < ALTURA_MINIMA:
+        raise ImagemDescartada('pequena demais')
+    if max(largura, altura) / min(largura, altura) > PROPORCAO_MAXIMA:
+        raise ImagemDescartada('proporção de banner')
+
+    # JPEGs são decodificados direto em resolução reduzida
+    imagem.draft('RGB', (LADO_MINIATURA * 2, LADO_MINIATURA * 2))
+    try:
+        imagem = ImageOps.exif_transpose(imagem)
+        if imagem.mode in ('RGBA', 'LA', 'P'):
+            imagem = imagem.convert('RGBA')
+            fundo = Image.new('RGB', imagem.size, 'white')
+            fundo.paste(imagem, mask=imagem.getchannel('A'))
+            imagem = fundo
+        else:
+            imagem = imagem.convert('RGB')
+        imagem.thumbnail((LADO_MINIATURA, LADO_MINIATURA), Image.Resampling.LANCZOS)
+    except Exception:
+        raise ImagemDescartada('falha ao decodificar')
+
+    saida = BytesIO()
+    imagem.save(saida, 'JPEG', quality=QUALIDADE_MINIATURA, optimize=True)
+    return {
+        'jpeg': saida.getvalue(),
+        'largura': largura,
+        'altura': altura,
+        'hash': f"{hash_perceptual(imagem):016x}"
+    }
+
+
+class CacheMiniaturas:
+    """
+    Miniaturas em disco, com limite de tamanho total.
+
+    Cada URL vira ``<sha256>.json`` (metadados ou motivo do descarte) e, se
+    aproveitada, ``<sha256>.jpg``. O uso atualiza a data de modificação, e as
+    entradas mais antigas saem quando o limite é ultrapassado.
+    """
+
+    def __init__(self, pasta: str = 'miniaturas', max_bytes: int = 200 * 1024 * 1024):
+        self.pasta = pasta
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(pasta, exist_ok=True)
+        self._tamanho = sum(e.stat().st_size for e in os.scandir(pasta) if e.is_file())
+
+    def _base(self, url: str) -> str:
+        return os.path.join(self.pasta, hashlib.sha256(url.encode('utf-8')).hexdigest())
+
+    def obter(self, url: str) -> Optional[dict]:
+        """Metadados guardados da URL (com 'arquivo' da miniatura ou 'descartada'), ou None."""
+        base = self._base(url)
+        try:
+            with open(base + '.json', encoding='utf-8') as f:
+                metadados = json.load(f)
+            if 'descartada' not in metadados:
+                os.utime(base + '.jpg')
+            os.utime(base + '.json')
+        except (OSError, ValueError):
+            return None
+        return metadados
+
+    def _escrever(self, caminho: str, conteudo: bytes) -> int:
+        temporario = f"{caminho}.{threading.get_ident()}.tmp"
+        try:
+            with open(temporario, 'wb') as f:
+                f.write(conteudo)
+        except OSError:
+            if os.path.exists(temporario):
+                os.remove(temporario)
+            raise
+        anterior = os.path.getsize(caminho) if os.path.exists(caminho) else 0
+        os.replace(temporario, caminho)
+        return len(conteudo) - anterior
+
+    def guardar(self, url: str, metadados: dict, jpeg: Optional[bytes] = None) -> dict:
+        """
+        Grava a miniatura (se houver) e os metadados; retorna os metadados gravados.
+
+        Raises:
+            OSError: Se a gravação falhar (disco cheio, pasta removida...)
+        """
+        base = self._base(url)
+        metadados = dict(metadados)
+        acrescimo = 0
+        if jpeg is not None:
+            metadados['arquivo'] = base + '.jpg'
+            acrescimo += self._escrever(base + '.jpg', jpeg)
+        acrescimo += self._escrever(base + '.json', json.dumps(metadados, ensure_ascii=False).encode('utf-8'))
+        with self._lock:
+            self._tamanho += acrescimo
+            if self._tamanho > self.max_bytes:
+                self._podar()
+        return metadados
+
+    def _podar(self) -> None:
+        """Remove as entradas menos usadas até ficar em 90% do limite."""
+        arquivos = sorted((e for e in os.scandir(self.pasta) if e.is_file()), key=lambda e: e.stat().st_mtime)
+        for entrada in arquivos:
+            if self._tamanho <= self.max_bytes * 0.9:
+                break
+            try:
+                tamanho = entrada.stat().st_size
+                os.remove(entrada.path)
+                self._tamanho -= tamanho
+            except OSError:
+                pass
+
+
+class ProcessadorImagens:
+    """
+    Etapa de imagens compartilhada por todas as sessões do processo.
+
+    O semáforo limita os downloads simultâneos no processo inteiro, e
+    downloads da mesma URL pedidos por sessões diferentes são coalescidos.
+    """
+
+    def __init__(self, pasta_cache: str = 'miniaturas', max_downloads: int = 4,
+                 max_bytes_cache: int = 200 * 1024 * 1024, timeout: tuple = (3, 10)):
+        """
+        Args:
+            pasta_cache: Pasta do cache de miniaturas
+            max_downloads: Downloads simultâneos no processo
+            max_bytes_cache: Tamanho máximo do cache em disco
+            timeout: Tempo limite (conexão, leitura) de cada download
+        """
+        self.cache = CacheMiniaturas(pasta_cache, max_bytes_cache)
+        self.max_downloads = max_downloads
+        self.timeout = timeout
+        self._downloads = threading.BoundedSemaphore(max_downloads)
+        self._em_andamento = SingleFlight()
+
+        self.session = requests.Session()
+        adaptador = HTTPAdapter(pool_connections=32, pool_maxsize=max_downloads)
+        self.session.mount('https://', adaptador)
+        self.session.mount('http://', adaptador)
+
+    def baixar(self, url: str, headers: Dict[str, str]) -> bytes:
+        """
+        Baixa a imagem em streaming, abortando acima de TAMANHO_MAXIMO_BYTES.
+
+        Raises:
+            ImagemDescartada: Se não for imagem ou passar do limite
+        """
+        with self._downloads:
+            # A latência gravada cobre o download completo, sem a espera pela vaga
+            inicio = time.perf_counter()
+            with self.session.get(replay.url_imagem(url), headers=headers,
+                                  timeout=self.timeout, stream=True) as response:
+                response.raise_for_status()
+                tipo = response.headers.get('Content-Type', '').split(';')[0].strip().lower()
+                if not tipo.startswith('image/') or tipo == 'image/svg+xml':
+                    raise ImagemDescartada(f"tipo {tipo or 'desconhecido'}")
+                if int(response.headers.get('Content-Length') or 0) > TAMANHO_MAXIMO_BYTES:
+                    raise ImagemDescartada('arquivo grande demais')
+
+                conteudo = bytearray()
+                for bloco in response.iter_content(64 * 1024):
+                    conteudo.extend(bloco)
+                    if len(conteudo) > TAMANHO_MAXIMO_BYTES:
+                        raise ImagemDescartada('arquivo grande demais')
+            replay.gravar_imagem(url, bytes(conteudo), tipo, (time.perf_counter() - inicio) * 1000)
+            return bytes(conteudo)
+
+    def _processar_url(self, url: str, headers: Dict[str, str]) -> Optional[dict]:
+        metadados = self.cache.obter(url)
+        if metadados is not None:
+            return metadados
+        try:
+            miniatura = gerar_miniatura(self.baixar(url, headers))
+        except ImagemDescartada as e:
+            # Descarte definitivo: fica no cache para não baixar de novo
+            metadados, jpeg = {'descartada': str(e)}, None
+        except (requests.RequestException, OSError):
+            # Falha de rede pode ser passageira: não vai para o cache
+            return None
+        else:
+            metadados, jpeg = {k: miniatura[k] for k in ('largura', 'altura', 'hash')}, miniatura['jpeg']
+        try:
+            return self.cache.guardar(url, metadados, jpeg)
+        except OSError:
+            # Disco cheio ou arquivo removido por uma poda concorrente: a etapa
+            # de imagens é opcional e não pode derrubar a análise
+            return None
+
+    def miniatura(self, url: str, headers: Dict[str, str]) -> Optional[dict]:
+        """Metadados da miniatura de uma URL (None se descartada ou indisponível)."""
+        metadados = self._em_andamento.executar(('imagem', url), self._processar_url, url, headers)
+        if metadados is None or 'descartada' in metadados or not os.path.exists(metadados['arquivo']):
+            return None
+        return metadados
+
+    def processar(self, candidatas: Iterable[dict], headers: Dict[str, str], max_imagens: int = 6,
+                  max_candidatas: int = 12) -> List[dict]:
+        """
+        Baixa as candidatas em paralelo e devolve as miniaturas sem duplicatas.
+
+        Args:
+            candidatas: Dicts com 'url', 'alt' e 'fonte', em ordem de relevância
+            headers: Cabeçalhos HTTP dos downloads
+            max_imagens: Quantidade máxima de imagens retornadas
+            max_candidatas: Quantidade máxima de candidatas baixadas
+
+        Returns:
+            list: Dicts com 'url', 'alt', 'fonte', 'arquivo', 'largura', 'altura' e 'hash'
+        """
+        unicas = []
+        vistas = set()
+        for candidata in candidatas:
+            if candidata['url'] not in vistas and len(unicas) < max_candidatas:
+                vistas.add(candidata['url'])
+                unicas.append(candidata)
+        if not unicas:
+            return []
+
+        with ThreadPoolExecutor(max_workers=self.max_downloads) as executor:
+            resultados = list(executor.map(lambda c: self.miniatura(c['url'], headers), unicas))
+
+        imagens = []
+        for candidata, metadados in zip(unicas, resultados):
+            if metadados is None:
+                continue
+            if any(distancia_hash(metadados['hash'], outra['hash']) <= DISTANCIA_DUPLICATA for outra in imagens):
+                continue
+            imagens.append({**candidata, **metadados})
+            if len(imagens) >= max_imagens:
+                break
+        return imagens
+
+
+def intercalar_candidatas(por_noticia: List[List[dict]]) -> List[dict]:
+    """Intercala as candidatas das notícias (1ª de cada, depois 2ª de cada...)."""
+    intercaladas = []
+    for posicao in range(max((len(c) for c in por_noticia), default=0)):
+        intercaladas.extend(c[posicao] for c in por_noticia if posicao < len(c))
+    return intercaladas
+
+
+def imagens_para_prompt(imagens: List[dict]) -> str:
+    """Lista numerada das imagens para o prompt (vazia se não houver imagens)."""
+    linhas = []
+    for i, img in enumerate(imagens):
+        descricao = img.get('alt') or 'Imagem sem descrição'
+        veiculo = urlparse(img.get('fonte', '')).netloc or 'N/A'
+        linhas.append(f"{i+1}. {descricao} (fonte: {veiculo}, URL: {img.get('url', 'N/A')})")
+    return '\n'.join(linhas)
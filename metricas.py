@@ -0,0 +1,230 @@
+"""
+Série temporal de métricas por tema monitorado.
+
+Cada análise grava uma linha por execução e uma por artigo (veículo, tamanho e
+sentimento) em SQLite. No mesmo momento os agregados por dia e por semana são
+atualizados de forma incremental (UPSERT), então os painéis de tendência leem
+apenas os agregados e nunca precisam varrer o histórico bruto.
+
+Os agregados contam artigos distintos: a mesma URL reaparecendo em novas
+execuções do tema no mesmo dia (ou semana) só soma uma vez em artigos,
+caracteres, sentimento e veículos. As execuções em si continuam todas contadas.
+
+O sentimento é o ``compound`` do VADER, cujo léxico é em inglês; em notícias em
+português ele capta poucos termos e deve ser lido apenas como indicação.
+"""
+import threading
+from datetime import datetime, timedelta
+from typing import List, Optional
+from urllib.parse import urlparse
+
+import pandas as pd
+
+from banco import conectar
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS execucoes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    momento TEXT NOT NULL,
+    tema TEXT NOT NULL,
+    modelo TEXT,
+    links INTEGER NOT NULL,
+    artigos INTEGER NOT NULL,
+    caracteres INTEGER NOT NULL,
+    sentimento_medio REAL
+);
+CREATE TABLE IF NOT EXISTS artigos (
+    execucao_id INTEGER NOT NULL REFERENCES execucoes (id),
+    momento TEXT NOT NULL,
+    tema TEXT NOT NULL,
+    veiculo TEXT NOT NULL,
+    url TEXT NOT NULL,
+    caracteres INTEGER NOT NULL,
+    sentimento REAL
+);
+CREATE INDEX IF NOT EXISTS idx_artigos_execucao ON artigos (execucao_id);
+"""
+
+# Mesmo formato para os agregados diário e semanal; "periodo" é o dia ou a
+# segunda-feira da semana (YYYY-MM-DD)
+_ESQUEMA_AGREGADOS = """
+CREATE TABLE IF NOT EXISTS agregado_{granularidade} (
+    tema TEXT NOT NULL,
+    periodo TEXT NOT NULL,
+    execucoes INTEGER NOT NULL,
+    artigos INTEGER NOT NULL,
+    caracteres INTEGER NOT NULL,
+    soma_sentimento REAL NOT NULL,
+    artigos_com_sentimento INTEGER NOT NULL,
+    PRIMARY KEY (tema, periodo)
+);
+CREATE TABLE IF NOT EXISTS veiculos_{granularidade} (
+    tema TEXT NOT NULL,
+    periodo TEXT NOT NULL,
+    veiculo TEXT NOT NULL,
+    artigos INTEGER NOT NULL,
+    PRIMARY KEY (tema, periodo, veiculo)
+);
+CREATE TABLE IF NOT EXISTS artigos_vistos_{granularidade} (
+    tema TEXT NOT NULL,
+    periodo TEXT NOT NULL,
+    url TEXT NOT NULL,
+    PRIMARY KEY (tema, periodo, url)
+);
+"""
+
+GRANULARIDADES = ('diario', 'semanal')
+
+
+def normalizar_tema(tema: str) -> str:
+    """Chave do tema: sem espaços extras e em minúsculas."""
+    return ' '.join(tema.split()).lower()
+
+
+def veiculo_da_url(url: str) -> str:
+    """Domínio do veículo, sem o prefixo www."""
+    dominio = urlparse(url).netloc.lower()
+    return dominio[4:] if dominio.startswith('www.') else dominio
+
+
+def periodo(momento: datetime, granularidade: str) -> str:
+    """Dia (diario) ou segunda-feira da semana (semanal) de um momento."""
+    if granularidade == 'semanal':
+        momento = momento - timedelta(days=momento.weekday())
+    return momento.strftime('%Y-%m-%d')
+
+
+class MetricasTemas:
+    """Armazena métricas por execução/artigo e mantém os agregados por período."""
+
+    def __init__(self, caminho_db: str = 'metricas.db'):
+        self.caminho_db = caminho_db
+        self._lock = threading.Lock()
+        with conectar(self.caminho_db) as conexao:
+            conexao.executescript(_ESQUEMA)
+            for granularidade in GRANULARIDADES:
+                conexao.executescript(_ESQUEMA_AGREGADOS.format(granularidade=granularidade))
+
+    def registrar_execucao(self, tema: str, links: List[str], artigos: List[dict],
+                           modelo: Optional[str] = None, momento: Optional[datetime] = None) -> int:
+        """
+        Registra uma execução e seus artigos e atualiza os agregados.
+
+        Nos agregados entram apenas as URLs ainda não vistas para o tema no
+        período; as demais já foram contadas por uma execução anterior.
+
+        Args:
+            tema: Tema pesquisado
+            links: Links retornados pela busca
+            artigos: Dicts com 'url', 'caracteres' e 'sentimento' (ou None)
+            modelo: Modelo de IA usado na análise
+            momento: Momento da execução (padrão: agora)
+
+        Returns:
+            int: ID da execução
+        """
+        momento = momento or datetime.now()
+        tema = normalizar_tema(tema)
+        sentimentos = [a['sentimento'] for a in artigos if a.get('sentimento') is not None]
+        soma_sentimento = sum(sentimentos)
+        caracteres = sum(a['caracteres'] for a in artigos)
+        carimbo = momento.isoformat(timespec='seconds')
+
+        with self._lock, conectar(self.caminho_db) as conexao:
+            conexao.execute("BEGIN")
+            cursor = conexao.execute(
+                "INSERT INTO execucoes (momento, tema, modelo, links, artigos, caracteres, sentimento_medio) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (carimbo, tema, modelo, len(links), len(artigos), caracteres,
+                 soma_sentimento / len(sentimentos) if sentimentos else None)
+            )
+            execucao_id = cursor.lastrowid
+            conexao.executemany(
+                "INSERT INTO artigos VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(execucao_id, carimbo, tema, veiculo_da_url(a['url']), a['url'], a['caracteres'],
+                  a.get('sentimento')) for a in artigos]
+            )
+
+            # A mesma URL repetida na própria execução também conta uma vez
+            unicos = list({a['url']: a for a in artigos}.values())
+            for granularidade in GRANULARIDADES:
+                chave_periodo = periodo(momento, granularidade)
+                novos = [
+                    a for a in unicos
+                    if conexao.execute(
+                        f"INSERT OR IGNORE INTO artigos_vistos_{granularidade} VALUES (?, ?, ?)",
+                        (tema, chave_periodo, a['url'])
+                    ).rowcount
+                ]
+                sentimentos_novos = [a['sentimento'] for a in novos if a.get('sentimento') is not None]
+                conexao.execute(
+                    f"INSERT INTO agregado_{granularidade} VALUES (?, ?, 1, ?, ?, ?, ?) "
+                    "ON CONFLICT (tema, periodo) DO UPDATE SET "
+                    "execucoes = execucoes + 1, "
+                    "artigos = artigos + excluded.artigos, "
+                    "caracteres = caracteres + excluded.caracteres, "
+                    "soma_sentimento = soma_sentimento + excluded.soma_sentimento, "
+                    "artigos_com_sentimento = artigos_com_sentimento + excluded.artigos_com_sentimento",
+                    (tema, chave_periodo, len(novos), sum(a['caracteres'] for a in novos),
+                     sum(sentimentos_novos), len(sentimentos_novos))
+                )
+                conexao.executemany(
+                    f"INSERT INTO veiculos_{granularidade} VALUES (?, ?, ?, 1) "
+                    "ON CONFLICT (tema, periodo, veiculo) DO UPDATE SET artigos = artigos + 1",
+                    [(tema, chave_periodo, veiculo_da_url(a['url'])) for a in novos]
+                )
+            conexao.execute("COMMIT")
+        return execucao_id
+
+    def temas(self) -> List[str]:
+        """Temas com pelo menos uma execução registrada, mais recentes primeiro."""
+        with conectar(self.caminho_db) as conexao:
+            linhas = conexao.execute(
+                "SELECT tema FROM agregado_diario GROUP BY tema ORDER BY MAX(periodo) DESC"
+            ).fetchall()
+        return [linha['tema'] for linha in linhas]
+
+    def tendencia(self, tema: str, granularidade: str = 'diario', periodos: int = 90) -> pd.DataFrame:
+        """
+        Série de um tema lida dos agregados.
+
+        Returns:
+            pd.DataFrame: periodo, execucoes, artigos (distintos), caracteres e
+            sentimento_medio
+        """
+        if granularidade not in GRANULARIDADES:
+            raise ValueError(f"Granularidade desconhecida: {granularidade}")
+        with conectar(self.caminho_db) as conexao:
+            df = pd.read_sql_query(
+                f"SELECT periodo, execucoes, artigos, caracteres, "
+                f"CASE WHEN artigos_com_sentimento > 0 "
+                f"THEN soma_sentimento / artigos_com_sentimento END AS sentimento_medio "
+                f"FROM agregado_{granularidade} WHERE tema = ? ORDER BY periodo DESC LIMIT ?",
+                conexao, params=(normalizar_tema(tema), periodos)
+            )
+        return df.sort_values('periodo').reset_index(drop=True)
+
+    def veiculos(self, tema: str, granularidade: str = 'semanal', periodos: int = 12,
+                 max_veiculos: int = 8) -> pd.DataFrame:
+        """
+        Artigos por veículo e período, lidos dos agregados.
+
+        Veículos fora dos ``max_veiculos`` mais frequentes são somados em "outros".
+
+        Returns:
+            pd.DataFrame: periodo, veiculo e artigos
+        """
+        if granularidade not in GRANULARIDADES:
+            raise ValueError(f"Granularidade desconhecida: {granularidade}")
+        with conectar(self.caminho_db) as conexao:
+            df = pd.read_sql_query(
+                f"SELECT periodo, veiculo, artigos FROM veiculos_{granularidade} "
+                f"WHERE tema = ? AND periodo IN (SELECT periodo FROM agregado_{granularidade} "
+                f"WHERE tema = ? ORDER BY periodo DESC LIMIT ?)",
+                conexao, params=(normalizar_tema(tema), normalizar_tema(tema), periodos)
+            )
+        if df.empty:
+            return df
+        principais = df.groupby('veiculo')['artigos'].sum().nlargest(max_veiculos).index
+        df['veiculo'] = df['veiculo'].where(df['veiculo'].isin(principais), 'outros')
+        return df.groupby(['periodo', 'veiculo'], as_index=False)['artigos'].sum().sort_values('periodo')
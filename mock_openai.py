@@ -0,0 +1,127 @@
+"""
+Servidor local que imita o endpoint de chat completions da OpenAI.
+
+Serve para testar o cliente compartilhado (cliente_api.py) sem gastar cota:
+pode responder 429 com Retry-After ou 5xx nas primeiras requisições, simular
+latência e devolve sempre um bloco ``usage`` como a API real.
+
+Uso:
+    python mock_openai.py --porta 8099 --falhas-429 2 --retry-after 1
+
+E aponte o app para ele com a variável de ambiente
+OPENAI_API_URL=http://127.0.0.1:8099/v1/chat/completions
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class EstadoMock:
+    """Configuração e contadores compartilhados pelas requisições do servidor."""
+
+    def __init__(self, falhas_429: int = 0, falhas_500: int = 0,
+                 retry_after: float = 1.0, latencia: float = 0.0):
+        self.falhas_429 = falhas_429
+        self.falhas_500 = falhas_500
+        self.retry_after = retry_after
+        self.latencia = latencia
+        self.requisicoes = 0
+        self.corpos = []
+        self.momentos = []  # time.monotonic() de chegada de cada requisição
+        self.lock = threading.Lock()
+
+
+def _criar_handler(estado: EstadoMock):
+    class HandlerMock(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'  # Mantém conexões keep-alive
+
+        def log_message(self, formato, *args):
+            pass
+
+        def _responder(self, status: int, corpo: dict, cabecalhos: dict = None):
+            dados = json.dumps(corpo).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(dados)))
+            for nome, valor in (cabecalhos or {}).items():
+                self.send_header(nome, valor)
+            self.end_headers()
+            self.wfile.write(dados)
+
+        def do_POST(self):
+            tamanho = int(self.headers.get('Content-Length', 0))
+            corpo = json.loads(self.rfile.read(tamanho) or b'{}')
+
+            with estado.lock:
+                estado.requisicoes += 1
+                estado.corpos.append(corpo)
+                estado.momentos.append(time.monotonic())
+                numero = estado.requisicoes
+
+            if estado.latencia:
+                time.sleep(estado.latencia)
+
+            if numero <= estado.falhas_429:
+                self._responder(429, {'error': {'message': 'Rate limit reached', 'type': 'requests'}},
+                                {'Retry-After': str(estado.retry_after)})
+                return
+            if numero <= estado.falhas_429 + estado.falhas_500:
+                self._responder(503, {'error': {'message': 'Service unavailable'}})
+                return
+
+            mensagens = corpo.get('messages', [])
+            prompt_tokens = sum(len(str(m.get('content', ''))) for m in mensagens) // 4
+            conteudo = f"Resposta simulada #{numero} para o modelo {corpo.get('model')}."
+            completion_tokens = len(conteudo) // 4
+            self._responder(200, {
+                'id': f'chatcmpl-mock-{numero}',
+                'object': 'chat.completion',
+                'model': corpo.get('model'),
+                'choices': [{'index': 0, 'finish_reason': 'stop',
+                             'message': {'role': 'assistant', 'content': conteudo}}],
+                'usage': {'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens,
+                          'total_tokens': prompt_tokens + completion_tokens},
+            })
+
+    return HandlerMock
+
+
+def iniciar_servidor_mock(porta: int = 0, **configuracao):
+    """
+    Inicia o servidor mock em uma thread em segundo plano.
+
+    Args:
+        porta: Porta local (0 escolhe uma porta livre)
+        **configuracao: falhas_429, falhas_500, retry_after e latencia
+
+    Returns:
+        tuple: (servidor, estado, url do endpoint de chat)
+    """
+    estado = EstadoMock(**configuracao)
+    servidor = ThreadingHTTPServer(('127.0.0.1', porta), _criar_handler(estado))
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    url = f'http://127.0.0.1:{servidor.server_address[1]}/v1/chat/completions'
+    return servidor, estado, url
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Servidor mock da API de chat da OpenAI')
+    parser.add_argument('--porta', type=int, default=8099)
+    parser.add_argument('--falhas-429', type=int, default=0)
+    parser.add_argument('--falhas-500', type=int, default=0)
+    parser.add_argument('--retry-after', type=float, default=1.0)
+    parser.add_argument('--latencia', type=float, default=0.0)
+    args = parser.parse_args()
+
+    servidor, estado, url = iniciar_servidor_mock(
+        args.porta, falhas_429=args.falhas_429, falhas_500=args.falhas_500,
+        retry_after=args.retry_after, latencia=args.latencia
+    )
+    print(f"Servidor mock em {url} (Ctrl+C para encerrar)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        servidor.shutdown()
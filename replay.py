@@ -0,0 +1,326 @@
+"""
+Gravação e reprodução (record/replay) das chamadas externas do app.
+
+Permite testar e medir carga sem acessar a SerpAPI, os sites das notícias e a
+OpenAI. O modo é escolhido por variáveis de ambiente:
+
+- ``REPLAY_MODO=gravar`` e ``REPLAY_CASSETE=cassetes/tema.jsonl``: o app faz as
+  chamadas reais e grava buscas, páginas HTML, imagens e respostas da IA (com
+  a latência observada) no cassete;
+- ``REPLAY_MODO=reproduzir`` e ``REPLAY_URL=http://127.0.0.1:8765``: buscas,
+  páginas, imagens e chamadas à IA vão para o servidor local que serve o
+  cassete.
+
+Para subir o servidor local:
+
+    python replay.py cassetes/tema.jsonl --porta 8765 --latencia
+
+O cassete é um arquivo JSON Lines: cada gravação acrescenta uma linha
+``{"secao", "chave", "valor"}``, então gravar não reescreve o arquivo (páginas
+e imagens podem ter vários MB). Ao carregar, a última linha de cada chave
+prevalece.
+"""
+import argparse
+import base64
+import json
+import os
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Optional
+from urllib.parse import parse_qs, quote, urlparse
+
+import requests
+
+from cache_compartilhado import gerar_chave
+
+MODO_GRAVAR = 'gravar'
+MODO_REPRODUZIR = 'reproduzir'
+
+
+def modo() -> Optional[str]:
+    """Modo de replay ativo (lido a cada chamada, para valer em qualquer sessão)."""
+    return os.getenv('REPLAY_MODO') or None
+
+
+def _url_servidor() -> str:
+    return os.getenv('REPLAY_URL', 'http://127.0.0.1:8765').rstrip('/')
+
+
+def chave_completion(body_message: dict) -> str:
+    """Chave de uma requisição de chat: modelo e mensagens."""
+    return gerar_chave(body_message.get('model'), body_message.get('messages'))
+
+
+class Cassete:
+    """Arquivo JSON Lines com buscas, páginas, imagens (em base64) e respostas da IA gravadas."""
+
+    def __init__(self, caminho: str):
+        self.caminho = caminho
+        self._lock = threading.Lock()
+        self.dados = {'buscas': {}, 'paginas': {}, 'imagens': {}, 'completions': {}}
+        # Gravação interrompida sem quebra de linha no fim
+        self._quebra_pendente = False
+        if os.path.exists(caminho):
+            self._carregar()
+
+    def _carregar(self) -> None:
+        with open(self.caminho, encoding='utf-8') as f:
+            for linha in f:
+                self._quebra_pendente = not linha.endswith('\n')
+                if not linha.strip():
+                    continue
+                try:
+                    registro = json.loads(linha)
+                except json.JSONDecodeError:
+                    # Linha truncada por uma gravação interrompida
+                    continue
+                self.dados.setdefault(registro['secao'], {})[registro['chave']] = registro['valor']
+
+    def gravar(self, secao: str, chave: str, valor: dict) -> None:
+        """Grava uma entrada, acrescentando uma linha ao fim do arquivo."""
+        linha = json.dumps({'secao': secao, 'chave': chave, 'valor': valor}, ensure_ascii=False)
+        with self._lock:
+            self.dados[secao][chave] = valor
+            pasta = os.path.dirname(self.caminho)
+            if pasta:
+                os.makedirs(pasta, exist_ok=True)
+            with open(self.caminho, 'a', encoding='utf-8') as f:
+                f.write(('\n' if self._quebra_pendente else '') + linha + '\n')
+            self._quebra_pendente = False
+
+    def obter(self, secao: str, chave: str) -> Optional[dict]:
+        return self.dados[secao].get(chave)
+
+
+_cassetes = {}
+_lock_cassetes = threading.Lock()
+
+
+def _cassete_gravacao() -> Optional[Cassete]:
+    if modo() != MODO_GRAVAR:
+        return None
+    caminho = os.getenv('REPLAY_CASSETE', os.path.join('cassetes', 'cassete.jsonl'))
+    with _lock_cassetes:
+        if caminho not in _cassetes:
+            _cassetes[caminho] = Cassete(caminho)
+        return _cassetes[caminho]
+
+
+# ---------------------------------------------------------------------------
+# Pontos de integração usados pelo app
+# ---------------------------------------------------------------------------
+
+def buscar(params: dict, classe_busca: Callable) -> dict:
+    """
+    Executa uma busca de notícias, gravando ou reproduzindo conforme o modo.
+
+    Args:
+        params: Parâmetros da SerpAPI
+        classe_busca: Classe de busca real (GoogleSearch)
+
+    Returns:
+        dict: Resultado no formato da SerpAPI
+    """
+    if modo() == MODO_REPRODUZIR:
+        resposta = requests.get(f"{_url_servidor()}/busca", params={'q': params['q']}, timeout=10)
+        resposta.raise_for_status()
+        return resposta.json()
+
+    inicio = time.perf_counter()
+    resultados = classe_busca(params).get_dict()
+    cassete = _cassete_gravacao()
+    if cassete is not None:
+        cassete.gravar('buscas', params['q'], {
+            'resultado': resultados,
+            'latencia_ms': (time.perf_counter() - inicio) * 1000
+        })
+    return resultados
+
+
+def url_pagina(url: str) -> str:
+    """URL a baixar: a original ou, em reprodução, a do servidor local."""
+    if modo() == MODO_REPRODUZIR:
+        return f"{_url_servidor()}/pagina?url={quote(url, safe='')}"
+    return url
+
+
+def gravar_pagina(url: str, response: requests.Response) -> None:
+    """Grava a página baixada, se o modo de gravação estiver ativo."""
+    cassete = _cassete_gravacao()
+    if cassete is not None:
+        cassete.gravar('paginas', url, {
+            'status': response.status_code,
+            'content_type': response.headers.get('Content-Type', 'text/html; charset=utf-8'),
+            'html': response.text,
+            'latencia_ms': response.elapsed.total_seconds() * 1000
+        })
+
+
+def url_imagem(url: str) -> str:
+    """URL da imagem a baixar: a original ou, em reprodução, a do servidor local."""
+    if modo() == MODO_REPRODUZIR:
+        return f"{_url_servidor()}/imagem?url={quote(url, safe='')}"
+    return url
+
+
+def gravar_imagem(url: str, conteudo: bytes, content_type: str, latencia_ms: float = 0) -> None:
+    """Grava a imagem baixada (com o tempo do download), se o modo de gravação estiver ativo."""
+    cassete = _cassete_gravacao()
+    if cassete is not None:
+        cassete.gravar('imagens', url, {
+            'content_type': content_type,
+            'conteudo': base64.b64encode(conteudo).decode('ascii'),
+            'latencia_ms': latencia_ms
+        })
+
+
+def url_api(api_url: str) -> str:
+    """Endpoint de chat: o original ou, em reprodução, o do servidor local."""
+    if modo() == MODO_REPRODUZIR:
+        return f"{_url_servidor()}/v1/chat/completions"
+    return api_url
+
+
+def gravar_completion(body_message: dict, resposta: dict, latencia_ms: float) -> None:
+    """Grava a resposta da IA, se o modo de gravação estiver ativo."""
+    cassete = _cassete_gravacao()
+    if cassete is not None:
+        cassete.gravar('completions', chave_completion(body_message), {
+            'model': body_message.get('model'),
+            'resposta': resposta,
+            'latencia_ms': latencia_ms
+        })
+
+
+# ---------------------------------------------------------------------------
+# Servidor local que serve o cassete
+# ---------------------------------------------------------------------------
+
+def _resposta_completion(cassete: Cassete, body_message: dict) -> dict:
+    """
+    Resposta gravada para a requisição.
+
+    A ordem dos textos no prompt depende da ordem em que os downloads terminam,
+    então, sem correspondência exata, usa a gravação do mesmo modelo (ou
+    qualquer uma) antes de cair em uma resposta sintética.
+    """
+    gravada = cassete.obter('completions', chave_completion(body_message))
+    if gravada is None:
+        candidatas = list(cassete.dados['completions'].values())
+        mesmo_modelo = [c for c in candidatas if c.get('model') == body_message.get('model')]
+        gravada = (mesmo_modelo or candidatas or [None])[0]
+    if gravada is not None:
+        return gravada
+
+    conteudo = "Resposta reproduzida (sem gravação correspondente no cassete)."
+    return {'latencia_ms': 0, 'resposta': {
+        'object': 'chat.completion', 'model': body_message.get('model'),
+        'choices': [{'index': 0, 'finish_reason': 'stop', 'message': {'role': 'assistant', 'content': conteudo}}],
+        'usage': {'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0}
+    }}
+
+
+def _criar_handler(cassete: Cassete, simular_latencia: bool, requisicoes: Counter):
+    lock_contagem = threading.Lock()
+
+    def contar(rota: str) -> None:
+        with lock_contagem:
+            requisicoes[rota] += 1
+
+    class HandlerReplay(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'  # Mantém conexões keep-alive
+
+        def log_message(self, formato, *args):
+            pass
+
+        def _responder(self, status: int, corpo: bytes, content_type: str, latencia_ms: float = 0):
+            if simular_latencia and latencia_ms:
+                time.sleep(latencia_ms / 1000)
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(corpo)))
+            self.end_headers()
+            self.wfile.write(corpo)
+
+        def _json(self, status: int, dados: dict, latencia_ms: float = 0):
+            self._responder(status, json.dumps(dados, ensure_ascii=False).encode('utf-8'),
+                            'application/json', latencia_ms)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            consulta = parse_qs(url.query)
+            contar(url.path.strip('/'))
+            if url.path == '/busca':
+                gravada = cassete.obter('buscas', consulta.get('q', [''])[0])
+                if gravada is None:
+                    self._json(200, {'news_results': []})
+                else:
+                    self._json(200, gravada['resultado'], gravada.get('latencia_ms', 0))
+            elif url.path == '/pagina':
+                gravada = cassete.obter('paginas', consulta.get('url', [''])[0])
+                if gravada is None:
+                    self._json(404, {'erro': 'Página não gravada'})
+                else:
+                    self._responder(gravada['status'], gravada['html'].encode('utf-8'),
+                                    'text/html; charset=utf-8', gravada.get('latencia_ms', 0))
+            elif url.path == '/imagem':
+                gravada = cassete.obter('imagens', consulta.get('url', [''])[0])
+                if gravada is None:
+                    self._json(404, {'erro': 'Imagem não gravada'})
+                else:
+                    self._responder(200, base64.b64decode(gravada['conteudo']), gravada['content_type'],
+                                    gravada.get('latencia_ms', 0))
+            else:
+                self._json(404, {'erro': 'Rota desconhecida'})
+
+        def do_POST(self):
+            tamanho = int(self.headers.get('Content-Length', 0))
+            corpo = json.loads(self.rfile.read(tamanho) or b'{}')
+            if urlparse(self.path).path != '/v1/chat/completions':
+                self._json(404, {'erro': 'Rota desconhecida'})
+                return
+            contar('completion')
+            gravada = _resposta_completion(cassete, corpo)
+            self._json(200, gravada['resposta'], gravada.get('latencia_ms', 0))
+
+    return HandlerReplay
+
+
+def iniciar_servidor_replay(caminho_cassete: str, porta: int = 0, simular_latencia: bool = False):
+    """
+    Inicia o servidor de reprodução em uma thread em segundo plano.
+
+    Args:
+        caminho_cassete: Arquivo do cassete gravado
+        porta: Porta local (0 escolhe uma porta livre)
+        simular_latencia: Repete a latência observada na gravação
+
+    Returns:
+        tuple: (servidor, url base). ``servidor.requisicoes`` conta as
+        requisições atendidas por rota (busca, pagina, imagem, completion)
+    """
+    cassete = Cassete(caminho_cassete)
+    requisicoes = Counter()
+    servidor = ThreadingHTTPServer(('127.0.0.1', porta), _criar_handler(cassete, simular_latencia, requisicoes))
+    servidor.requisicoes = requisicoes
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor, f"http://127.0.0.1:{servidor.server_address[1]}"
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Servidor de reprodução de cassetes')
+    parser.add_argument('cassete')
+    parser.add_argument('--porta', type=int, default=8765)
+    parser.add_argument('--latencia', action='store_true', help='Simula a latência gravada')
+    args = parser.parse_args()
+
+    servidor, url = iniciar_servidor_replay(args.cassete, args.porta, args.latencia)
+    print(f"Servindo {args.cassete} em {url} (Ctrl+C para encerrar)")
+    print(f"Use REPLAY_MODO={MODO_REPRODUZIR} REPLAY_URL={url}")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        servidor.shutdown()
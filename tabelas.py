@@ -0,0 +1,291 @@
+"""
+Extração de tabelas das notícias para DataFrames.
+
+Em vez de achatar as tabelas HTML em texto com " | ", cada tabela de dados vira
+um DataFrame com os números em formato pt-BR ("1.234,56", "12%", "R$ 3,5")
+convertidos de forma vetorizada. As tabelas seguem para a IA como CSV compacto
+e alimentam gráficos de verdade no relatório executivo e na tela.
+"""
+from io import StringIO
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+from bs4 import BeautifulSoup, Tag
+from reportlab.graphics.charts.barcharts import HorizontalBarChart, VerticalBarChart
+from reportlab.graphics.shapes import Drawing, String
+from reportlab.lib import colors
+
+from extracao import densidade_links, tabelas_de_conteudo
+
+# Fração mínima de células que precisam ser números para converter a coluna
+PROPORCAO_NUMERICA = 0.6
+
+CORES_SERIES = ['#4D268C', '#FCA629', '#8C6BC8', '#F2C46D']
+
+
+def converter_numeros_ptbr(serie: pd.Series) -> pd.Series:
+    """
+    Converte uma série de textos em números no formato brasileiro.
+
+    Aceita separador de milhar ".", decimal ",", prefixo "R$", sufixo "%",
+    sinal de menos tipográfico e negativos entre parênteses. Um valor sem
+    vírgula só tem o ponto tratado como milhar quando segue o padrão
+    "1.234.567"; caso contrário o ponto é decimal.
+
+    Args:
+        serie: Série de textos
+
+    Returns:
+        pd.Series: Valores float (NaN onde não houver número)
+    """
+    texto = serie.astype('string').str.strip()
+    texto = texto.str.replace('−', '-', regex=False)
+    negativo_parenteses = texto.str.fullmatch(r'\(.*\)').fillna(False)
+    texto = texto.str.replace(r'[()R$%\s ]', '', regex=True)
+
+    tem_virgula = texto.str.contains(',', regex=False).fillna(False)
+    so_milhar = texto.str.fullmatch(r'-?\d{1,3}(\.\d{3})+').fillna(False)
+    sem_milhar = texto.where(~(tem_virgula | so_milhar), texto.str.replace('.', '', regex=False))
+    normalizado = sem_milhar.str.replace(',', '.', regex=False)
+
+    numeros = pd.to_numeric(normalizado, errors='coerce').astype(float)
+    return numeros.where(~negativo_parenteses, -numeros)
+
+
+def formatar_numero_ptbr(valor) -> str:
+    """Formata um valor para exibição no padrão brasileiro ("1.234,56")."""
+    if valor is None or (isinstance(valor, float) and np.isnan(valor)):
+        return ''
+    if isinstance(valor, (int, float, np.number)):
+        texto = f"{valor:,.2f}" if float(valor) != int(valor) else f"{int(valor):,}"
+        return texto.replace(',', 'X').replace('.', ',').replace('X', '.')
+    return str(valor)
+
+
+def _linhas_tabela(tabela: Tag) -> List[List[str]]:
+    """Lê as células de uma tabela, repetindo valores de colspan."""
+    linhas = []
+    for tr in tabela.find_all('tr'):
+        linha = []
+        for celula in tr.find_all(['th', 'td']):
+            texto = celula.get_text(' ', strip=True)
+            try:
+                repeticoes = max(int(celula.get('colspan', 1)), 1)
+            except ValueError:
+                repeticoes = 1
+            linha.extend([texto] * min(repeticoes, 20))
+        if any(linha):
+            linhas.append(linha)
+    return linhas
+
+
+def normalizar_tabela(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Converte para número as colunas majoritariamente numéricas.
+
+    Colunas em que todos os valores vêm com "%" ganham o sufixo "(%)" no nome.
+    """
+    df = df.copy()
+    for coluna in df.columns:
+        valores = df[coluna].astype('string').str.strip()
+        preenchidos = valores.fillna('').str.len() > 0
+        if not preenchidos.any():
+            continue
+        numeros = converter_numeros_ptbr(valores)
+        if numeros[preenchidos].notna().mean() >= PROPORCAO_NUMERICA:
+            df[coluna] = numeros
+            if valores[preenchidos].str.endswith('%').all() and '%' not in str(coluna):
+                df = df.rename(columns={coluna: f"{coluna} (%)"})
+    return df
+
+
+def tabela_para_dataframe(tabela: Tag) -> Optional[pd.DataFrame]:
+    """
+    Converte uma tabela HTML de dados em DataFrame.
+
+    Tabelas de navegação (quase só links) e tabelas com menos de duas linhas
+    de dados ou duas colunas são ignoradas.
+
+    Returns:
+        pd.DataFrame ou None
+    """
+    if densidade_links(tabela) > 0.5:
+        return None
+    linhas = _linhas_tabela(tabela)
+    if len(linhas) < 3:
+        return None
+
+    num_colunas = max(len(linha) for linha in linhas)
+    if num_colunas < 2:
+        return None
+    linhas = [linha + [''] * (num_colunas - len(linha)) for linha in linhas]
+
+    # A primeira linha é o cabeçalho; nomes vazios ou repetidos ganham índice
+    cabecalho = []
+    for i, nome in enumerate(linhas[0]):
+        nome = nome or f"coluna_{i + 1}"
+        cabecalho.append(nome if nome not in cabecalho else f"{nome}_{i + 1}")
+
+    return normalizar_tabela(pd.DataFrame(linhas[1:], columns=cabecalho))
+
+
+def extrair_tabelas(soup: BeautifulSoup, remover: bool = True, max_tabelas: int = 5,
+                    somente_conteudo: bool = False) -> List[pd.DataFrame]:
+    """
+    Extrai as tabelas de dados de um documento.
+
+    Args:
+        soup: Documento parseado
+        remover: Remove do documento as tabelas extraídas, para que não sejam
+            achatadas de novo no texto da notícia
+        max_tabelas: Quantidade máxima de tabelas retornadas
+        somente_conteudo: Ignora tabelas dentro de boilerplate (barras
+            laterais, rodapés), sem podar o documento
+
+    Returns:
+        list: DataFrames das tabelas encontradas
+    """
+    tabelas = []
+    candidatas = tabelas_de_conteudo(soup) if somente_conteudo else soup.find_all('table')
+    for tabela in candidatas:
+        # Tabelas aninhadas são lidas junto com a tabela externa
+        if tabela.find_parent('table') is not None:
+            continue
+        df = tabela_para_dataframe(tabela)
+        if df is None:
+            continue
+        tabelas.append(df)
+        if remover:
+            tabela.decompose()
+        if len(tabelas) >= max_tabelas:
+            break
+    return tabelas
+
+
+def tabela_para_csv(df: pd.DataFrame, max_linhas: int = 30) -> str:
+    """CSV compacto da tabela (sem índice, números com até 6 dígitos significativos)."""
+    return df.head(max_linhas).to_csv(index=False, float_format='%.6g').strip()
+
+
+def tabela_de_csv(csv: str) -> pd.DataFrame:
+    """Reconstrói um DataFrame a partir do CSV gerado por tabela_para_csv."""
+    return pd.read_csv(StringIO(csv))
+
+
+def tabelas_para_prompt(tabelas: List[dict], limite_caracteres: int = 3000) -> str:
+    """
+    Monta a seção de tabelas do prompt em CSV, dentro de um limite de tamanho.
+
+    Args:
+        tabelas: Lista de dicts com 'fonte' e 'csv'
+        limite_caracteres: Tamanho máximo da seção
+
+    Returns:
+        str: Seção pronta para o prompt (vazia se não houver tabelas)
+    """
+    partes = []
+    total = 0
+    for i, tabela in enumerate(tabelas):
+        bloco = f"Tabela {i + 1} (fonte: {tabela['fonte']}):\n{tabela['csv']}"
+        if total + len(bloco) > limite_caracteres:
+            break
+        partes.append(bloco)
+        total += len(bloco)
+    return '\n\n'.join(partes)
+
+
+def colunas_para_grafico(df: pd.DataFrame, max_series: int = 3):
+    """
+    Escolhe a coluna de rótulos e as colunas numéricas a plotar.
+
+    Percentuais e valores absolutos não são misturados no mesmo gráfico: vale
+    o tipo da primeira coluna numérica.
+
+    Returns:
+        tuple: (coluna de rótulos ou None, lista de colunas numéricas)
+    """
+    numericas = [c for c in df.columns if pd.api.types.is_numeric_dtype(df[c])]
+    textuais = [c for c in df.columns if c not in numericas]
+    if numericas:
+        percentual = '%' in str(numericas[0])
+        numericas = [c for c in numericas if ('%' in str(c)) == percentual]
+    rotulo = textuais[0] if textuais else None
+    return rotulo, numericas[:max_series]
+
+
+def grafico_barras(rotulos: List[str], series: List[List[float]], nomes_series: List[str] = None,
+                   largura: float = 450, altura: float = 200, horizontal: bool = False) -> Drawing:
+    """
+    Desenha um gráfico de barras com os valores reais (reportlab.graphics).
+
+    Args:
+        rotulos: Rótulos das categorias
+        series: Lista de séries, cada uma com um valor por categoria
+        nomes_series: Nomes exibidos na legenda
+        largura: Largura do desenho em pontos
+        altura: Altura do desenho em pontos
+        horizontal: Barras horizontais em vez de verticais
+
+    Returns:
+        Drawing: Desenho pronto para entrar no PDF
+    """
+    desenho = Drawing(largura, altura)
+    grafico = HorizontalBarChart() if horizontal else VerticalBarChart()
+    grafico.x = 110 if horizontal else 40
+    grafico.y = 30
+    grafico.width = largura - grafico.x - 20
+    grafico.height = altura - 60
+    grafico.data = [tuple(0.0 if np.isnan(v) else float(v) for v in serie) for serie in series]
+
+    grafico.categoryAxis.categoryNames = [str(r)[:18] for r in rotulos]
+    grafico.categoryAxis.labels.fontSize = 7
+    grafico.valueAxis.labels.fontSize = 7
+    if not horizontal:
+        grafico.categoryAxis.labels.angle = 30 if len(rotulos) > 4 else 0
+        grafico.categoryAxis.labels.boxAnchor = 'ne' if len(rotulos) > 4 else 'n'
+
+    valores = [v for serie in grafico.data for v in serie]
+    grafico.valueAxis.valueMin = min(0.0, min(valores))
+    grafico.valueAxis.valueMax = max(valores) * 1.1 if max(valores) > 0 else 1.0
+    for i in range(len(series)):
+        grafico.bars[i].fillColor = colors.HexColor(CORES_SERIES[i % len(CORES_SERIES)])
+        grafico.bars[i].strokeColor = None
+
+    desenho.add(grafico)
+
+    # Legenda simples quando há mais de uma série
+    if nomes_series and len(nomes_series) > 1:
+        for i, nome in enumerate(nomes_series):
+            desenho.add(String(grafico.x + i * 120, altura - 12, f"■ {str(nome)[:20]}",
+                               fontSize=8, fillColor=colors.HexColor(CORES_SERIES[i % len(CORES_SERIES)])))
+    return desenho
+
+
+def grafico_tabela(df: pd.DataFrame, largura: float = 450, altura: float = 200,
+                   max_linhas: int = 12) -> Optional[Drawing]:
+    """
+    Gráfico de barras de uma tabela, ou None se ela não tiver dados plotáveis.
+    """
+    rotulo, numericas = colunas_para_grafico(df)
+    dados = df.head(max_linhas)
+    if not numericas or dados[numericas].notna().sum().sum() == 0:
+        return None
+    rotulos = dados[rotulo].astype(str).tolist() if rotulo else [str(i + 1) for i in range(len(dados))]
+    series = [dados[coluna].tolist() for coluna in numericas]
+    return grafico_barras(rotulos, series, [str(c) for c in numericas], largura, altura,
+                          horizontal=len(rotulos) > 6)
+
+
+def figura_plotly(df: pd.DataFrame, titulo: str = ''):
+    """Figura Plotly de barras para exibir a tabela na tela (None se não houver números)."""
+    rotulo, numericas = colunas_para_grafico(df)
+    if not numericas:
+        return None
+    dados = df.reset_index() if rotulo is None else df
+    eixo_x = rotulo if rotulo is not None else 'index'
+    figura = px.bar(dados, x=eixo_x, y=numericas, barmode='group', title=titulo,
+                    color_discrete_sequence=CORES_SERIES)
+    figura.update_layout(legend_title_text='', xaxis_title='', yaxis_title='')
+    return figura
@@ -0,0 +1,107 @@
+import threading
+import time
+
+import pytest
+
+import cache_compartilhado
+from cache_compartilhado import CacheLimitado, SingleFlight, gerar_chave
+
+
+def test_chamadas_concorrentes_executam_uma_unica_vez():
+    voo = SingleFlight(CacheLimitado())
+    execucoes = []
+    liberar = threading.Event()
+
+    def lenta(valor):
+        execucoes.append(valor)
+        liberar.wait(2)
+        return valor * 2
+
+    resultados = []
+    threads = [threading.Thread(target=lambda: resultados.append(voo.executar('k', lenta, 21)))
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.1)
+    liberar.set()
+    for thread in threads:
+        thread.join()
+
+    assert execucoes == [21]
+    assert resultados == [42] * 8
+    assert voo.estatisticas()['coalescidas'] == 7
+
+
+def test_excecao_chega_a_todas_as_threads_e_nao_fica_em_cache():
+    voo = SingleFlight(CacheLimitado())
+    liberar = threading.Event()
+
+    def falha():
+        liberar.wait(2)
+        raise ValueError('falhou')
+
+    erros = []
+
+    def chamar():
+        try:
+            voo.executar('k', falha)
+        except ValueError as e:
+            erros.append(e)
+
+    threads = [threading.Thread(target=chamar) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.1)
+    liberar.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(erros) == 4
+    assert voo.executar('k', lambda: 'ok') == 'ok'
+
+
+def test_resultado_em_cache_atende_chamadas_seguintes():
+    voo = SingleFlight(CacheLimitado())
+    chamadas = []
+    for _ in range(3):
+        voo.executar('k', lambda: chamadas.append(1) or 'valor')
+    assert len(chamadas) == 1
+    assert voo.estatisticas()['acertos_cache'] == 2
+
+
+def test_criterio_armazenar_evita_cache_de_resultados_vazios():
+    voo = SingleFlight(CacheLimitado())
+    chamadas = []
+    for _ in range(2):
+        voo.executar('k', lambda: chamadas.append(1) or {'texto': ''},
+                     armazenar=lambda resultado: bool(resultado['texto']))
+    assert len(chamadas) == 2
+
+
+def test_cache_desativado_executa_toda_chamada(monkeypatch):
+    monkeypatch.setenv('CACHE_COMPARTILHADO', 'desativado')
+    voo = SingleFlight(cache_compartilhado._cache(max_itens=8, ttl=60))
+    chamadas = []
+    for _ in range(2):
+        voo.executar('k', lambda: chamadas.append(1) or 'valor')
+    assert len(chamadas) == 2
+    assert voo.estatisticas()['acertos_cache'] == 0
+
+
+def test_cache_descarta_menos_usado_e_expira():
+    cache = CacheLimitado(max_itens=2, ttl=0.2)
+    cache.guardar('a', 1)
+    cache.guardar('b', 2)
+    assert cache.obter('a') == (True, 1)  # "a" passa a ser o mais recente
+    cache.guardar('c', 3)
+    assert cache.obter('b') == (False, None)
+    assert cache.obter('a') == (True, 1)
+
+    time.sleep(0.25)
+    assert cache.obter('c') == (False, None)
+
+
+@pytest.mark.parametrize('a, b', [({'x': 1, 'y': 2}, {'y': 2, 'x': 1})])
+def test_chave_estavel_independe_da_ordem(a, b):
+    assert gerar_chave('completion', a) == gerar_chave('completion', b)
+    assert gerar_chave('completion', a) != gerar_chave('busca', a)
@@ -0,0 +1,186 @@
+import threading
+import time
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+
+import pytest
+import requests
+
+from cliente_api import AgendadorModelo, BaldeDeTokens, ClienteAPI, tempo_retry_after
+from mock_openai import iniciar_servidor_mock
+
+CORPO = {'model': 'gpt-4o-mini', 'messages': [{'role': 'user', 'content': 'Olá'}], 'max_tokens': 10}
+
+
+@pytest.fixture
+def mock():
+    servidores = []
+
+    def iniciar(**configuracao):
+        servidor, estado, url = iniciar_servidor_mock(**configuracao)
+        servidores.append(servidor)
+        return estado, ClienteAPI(url, {'Content-Type': 'application/json'}, max_tentativas=3,
+                                  backoff_base=0.01, backoff_maximo=2)
+
+    yield iniciar
+    for servidor in servidores:
+        servidor.shutdown()
+
+
+def _resposta(cabecalhos: dict) -> requests.Response:
+    response = requests.Response()
+    response.status_code = 429
+    response.headers.update(cabecalhos)
+    return response
+
+
+def test_repete_apos_429_respeitando_retry_after(mock):
+    estado, cliente = mock(falhas_429=2, retry_after=0.3)
+    dados, latencia_ms = cliente.chat(CORPO)
+
+    assert estado.requisicoes == 3
+    # Só a tentativa que teve sucesso conta, não as esperas entre elas
+    assert latencia_ms < 250
+    assert dados['choices'][0]['message']['content'].startswith('Resposta simulada #3')
+    intervalos = [b - a for a, b in zip(estado.momentos, estado.momentos[1:])]
+    assert all(intervalo >= 0.28 for intervalo in intervalos), intervalos
+
+
+def test_repete_apos_5xx_com_backoff(mock):
+    estado, cliente = mock(falhas_500=2)
+    cliente.chat(CORPO)
+    assert estado.requisicoes == 3
+
+
+def test_ultima_tentativa_levanta_o_erro(mock):
+    estado, cliente = mock(falhas_429=10, retry_after=0.01)
+    with pytest.raises(requests.HTTPError) as erro:
+        cliente.chat(CORPO)
+    assert erro.value.response.status_code == 429
+    assert estado.requisicoes == 3
+
+
+def test_429_pausa_as_outras_sessoes(mock):
+    estado, cliente = mock(falhas_429=1, retry_after=0.4)
+    inicio = time.monotonic()
+    thread = threading.Thread(target=cliente.chat, args=(CORPO, 'a'))
+    thread.start()
+    time.sleep(0.1)  # A sessão "a" já recebeu o 429
+    cliente.chat(dict(CORPO, temperature=0.5), 'b')
+    thread.join()
+    # A sessão "b" só pode ter sido atendida depois da pausa
+    assert estado.momentos[1] - inicio >= 0.35
+
+
+def test_retry_after_acima_do_backoff_maximo_e_respeitado(mock):
+    _, cliente = mock()
+    assert cliente._espera_backoff(0, _resposta({'Retry-After': '60'})) == 60
+
+
+def test_retry_after_acima_do_limite_falha_na_hora(mock):
+    estado, cliente = mock(falhas_429=1, retry_after=600)
+    inicio = time.monotonic()
+    with pytest.raises(requests.HTTPError):
+        cliente.chat(CORPO)
+    assert estado.requisicoes == 1
+    assert time.monotonic() - inicio < 1
+
+
+def test_tentativas_recusadas_devolvem_os_tokens(mock):
+    corpo = dict(CORPO, max_tokens=300)
+    saldos = {}
+    for falhas in (0, 3):
+        estado, cliente = mock(falhas_429=falhas, retry_after=0.01)
+        agendador = cliente.agendador(corpo['model'])
+        # 10 tokens/s: a reposição durante o teste é desprezível
+        agendador.tokens = BaldeDeTokens(600, 10)
+        cliente.max_tentativas = 4
+        cliente.chat(corpo)
+        saldos[falhas] = agendador.tokens.saldo
+    # Só o uso real da tentativa aceita sai do balde
+    assert saldos[3] == pytest.approx(saldos[0], abs=2)
+
+
+def test_falha_de_conexao_devolve_os_tokens():
+    cliente = ClienteAPI('http://127.0.0.1:9/v1/chat/completions', {}, max_tentativas=2, backoff_base=0.01)
+    agendador = cliente.agendador(CORPO['model'])
+    agendador.tokens = BaldeDeTokens(600, 10)
+    with pytest.raises(requests.ConnectionError):
+        cliente.chat(dict(CORPO, max_tokens=300))
+    assert agendador.tokens.saldo == pytest.approx(600, abs=2)
+
+
+def test_nova_tentativa_volta_na_frente_do_rodizio():
+    agendador = AgendadorModelo(rpm=1200, tpm=10_000_000)
+    agendador.requisicoes.saldo = 0
+    ordem = []
+
+    def pedir(sessao, repeticao=False):
+        agendador.adquirir(sessao, 1, repeticao=repeticao)
+        ordem.append(sessao)
+
+    threads = [threading.Thread(target=pedir, args=(sessao,)) for sessao in ('a', 'b', 'c')]
+    for thread in threads:
+        thread.start()
+        time.sleep(0.01)
+    threads.append(threading.Thread(target=pedir, args=('d', True)))
+    threads[-1].start()
+    for thread in threads:
+        thread.join()
+
+    assert ordem.index('d') <= 1, ordem
+
+
+@pytest.mark.parametrize('cabecalhos, esperado', [
+    ({'Retry-After': '2'}, 2.0),
+    ({'Retry-After': '0.5'}, 0.5),
+    ({'retry-after-ms': '1500', 'Retry-After': '9'}, 1.5),
+    ({'Retry-After': 'amanhã'}, None),
+    ({}, None),
+])
+def test_tempo_retry_after(cabecalhos, esperado):
+    assert tempo_retry_after(_resposta(cabecalhos)) == esperado
+
+
+def test_tempo_retry_after_em_data_http():
+    data = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=30), usegmt=True)
+    assert 25 <= tempo_retry_after(_resposta({'Retry-After': data})) <= 30
+
+
+def test_rodizio_nao_deixa_uma_sessao_bloquear_as_outras():
+    agendador = AgendadorModelo(rpm=1200, tpm=10_000_000)  # 20 requisições/s
+    agendador.requisicoes.saldo = 0
+    ordem = []
+
+    def pedir(sessao):
+        agendador.adquirir(sessao, 1)
+        ordem.append(sessao)
+
+    threads = [threading.Thread(target=pedir, args=('a',)) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.02)
+    threads.append(threading.Thread(target=pedir, args=('b',)))
+    threads[-1].start()
+    for thread in threads:
+        thread.join()
+
+    assert ordem.index('b') <= 1, ordem
+
+
+def test_orcamento_de_tokens_por_minuto():
+    agendador = AgendadorModelo(rpm=10_000, tpm=6000)  # 100 tokens/s
+    inicio = time.monotonic()
+    agendador.adquirir('a', 6000)
+    assert time.monotonic() - inicio < 0.1
+    agendador.adquirir('a', 50)
+    assert time.monotonic() - inicio >= 0.4
+
+
+def test_ajuste_com_uso_real_gera_divida():
+    agendador = AgendadorModelo(rpm=10_000, tpm=6000)
+    agendador.adquirir('a', 100)
+    agendador.ajustar(100, 6000)  # Usou bem mais que o estimado: esgota o balde
+    inicio = time.monotonic()
+    agendador.adquirir('a', 50)
+    assert time.monotonic() - inicio >= 0.45
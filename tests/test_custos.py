@@ -0,0 +1,122 @@
+from datetime import datetime
+
+import pytest
+
+import custos
+from custos import (MODELO_RAPIDO, TAMANHO_MAXIMO_PERGUNTA_SIMPLES, RegistroUso, calcular_custo,
+                    escolher_modelo, pergunta_simples)
+
+USO = {'prompt_tokens': 100, 'completion_tokens': 20, 'total_tokens': 120}
+
+
+def test_latencia_mediana_considera_so_perguntas(tmp_path):
+    registro = RegistroUso(str(tmp_path / 'uso.db'))
+    for latencia in (8000, 9000, 10000):
+        registro.registrar('gpt-4o', USO, latencia, tipo='analise')
+    for latencia in (300, 500):
+        registro.registrar('gpt-4o', USO, latencia, tipo='pergunta')
+
+    assert registro.latencia_mediana('gpt-4o') == 400
+    assert registro.latencia_mediana('gpt-4o', tipo='analise') == 9000
+    assert registro.latencia_mediana('gpt-4o-mini') is None
+
+
+def test_analises_lentas_nao_desviam_o_roteamento(tmp_path):
+    registro = RegistroUso(str(tmp_path / 'uso.db'))
+    registro.registrar(MODELO_RAPIDO, USO, 400, tipo='pergunta')
+    registro.registrar('gpt-4o', USO, 600, tipo='pergunta')
+    registro.registrar(MODELO_RAPIDO, USO, 15000, tipo='analise')
+
+    escolha = escolher_modelo('gpt-4o', 'E o câmbio?', registro)
+    assert escolha == {'modelo': MODELO_RAPIDO, 'roteado': True}
+
+    registro.registrar(MODELO_RAPIDO, USO, 900, tipo='pergunta')
+    registro.registrar(MODELO_RAPIDO, USO, 900, tipo='pergunta')
+    assert escolher_modelo('gpt-4o', 'E o câmbio?', registro)['modelo'] == 'gpt-4o'
+
+
+def _fixar_dia(monkeypatch, dia: str):
+    class Relogio(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return datetime.fromisoformat(f"{dia}T12:00:00")
+    monkeypatch.setattr(custos, 'datetime', Relogio)
+
+
+def test_calcular_custo():
+    # gpt-4o: US$ 2,50 por milhão de tokens de entrada e US$ 10,00 por milhão de saída
+    assert calcular_custo('gpt-4o', 1_000_000, 0) == pytest.approx(2.50)
+    assert calcular_custo('gpt-4o', 1000, 500) == pytest.approx(0.0025 + 0.005)
+    assert calcular_custo('gpt-4o-mini', 0, 0) == 0
+    assert calcular_custo('modelo-sem-preco', 1000, 1000) == 0
+
+
+def test_agregado_diario_soma_a_cada_registro(tmp_path, monkeypatch):
+    _fixar_dia(monkeypatch, '2026-03-10')
+    registro = RegistroUso(str(tmp_path / 'uso.db'))
+    registro.registrar('gpt-4o', {'prompt_tokens': 100, 'completion_tokens': 20}, 300)
+    registro.registrar('gpt-4o', {'prompt_tokens': 50, 'completion_tokens': 10}, 500)
+    registro.registrar('gpt-4o', {'prompt_tokens': 10, 'completion_tokens': None}, 1000)
+
+    [dia] = registro.resumo_diario()
+    assert dia['dia'] == '2026-03-10'
+    assert dia['requisicoes'] == 3
+    assert dia['prompt_tokens'] == 160
+    assert dia['completion_tokens'] == 30
+    assert dia['latencia_media_ms'] == pytest.approx(600)
+    assert dia['custo_usd'] == pytest.approx(calcular_custo('gpt-4o', 160, 30))
+
+
+def test_resumo_diario_separa_dias_e_modelos(tmp_path, monkeypatch):
+    registro = RegistroUso(str(tmp_path / 'uso.db'))
+    for dia in ('2026-03-08', '2026-03-09', '2026-03-10'):
+        _fixar_dia(monkeypatch, dia)
+        registro.registrar('gpt-4o', USO, 400)
+    registro.registrar(MODELO_RAPIDO, USO, 200)
+
+    resumo = registro.resumo_diario()
+    assert [(linha['dia'], linha['modelo']) for linha in resumo] == [
+        ('2026-03-10', 'gpt-4.1-nano'), ('2026-03-10', 'gpt-4o'),
+        ('2026-03-09', 'gpt-4o'), ('2026-03-08', 'gpt-4o'),
+    ]
+    # O limite conta dias, não linhas
+    assert [linha['dia'] for linha in registro.resumo_diario(dias=2)] == ['2026-03-10', '2026-03-10', '2026-03-09']
+
+
+def test_resumo_sessao_agrupa_por_modelo(tmp_path):
+    registro = RegistroUso(str(tmp_path / 'uso.db'))
+    registro.registrar('gpt-4o', USO, 1000, sessao='a', tipo='analise')
+    registro.registrar(MODELO_RAPIDO, USO, 200, sessao='a', tipo='pergunta', roteado=True)
+    registro.registrar(MODELO_RAPIDO, USO, 400, sessao='a', tipo='pergunta', roteado=True)
+    registro.registrar('gpt-4o', USO, 5000, sessao='b')
+
+    resumo = registro.resumo_sessao('a')
+    assert [linha['modelo'] for linha in resumo] == ['gpt-4.1-nano', 'gpt-4o']
+    rapido, escolhido = resumo
+    assert rapido['requisicoes'] == 2
+    assert rapido['prompt_tokens'] == 200
+    assert rapido['completion_tokens'] == 40
+    assert rapido['latencia_media_ms'] == pytest.approx(300)
+    assert rapido['custo_usd'] == pytest.approx(2 * calcular_custo(MODELO_RAPIDO, 100, 20))
+    assert escolhido['requisicoes'] == 1
+    assert registro.resumo_sessao('inexistente') == []
+
+
+@pytest.mark.parametrize('pergunta, esperado', [
+    ('a' * TAMANHO_MAXIMO_PERGUNTA_SIMPLES, True),
+    ('a' * (TAMANHO_MAXIMO_PERGUNTA_SIMPLES + 1), False),
+    ('  ' + 'a' * TAMANHO_MAXIMO_PERGUNTA_SIMPLES + '  ', True),  # espaços nas pontas não contam
+    ('E o câmbio?', True),
+    ('Pode analisar o câmbio?', False),
+    ('Faça uma COMPARAÇÃO com 2023', False),
+    ('Qual o cenario para o ano?', False),
+    ('Qual a projeção?', False),
+    ('Monte uma tabela', False),
+])
+def test_pergunta_simples_nos_limites(pergunta, esperado):
+    assert pergunta_simples(pergunta) is esperado
+
+
+def test_pergunta_complexa_fica_no_modelo_escolhido():
+    assert escolher_modelo('gpt-4o', 'Explique o impacto') == {'modelo': 'gpt-4o', 'roteado': False}
+    assert escolher_modelo(MODELO_RAPIDO, 'E o câmbio?') == {'modelo': MODELO_RAPIDO, 'roteado': False}
@@ -0,0 +1,67 @@
+import os
+
+import pytest
+from bs4 import BeautifulSoup
+
+from extracao import (MODO_COMPLETO, MODO_DENSIDADE, PRECISAO_MINIMA, REVOCACAO_MINIMA, avaliar_extracao,
+                      extrair_pagina, extrair_texto_html)
+
+DIRETORIO_FIXTURES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                  'fixtures', 'extracao')
+RESULTADOS = avaliar_extracao(DIRETORIO_FIXTURES, MODO_DENSIDADE)
+
+def _texto(html, modo=MODO_DENSIDADE):
+    """Texto pelo mesmo pipeline do app (tabelas de dados separadas antes)."""
+    return extrair_pagina(BeautifulSoup(html, 'html.parser'), modo)[0]
+
+
+PARAGRAFO = ("A inflação dos serviços educacionais segue acima da média, pressionada por salários, "
+             "tecnologia e manutenção, e as escolas revisam seus orçamentos para o próximo ano.")
+
+
+def test_existem_fixtures():
+    assert len(RESULTADOS) >= 6
+
+
+@pytest.mark.parametrize('nome', sorted(RESULTADOS))
+def test_qualidade_minima_por_fixture(nome):
+    metricas = RESULTADOS[nome]
+    assert metricas['precisao'] >= PRECISAO_MINIMA, metricas
+    assert metricas['revocacao'] >= REVOCACAO_MINIMA, metricas
+
+
+def test_tabelas_separadas_do_texto_nas_fixtures():
+    assert RESULTADOS['indicadores_tabela']['tabelas'] == 1
+    # A tabela de cotações fica na barra lateral
+    assert RESULTADOS['wrapper_sidebar']['tabelas'] == 0
+
+
+@pytest.mark.parametrize('classe', ['container has-sidebar', 'layout menu-open', 'page widget-area'])
+def test_involucro_com_classe_negativa_nao_descarta_a_materia(classe):
+    html = (f'<html><body><div class="{classe}"><div class="conteudo">'
+            + f'<p>{PARAGRAFO}</p>' * 4 + '</div></div></body></html>')
+    densidade = _texto(html, MODO_DENSIDADE)
+    completo = _texto(html, MODO_COMPLETO)
+    assert len(densidade) >= len(PARAGRAFO) * 4
+    assert len(densidade) <= len(completo)
+
+
+def test_refaz_extracao_sem_poda_quando_o_resultado_fica_vazio():
+    # Metade do texto em cada bloco: nenhum é protegido e a poda remove ambos
+    html = ('<html><body>'
+            + f'<div class="promo"><p>{PARAGRAFO}</p><p>{PARAGRAFO}</p></div>'
+            + f'<div class="promo"><p>{PARAGRAFO}</p><p>{PARAGRAFO}</p></div>'
+            + '<table><tr><th>Ano</th><th>Reajuste</th></tr><tr><td>2024</td><td>8,5%</td></tr>'
+            + '<tr><td>2025</td><td>9,1%</td></tr></table>'
+            + '</body></html>')
+    texto, tabelas = extrair_pagina(BeautifulSoup(html, 'html.parser'), MODO_DENSIDADE)
+    assert texto.count(PARAGRAFO) == 4
+    assert len(tabelas) == 1
+    assert texto == extrair_texto_html(html.replace(html[html.index('<table>'):html.index('</body>')], ''))
+
+
+def test_barra_lateral_continua_fora_do_texto():
+    html = ('<html><body><div class="materia">' + f'<p>{PARAGRAFO}</p>' * 3 + '</div>'
+            '<div class="sidebar"><p>Assine a newsletter e receba as principais notícias do dia no seu e-mail.</p>'
+            '</div></body></html>')
+    assert 'newsletter' not in _texto(html)
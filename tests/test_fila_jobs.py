@@ -0,0 +1,138 @@
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from fila_jobs import (STATUS_CONCLUIDO, STATUS_ERRO, STATUS_EXECUTANDO, STATUS_PENDENTE,
+                       FilaJobs)
+
+
+def _aguardar(fila, id_job, status, limite=5.0):
+    fim = time.monotonic() + limite
+    while time.monotonic() < fim:
+        job = fila.obter(id_job)
+        if job['status'] == status:
+            return job
+        time.sleep(0.02)
+    pytest.fail(f"job {id_job} não chegou a '{status}': {fila.obter(id_job)}")
+
+
+@pytest.fixture
+def criar_fila(tmp_path):
+    filas = []
+
+    def criar(**opcoes):
+        opcoes.setdefault('intervalo_verificacao', 0.05)
+        fila = FilaJobs(str(tmp_path / 'jobs.db'), **opcoes)
+        filas.append(fila)
+        return fila
+
+    yield criar
+    for fila in filas:
+        fila.encerrar()
+
+
+def test_executa_job_e_grava_resultado_e_progresso(criar_fila):
+    fila = criar_fila(num_workers=1)
+    progresso = []
+
+    def somar(parametros, reportar):
+        reportar(0.5, 'metade')
+        progresso.append(fila.obter(id_job)['progresso'])
+        return {'soma': sum(parametros['valores'])}
+
+    fila.registrar('somar', somar)
+    id_job = fila.enfileirar('somar', {'valores': [1, 2, 3]}, sessao='s1')
+    job = _aguardar(fila, id_job, STATUS_CONCLUIDO)
+
+    assert job['resultado'] == {'soma': 6}
+    assert job['progresso'] == 1.0
+    assert progresso == [0.5]
+    assert [j['id'] for j in fila.listar('s1')] == [id_job]
+    assert fila.listar('outra') == []
+
+
+def test_erro_fica_registrado_no_job(criar_fila):
+    fila = criar_fila(num_workers=1)
+
+    def falhar(parametros, reportar):
+        raise ValueError('sem notícias')
+
+    fila.registrar('falhar', falhar)
+    job = _aguardar(fila, fila.enfileirar('falhar', {}), STATUS_ERRO)
+    assert job['mensagem'] == 'sem notícias'
+    assert 'ValueError' in job['erro']
+
+
+def test_tipo_nao_registrado_permanece_pendente(criar_fila):
+    fila = criar_fila(num_workers=1)
+    id_job = fila.enfileirar('relatorio', {})
+    time.sleep(0.2)
+    assert fila.obter(id_job)['status'] == STATUS_PENDENTE
+
+    fila.registrar('relatorio', lambda parametros, reportar: 'ok')
+    assert _aguardar(fila, id_job, STATUS_CONCLUIDO)['resultado'] == 'ok'
+
+
+def test_cada_job_e_reivindicado_por_um_unico_worker(criar_fila):
+    fila = criar_fila(num_workers=4)
+    execucoes = []
+    lock = threading.Lock()
+
+    def registrar(parametros, reportar):
+        with lock:
+            execucoes.append(parametros['n'])
+        time.sleep(0.01)
+
+    ids = [fila.enfileirar('registrar', {'n': n}) for n in range(20)]
+    fila.registrar('registrar', registrar)
+    for id_job in ids:
+        _aguardar(fila, id_job, STATUS_CONCLUIDO)
+    assert sorted(execucoes) == list(range(20))
+
+
+def test_job_abandonado_volta_para_a_fila_apos_o_lease(tmp_path, criar_fila):
+    caminho = str(tmp_path / 'jobs.db')
+    fila = criar_fila(num_workers=0)
+    id_job = fila.enfileirar('analise', {'tema': 'Selic'})
+    # Simula um processo que caiu no meio da execução: o lease não é mais renovado
+    with sqlite3.connect(caminho) as conexao:
+        conexao.execute("UPDATE jobs SET status = ?, progresso = 0.7, dono = 'morto:0', "
+                        "atualizado_em = '2026-01-01T00:00:00' WHERE id = ?", (STATUS_EXECUTANDO, id_job))
+
+    nova_fila = criar_fila(num_workers=1, tempo_lease=1)
+    nova_fila.registrar('analise', lambda parametros, reportar: parametros['tema'])
+    job = _aguardar(nova_fila, id_job, STATUS_CONCLUIDO)
+    assert job['resultado'] == 'Selic'
+    assert job['dono'].startswith(nova_fila.id_fila)
+
+
+def test_segunda_fila_nao_executa_de_novo_job_de_fila_viva(criar_fila):
+    """Outro processo no mesmo banco, ou um "Clear cache" do Streamlit."""
+    execucoes = []
+    liberar = threading.Event()
+
+    def demorado(parametros, reportar):
+        execucoes.append(threading.current_thread().name)
+        liberar.wait(10)
+        return 'ok'
+
+    fila_a = criar_fila(num_workers=1, tempo_lease=1)
+    fila_a.registrar('demorado', demorado)
+    id_job = fila_a.enfileirar('demorado', {})
+    _aguardar(fila_a, id_job, STATUS_EXECUTANDO)
+
+    fila_a.encerrar()  # O que o on_release do cache_resource faz
+    fila_b = criar_fila(num_workers=1, tempo_lease=1)
+    fila_b.registrar('demorado', demorado)
+    time.sleep(2.5)  # Mais de dois leases: a fila A continua renovando
+    assert fila_b.obter(id_job)['status'] == STATUS_EXECUTANDO
+    assert len(execucoes) == 1
+
+    # Jobs novos ficam com a fila B; a fila A encerrada não pega mais nada
+    id_novo = fila_b.enfileirar('demorado', {})
+    liberar.set()
+    assert _aguardar(fila_b, id_job, STATUS_CONCLUIDO)['dono'].startswith(fila_a.id_fila)
+    assert _aguardar(fila_b, id_novo, STATUS_CONCLUIDO)['dono'].startswith(fila_b.id_fila)
+    assert len(execucoes) == 2
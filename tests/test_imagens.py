@@ -0,0 +1,226 @@
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+
+import pytest
+from bs4 import BeautifulSoup
+from PIL import Image, ImageDraw
+
+from imagens import (DISTANCIA_DUPLICATA, TAMANHO_MAXIMO_BYTES, CacheMiniaturas, ImagemDescartada,
+                     ProcessadorImagens, candidatas_da_pagina, distancia_hash, gerar_miniatura)
+
+
+def _foto(semente: int, tamanho=(800, 600)) -> Image.Image:
+    """Imagem com formas aleatórias, para o hash perceptual ter o que comparar."""
+    aleatorio = random.Random(semente)
+    imagem = Image.new('RGB', tamanho, (aleatorio.randrange(256), 90, 160))
+    desenho = ImageDraw.Draw(imagem)
+    for _ in range(12):
+        x0, x1 = sorted(aleatorio.randrange(tamanho[0]) for _ in range(2))
+        y0, y1 = sorted(aleatorio.randrange(tamanho[1]) for _ in range(2))
+        cor = tuple(aleatorio.randrange(256) for _ in range(3))
+        desenho.rectangle((x0, y0, x1, y1), fill=cor)
+    return imagem
+
+
+def _bytes(imagem: Image.Image, formato='JPEG', **opcoes) -> bytes:
+    saida = BytesIO()
+    imagem.save(saida, formato, **opcoes)
+    return saida.getvalue()
+
+
+@pytest.fixture
+def servidor():
+    """Servidor local: caminho -> (conteúdo, content-type, envia Content-Length)."""
+    rotas = {}
+    acessos = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            acessos.append(self.path)
+            conteudo, tipo, com_tamanho = rotas[self.path]
+            self.send_response(200)
+            self.send_header('Content-Type', tipo)
+            if com_tamanho:
+                self.send_header('Content-Length', str(len(conteudo)))
+            self.end_headers()
+            try:
+                self.wfile.write(conteudo)
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+
+    http = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=http.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{http.server_address[1]}"
+
+    def publicar(caminho, conteudo, tipo='image/jpeg', com_tamanho=True):
+        rotas[caminho] = (conteudo, tipo, com_tamanho)
+        return base + caminho
+
+    publicar.acessos = acessos
+    yield publicar
+    http.shutdown()
+
+
+@pytest.fixture
+def processador(tmp_path):
+    return ProcessadorImagens(str(tmp_path / 'miniaturas'))
+
+
+def _candidata(url):
+    return {'url': url, 'alt': '', 'fonte': 'https://g1.com/noticia'}
+
+
+# ---------------------------------------------------------------------------
+# Dimensões e miniatura
+# ---------------------------------------------------------------------------
+
+def test_miniatura_reduzida_com_dimensoes_originais():
+    miniatura = gerar_miniatura(_bytes(_foto(1)))
+    assert (miniatura['largura'], miniatura['altura']) == (800, 600)
+    assert max(Image.open(BytesIO(miniatura['jpeg'])).size) <= 320
+    assert len(miniatura['hash']) == 16
+
+
+def test_png_transparente_vira_jpeg():
+    imagem = Image.new('RGBA', (400, 300), (255, 0, 0, 0))
+    assert Image.open(BytesIO(gerar_miniatura(_bytes(imagem, 'PNG'))['jpeg'])).mode == 'RGB'
+
+
+@pytest.mark.parametrize('imagem, motivo', [
+    (Image.new('RGB', (150, 400)), 'pequena demais'),
+    (Image.new('RGB', (400, 100)), 'pequena demais'),
+    (Image.new('RGB', (1800, 300)), 'proporção de banner'),
+    (Image.new('1', (7000, 6000)), 'dimensões excessivas'),
+])
+def test_descartes_pelas_dimensoes(imagem, motivo):
+    with pytest.raises(ImagemDescartada, match=motivo):
+        gerar_miniatura(_bytes(imagem, 'PNG'))
+
+
+def test_arquivo_que_nao_e_imagem():
+    with pytest.raises(ImagemDescartada, match='formato'):
+        gerar_miniatura(b'<html>not an image</html>')
+
+
+# ---------------------------------------------------------------------------
+# Download
+# ---------------------------------------------------------------------------
+
+def test_download_aborta_acima_do_limite_sem_content_length(servidor, processador):
+    grande = b'\xff\xd8' + b'0' * (TAMANHO_MAXIMO_BYTES + 1024 * 1024)
+    url = servidor('/grande.jpg', grande, com_tamanho=False)
+    with pytest.raises(ImagemDescartada, match='grande demais'):
+        processador.baixar(url, {})
+
+
+def test_content_length_acima_do_limite_nem_baixa(servidor, processador):
+    url = servidor('/declarada.jpg', b'0' * (TAMANHO_MAXIMO_BYTES + 1))
+    with pytest.raises(ImagemDescartada, match='grande demais'):
+        processador.baixar(url, {})
+
+
+def test_tipo_que_nao_e_imagem_e_descartado(servidor, processador):
+    url = servidor('/pagina.jpg', b'<html></html>', tipo='text/html; charset=utf-8')
+    with pytest.raises(ImagemDescartada, match='text/html'):
+        processador.baixar(url, {})
+
+
+# ---------------------------------------------------------------------------
+# Deduplicação e cache
+# ---------------------------------------------------------------------------
+
+def test_mesma_foto_reescalada_e_descartada_por_hash(servidor, processador):
+    foto = _foto(1)
+    original = servidor('/original.jpg', _bytes(foto, quality=90))
+    reescalada = servidor('/reescalada.jpg', _bytes(foto.resize((640, 480)), quality=60))
+    outra = servidor('/outra.jpg', _bytes(_foto(2)))
+
+    imagens = processador.processar([_candidata(u) for u in (original, reescalada, outra)], {})
+    assert [img['url'] for img in imagens] == [original, outra]
+
+    miniaturas = [processador.miniatura(u, {}) for u in (original, reescalada, outra)]
+    assert distancia_hash(miniaturas[0]['hash'], miniaturas[1]['hash']) <= DISTANCIA_DUPLICATA
+    assert distancia_hash(miniaturas[0]['hash'], miniaturas[2]['hash']) > DISTANCIA_DUPLICATA
+
+
+def test_descartes_ficam_em_cache_e_nao_sao_baixados_de_novo(servidor, processador):
+    url = servidor('/banner.png', _bytes(Image.new('RGB', (1800, 300)), 'PNG'), tipo='image/png')
+    assert processador.processar([_candidata(url)], {}) == []
+    assert processador.processar([_candidata(url)], {}) == []
+    assert servidor.acessos.count('/banner.png') == 1
+    assert 'proporção' in processador.cache.obter(url)['descartada']
+
+
+def test_falha_ao_gravar_o_cache_nao_derruba_o_processamento(servidor, processador, monkeypatch):
+    url = servidor('/foto.jpg', _bytes(_foto(3)))
+
+    def disco_cheio(*args, **kwargs):
+        raise OSError(28, 'No space left on device')
+
+    monkeypatch.setattr(processador.cache, 'guardar', disco_cheio)
+    assert processador.processar([_candidata(url)], {}) == []
+
+
+def test_cache_remove_as_entradas_menos_usadas(tmp_path):
+    pasta = str(tmp_path / 'miniaturas')
+    cache = CacheMiniaturas(pasta)
+    jpeg = os.urandom(1000)
+    agora = time.time()
+    for i, url in enumerate(('a', 'b', 'c')):
+        metadados = cache.guardar(url, {'hash': '0' * 16}, jpeg)
+        for arquivo in (metadados['arquivo'], cache._base(url) + '.json'):
+            os.utime(arquivo, (agora - 300 + i * 100,) * 2)
+
+    # Cabem as três e pouco mais; a quarta entrada força a poda de uma
+    cache.max_bytes = cache._tamanho + 500
+    assert cache.obter('a') is not None  # Uso recente: passa a ser a mais nova
+    cache.guardar('d', {'hash': '0' * 16}, jpeg)
+
+    assert cache.obter('b') is None
+    assert cache.obter('a') is not None
+    assert cache.obter('c') is not None
+    assert cache.obter('d') is not None
+    assert cache._tamanho <= cache.max_bytes * 0.9
+    # O tamanho é recalculado a partir da pasta ao reabrir
+    assert CacheMiniaturas(pasta)._tamanho == cache._tamanho
+
+
+# ---------------------------------------------------------------------------
+# Candidatas da página
+# ---------------------------------------------------------------------------
+
+HTML_PAGINA = """
+<html><head>
+  <meta property="og:image" content="/fotos/capa.jpg">
+  <meta property="og:title" content="Mensalidades sobem 9%">
+</head><body>
+  <img src="/static/logo-portal.png" alt="Portal">
+  <img class="site-logo" src="/static/marca.png">
+  <img src="/px.gif" width="1" height="1">
+  <img src="/fotos/capa.jpg" alt="Capa repetida">
+  <img src="data:image/gif;base64,R0lGOD" data-src="/fotos/lazy.jpg" alt="Sala de aula">
+  <img srcset="/fotos/g-320.jpg 320w, /fotos/g-800.jpg 800w, /fotos/g-1600.jpg 1600w" alt="Gráfico">
+  <img src="/icones/seta.svg">
+  <img src="https://cdn.exemplo.com/fotos/escola.webp" alt="Fachada">
+  <img src="/fotos/extra.jpg">
+</body></html>
+"""
+
+
+def test_candidatas_da_pagina():
+    soup = BeautifulSoup(HTML_PAGINA, 'html.parser')
+    candidatas = candidatas_da_pagina(soup, 'https://g1.com/educacao/noticia.html', max_imagens=4)
+    assert [(c['url'], c['alt']) for c in candidatas] == [
+        ('https://g1.com/fotos/capa.jpg', 'Mensalidades sobem 9%'),
+        ('https://g1.com/fotos/lazy.jpg', 'Sala de aula'),
+        ('https://g1.com/fotos/g-800.jpg', 'Gráfico'),
+        ('https://cdn.exemplo.com/fotos/escola.webp', 'Fachada'),
+    ]
+    assert all(c['fonte'] == 'https://g1.com/educacao/noticia.html' for c in candidatas)
@@ -0,0 +1,73 @@
+from datetime import datetime
+
+import pytest
+
+from metricas import MetricasTemas, normalizar_tema, periodo, veiculo_da_url
+
+SEGUNDA = datetime(2026, 10, 12, 9, 0)
+
+
+def _artigo(url, caracteres=1000, sentimento=0.5):
+    return {'url': url, 'caracteres': caracteres, 'sentimento': sentimento}
+
+
+@pytest.fixture
+def metricas(tmp_path):
+    return MetricasTemas(str(tmp_path / 'metricas.db'))
+
+
+def test_reexecucao_no_mesmo_dia_nao_duplica_artigos(metricas):
+    artigos = [_artigo('https://www.g1.com/a', 1000, 0.4), _artigo('https://valor.com/b', 3000, -0.2)]
+    metricas.registrar_execucao('Selic', [a['url'] for a in artigos], artigos, momento=SEGUNDA)
+    metricas.registrar_execucao(' selic ', [a['url'] for a in artigos], artigos,
+                                momento=SEGUNDA.replace(hour=15))
+
+    serie = metricas.tendencia('Selic')
+    assert serie.to_dict('records') == [{
+        'periodo': '2026-10-12', 'execucoes': 2, 'artigos': 2, 'caracteres': 4000,
+        'sentimento_medio': pytest.approx(0.1),
+    }]
+    veiculos = metricas.veiculos('Selic', 'diario')
+    assert dict(zip(veiculos['veiculo'], veiculos['artigos'])) == {'g1.com': 1, 'valor.com': 1}
+
+
+def test_so_urls_novas_entram_no_agregado(metricas):
+    metricas.registrar_execucao('selic', [], [_artigo('https://g1.com/a', sentimento=1.0)], momento=SEGUNDA)
+    metricas.registrar_execucao('selic', [], [_artigo('https://g1.com/a', sentimento=1.0),
+                                              _artigo('https://g1.com/b', sentimento=0.0)], momento=SEGUNDA)
+    linha = metricas.tendencia('selic').iloc[0]
+    assert linha['artigos'] == 2
+    assert linha['sentimento_medio'] == pytest.approx(0.5)
+
+
+def test_url_repetida_na_mesma_execucao_conta_uma_vez(metricas):
+    artigos = [_artigo('https://g1.com/a'), _artigo('https://g1.com/a')]
+    metricas.registrar_execucao('selic', [], artigos, momento=SEGUNDA)
+    assert metricas.tendencia('selic').iloc[0]['artigos'] == 1
+
+
+def test_mesma_url_conta_de_novo_em_outro_periodo(metricas):
+    artigos = [_artigo('https://g1.com/a')]
+    metricas.registrar_execucao('selic', [], artigos, momento=SEGUNDA)
+    metricas.registrar_execucao('selic', [], artigos, momento=SEGUNDA.replace(day=14))
+
+    assert metricas.tendencia('selic')['artigos'].tolist() == [1, 1]
+    semanal = metricas.tendencia('selic', 'semanal')
+    assert semanal[['periodo', 'execucoes', 'artigos']].to_dict('records') == [
+        {'periodo': '2026-10-12', 'execucoes': 2, 'artigos': 1}]
+
+
+def test_temas_distintos_nao_compartilham_urls(metricas):
+    artigos = [_artigo('https://g1.com/a')]
+    metricas.registrar_execucao('selic', [], artigos, momento=SEGUNDA)
+    metricas.registrar_execucao('câmbio', [], artigos, momento=SEGUNDA)
+    assert metricas.tendencia('câmbio').iloc[0]['artigos'] == 1
+    assert set(metricas.temas()) == {'selic', 'câmbio'}
+
+
+def test_auxiliares(metricas):
+    assert normalizar_tema('  Taxa   SELIC ') == 'taxa selic'
+    assert veiculo_da_url('https://www.Estadao.com.br/x') == 'estadao.com.br'
+    assert periodo(SEGUNDA.replace(day=18), 'semanal') == '2026-10-12'
+    with pytest.raises(ValueError):
+        metricas.tendencia('selic', 'mensal')
@@ -0,0 +1,92 @@
+import base64
+import json
+import time
+from io import BytesIO
+
+import pytest
+import requests
+from PIL import Image
+
+import replay
+from imagens import ProcessadorImagens
+from replay import Cassete, iniciar_servidor_replay
+
+
+def _png() -> bytes:
+    saida = BytesIO()
+    Image.new('RGB', (400, 300), (200, 30, 30)).save(saida, 'PNG')
+    return saida.getvalue()
+
+
+def test_gravacao_acrescenta_uma_linha_por_entrada(tmp_path):
+    caminho = tmp_path / 'cassetes' / 'tema.jsonl'
+    cassete = Cassete(str(caminho))
+    cassete.gravar('buscas', 'selic', {'resultado': {'news_results': []}, 'latencia_ms': 120})
+    tamanho = caminho.stat().st_size
+    cassete.gravar('paginas', 'https://g1.com/a', {'status': 200, 'html': '<p>a</p>', 'latencia_ms': 80})
+
+    linhas = caminho.read_text(encoding='utf-8').splitlines()
+    assert len(linhas) == 2
+    # A primeira linha não é reescrita
+    assert caminho.read_bytes()[:tamanho].decode('utf-8').strip() == linhas[0]
+    assert json.loads(linhas[1]) == {'secao': 'paginas', 'chave': 'https://g1.com/a',
+                                     'valor': {'status': 200, 'html': '<p>a</p>', 'latencia_ms': 80}}
+
+
+def test_carregamento_usa_a_ultima_gravacao_e_ignora_linha_truncada(tmp_path):
+    caminho = tmp_path / 'tema.jsonl'
+    cassete = Cassete(str(caminho))
+    cassete.gravar('buscas', 'selic', {'resultado': 1})
+    cassete.gravar('buscas', 'selic', {'resultado': 2})
+    with open(caminho, 'a', encoding='utf-8') as f:
+        f.write('{"secao": "buscas", "chave": "câmbio", "val')
+
+    relido = Cassete(str(caminho))
+    assert relido.obter('buscas', 'selic') == {'resultado': 2}
+    assert relido.obter('buscas', 'câmbio') is None
+    assert list(relido.dados['buscas']) == ['selic']
+
+    # A próxima gravação não se mistura com a linha truncada
+    relido.gravar('buscas', 'ipca', {'resultado': 3})
+    assert Cassete(str(caminho)).obter('buscas', 'ipca') == {'resultado': 3}
+
+
+def test_servidor_conta_requisicoes_por_rota(tmp_path):
+    caminho = tmp_path / 'cassete.jsonl'
+    Cassete(str(caminho)).gravar('buscas', 'selic', {'resultado': {'news_results': []}})
+    servidor, url = iniciar_servidor_replay(str(caminho))
+    try:
+        for _ in range(2):
+            requests.get(f"{url}/busca", params={'q': 'selic'}, timeout=5)
+        requests.get(f"{url}/pagina", params={'url': 'https://g1.com/nao-gravada'}, timeout=5)
+    finally:
+        servidor.shutdown()
+    assert servidor.requisicoes == {'busca': 2, 'pagina': 1}
+
+
+def test_latencia_de_imagem_gravada_e_reproduzida(tmp_path, monkeypatch):
+    conteudo = _png()
+    origem = tmp_path / 'origem.jsonl'
+    Cassete(str(origem)).gravar('imagens', 'https://g1.com/foto.png', {
+        'content_type': 'image/png', 'conteudo': base64.b64encode(conteudo).decode('ascii'),
+        'latencia_ms': 300
+    })
+    servidor, url = iniciar_servidor_replay(str(origem), simular_latencia=True)
+    try:
+        endereco = f"{url}/imagem?url=https%3A%2F%2Fg1.com%2Ffoto.png"
+        inicio = time.perf_counter()
+        assert requests.get(endereco, timeout=5).content == conteudo
+        assert time.perf_counter() - inicio >= 0.28
+
+        # Gravando um cassete novo a partir do servidor lento, a latência é registrada
+        gravacao = tmp_path / 'gravacao.jsonl'
+        monkeypatch.setenv('REPLAY_MODO', replay.MODO_GRAVAR)
+        monkeypatch.setenv('REPLAY_CASSETE', str(gravacao))
+        processador = ProcessadorImagens(str(tmp_path / 'miniaturas'))
+        assert processador.baixar(endereco, {}) == conteudo
+    finally:
+        servidor.shutdown()
+
+    gravada = Cassete(str(gravacao)).obter('imagens', endereco)
+    assert gravada['content_type'] == 'image/png'
+    assert gravada['latencia_ms'] == pytest.approx(300, abs=150)
@@ -0,0 +1,71 @@
+import math
+from pathlib import Path
+
+import pandas as pd
+import pytest
+from bs4 import BeautifulSoup
+
+from extracao import MODO_DENSIDADE, PRECISAO_MINIMA, REVOCACAO_MINIMA, comparar_textos, extrair_pagina
+from tabelas import converter_numeros_ptbr, extrair_tabelas, formatar_numero_ptbr
+
+FIXTURES = Path(__file__).resolve().parent.parent / 'fixtures' / 'extracao'
+
+
+@pytest.mark.parametrize('texto, esperado', [
+    ('1.234,56', 1234.56),
+    ('1.234.567', 1234567.0),
+    ('1.234', 1234.0),
+    ('3.5', 3.5),
+    ('10,75%', 10.75),
+    ('R$ 5,43', 5.43),
+    ('R$ 1.200.000,00', 1200000.0),
+    ('(2,5)', -2.5),
+    ('−0,8', -0.8),
+    ('-1.500', -1500.0),
+    ('12', 12.0),
+])
+def test_converter_numeros_ptbr(texto, esperado):
+    assert converter_numeros_ptbr(pd.Series([texto]))[0] == pytest.approx(esperado)
+
+
+@pytest.mark.parametrize('texto', ['', 'n/d', 'Dólar', '—'])
+def test_converter_numeros_ptbr_sem_numero(texto):
+    assert math.isnan(converter_numeros_ptbr(pd.Series([texto]))[0])
+
+
+def test_converter_numeros_ptbr_aceita_nulos():
+    valores = converter_numeros_ptbr(pd.Series(['1,5', None]))
+    assert valores[0] == 1.5
+    assert math.isnan(valores[1])
+
+
+def test_formatar_numero_ptbr():
+    assert formatar_numero_ptbr(1234.5) == '1.234,50'
+    assert formatar_numero_ptbr(1500) == '1.500'
+    assert formatar_numero_ptbr(float('nan')) == ''
+
+
+def _pagina(nome):
+    html = (FIXTURES / nome).read_text(encoding='utf-8')
+    return extrair_pagina(BeautifulSoup(html, 'html.parser'), MODO_DENSIDADE)
+
+
+def test_tabela_de_cotacoes_da_barra_lateral_nao_vira_dado():
+    texto, tabelas = _pagina('wrapper_sidebar.html')
+    assert tabelas == []
+    metricas = comparar_textos(texto, (FIXTURES / 'wrapper_sidebar.txt').read_text(encoding='utf-8'))
+    assert metricas['precisao'] >= PRECISAO_MINIMA and metricas['revocacao'] >= REVOCACAO_MINIMA, metricas
+
+
+def test_tabela_dentro_da_materia_continua_extraida():
+    texto, tabelas = _pagina('indicadores_tabela.html')
+    assert len(tabelas) == 1
+    assert list(tabelas[0]['3T24']) == [1199.6, 356.2, 437.0]
+    # A tabela segue como dado, não achatada no texto
+    assert 'EBITDA' not in texto
+
+
+def test_tabelas_sem_filtro_incluem_as_da_barra_lateral():
+    html = (FIXTURES / 'wrapper_sidebar.html').read_text(encoding='utf-8')
+    tabelas = extrair_tabelas(BeautifulSoup(html, 'html.parser'))
+    assert [list(df.columns) for df in tabelas] == [['Moeda', 'Valor']]